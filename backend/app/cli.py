@@ -1,24 +1,201 @@
 import sys
 from typing import Optional
 
-from .db import Base, engine
+from .db import Base, engine, SessionLocal
+from . import migrations
 
 
 def create_db() -> None:
     Base.metadata.create_all(bind=engine)
     print("[cli] Database tables ensured (create_all)")
+    migrate()
+
+
+def migrate() -> None:
+    ran = migrations.upgrade(engine)
+    print(f"[cli] Migrations applied: {', '.join(ran) if ran else 'none pending'}")
+
+
+def publish_vcards(workers: Optional[int] = None) -> None:
+    from .services import publisher
+
+    with SessionLocal() as db:
+        counts = publisher.rebuild_all(db, workers=workers or publisher.PUBLISH_WORKERS)
+    print(f"[cli] vCards published={counts['published']} removed={counts['removed']} orphans={counts['orphans']}")
+
+
+def unpublish_lapsed(hours: Optional[float] = None) -> None:
+    from datetime import datetime, timedelta, timezone
+
+    from .services import publisher
+
+    since = datetime.now(timezone.utc) - timedelta(hours=24 if hours is None else hours)
+    with SessionLocal() as db:
+        counts = publisher.unpublish_lapsed(db, since)
+    print(f"[cli] Lapsed users={counts['users']} vCards unpublished={counts['removed']}")
+
+
+def worker(threads: Optional[int] = None, processes: Optional[int] = None) -> None:
+    from . import jobs
+
+    if jobs.JOBS_BACKEND != "redis":
+        print("[cli] worker needs JOBS_BACKEND=redis (local jobs run inside the web process)")
+        raise SystemExit(1)
+    jobs.run_worker(threads or jobs.JOBS_THREADS, processes or jobs.JOBS_PROCESSES)
+
+
+def photo_gc(dry_run: bool = False, grace_hours: Optional[float] = None) -> None:
+    from .services import photos
+
+    with SessionLocal() as db:
+        # refresh references first so a photo set by any path is never collected
+        refs = photos.backfill_refs(db)
+        counts = photos.gc(db, grace_hours=photos.GC_GRACE_HOURS if grace_hours is None else grace_hours, dry_run=dry_run)
+    verb = "would delete" if dry_run else "deleted"
+    print(
+        f"[cli] Photo GC: refs={refs} scanned={counts['scanned']} referenced={counts['referenced']} "
+        f"recent={counts['recent']} {verb}={counts['deleted']}"
+    )
+
+
+def import_vcf(path: str, owner: str) -> None:
+    from .models_user import User
+    from .services.importer import import_vcards
+    from .services.users import normalize_email
+
+    with SessionLocal() as db:
+        # stored emails are normalized (users.provision)
+        email = normalize_email(owner) or owner
+        user = db.query(User).filter((User.email == email) | (User.id == owner)).first()
+        if user is None:
+            print(f"[cli] No user with email or id {owner!r}")
+            raise SystemExit(1)
+        # no size cap like the HTTP spool: the file is streamed with bounded line reads
+        # (vcard.bounded_lines), so memory stays near MAX_CARD_BYTES however big it is
+        with open(path, "rb") as f:
+            result = import_vcards(db, user.id, f)
+    print(f"[cli] Imported {result.imported} profiles for {user.email}; {result.failed} failed")
+    for err in result.errors:
+        print(f"  record {err['record']} (line {err['line']}, {err['fullName'] or 'unnamed'}): {'; '.join(err['errors'])}")
+    if result.failed > len(result.errors):
+        print(f"  ... {result.failed - len(result.errors)} more errors not shown")
+
+
+def provision_users(path: str, trial_days: Optional[int] = None) -> None:
+    """CSV with an `email` column and optional `name` / `trial_days` columns, streamed row by row."""
+    import csv
+
+    from .services import users
+
+    def members(f):
+        for row in csv.DictReader(f):
+            days = (row.get("trial_days") or "").strip()
+            yield {"email": row.get("email"), "name": (row.get("name") or "").strip() or None, "trialDays": int(days) if days else None}
+
+    with SessionLocal() as db, open(path, newline="") as f:
+        counts = users.provision_many(db, members(f), trial_days=users.TRIAL_DAYS if trial_days is None else trial_days)
+    print(f"[cli] Users created={counts['created']} updated={counts['updated']} invalid={len(counts['invalid'])}")
+    for email in counts["invalid"][:20]:
+        print(f"  invalid email: {email!r}")
+
+
+def render_vcards(force: bool = False, batch_size: Optional[int] = None) -> None:
+    from .services import prerender
+
+    with SessionLocal() as db:
+        written = prerender.backfill(db, batch_size=batch_size or 500, force=force)
+    print(f"[cli] Stored vCards rendered={written} (version {prerender.VCARD_RENDER_VERSION})")
+
+
+def compact_slugs(batch_size: Optional[int] = None) -> None:
+    from .services import events, slugs
+
+    moved = 0
+    with SessionLocal() as db:
+        for change in slugs.compact_all(db, batch_size=batch_size or 500):
+            events.slug_moved(change["old"], change["new"])
+            moved += 1
+    print(f"[cli] Compact slugs assigned={moved}; old slugs kept in slug_aliases")
+
+
+def qr_report(ecc: str = "M") -> None:
+    from collections import Counter
+
+    from .services import slugs
+
+    saved: Counter = Counter()
+    with SessionLocal() as db:
+        print("slug,legacy_version,compact_version,saved")
+        for row in slugs.report(db, ecc=ecc):
+            print(f"{row['slug']},{row['legacyVersion'] or ''},{row['compactVersion'] or ''},{'' if row['saved'] is None else row['saved']}")
+            if row["saved"] is not None:
+                saved[row["saved"]] += 1
+    summary = ", ".join(f"{n} saved {v} version(s)" for v, n in sorted(saved.items()))
+    print(f"[cli] QR versions (ECC {ecc}): {summary or 'no profiles'}", file=sys.stderr)
 
 
 def main(argv: Optional[list[str]] = None) -> int:
     argv = argv or sys.argv[1:]
     if not argv:
         print("Usage: python -m app.cli <command>")
-        print("Commands:\n  create-db   Ensure tables exist (create_all)")
+        print("Commands:\n  create-db   Ensure tables exist (create_all) and apply migrations")
+        print("  migrate     Apply pending schema migrations (indexes, FTS)")
+        print("  publish-vcards [workers]  Full rebuild of pre-published vCards (PUBLISH_TARGET)")
+        print("  unpublish-lapsed [hours]  Remove published vCards of users whose access ended in the last hours (default 24)")
+        print("  worker [threads] [processes]  Run a Redis-backed background job worker")
+        print("  photo-gc [--dry-run] [grace_hours]  Delete unreferenced photos older than the grace period")
+        print("  import-vcf <file.vcf> <user email|id>  Create a profile per card in a multi-contact .vcf")
+        print("  provision-users <members.csv> [trial_days]  Upsert users (email,name,trial_days) in batches")
+        print("  render-vcards [--force] [batch_size]  Fill in missing/outdated stored vCards (all with --force)")
+        print("  compact-slugs [batch_size]  Move profiles onto compact /C/{SLUG} slugs, aliasing the old ones")
+        print("  qr-report [L|M]  CSV of each profile's QR version for its legacy vs compact link")
         return 1
     cmd = argv[0]
     if cmd == "create-db":
         create_db()
         return 0
+    if cmd == "migrate":
+        migrate()
+        return 0
+    if cmd == "publish-vcards":
+        publish_vcards(int(argv[1]) if len(argv) > 1 else None)
+        return 0
+    if cmd == "unpublish-lapsed":
+        unpublish_lapsed(float(argv[1]) if len(argv) > 1 else None)
+        return 0
+    if cmd == "worker":
+        worker(*(int(a) for a in argv[1:3]))
+        return 0
+    if cmd == "photo-gc":
+        args = [a for a in argv[1:] if a != "--dry-run"]
+        photo_gc("--dry-run" in argv[1:], float(args[0]) if args else None)
+        return 0
+    if cmd == "import-vcf":
+        if len(argv) < 3:
+            print("Usage: python -m app.cli import-vcf <file.vcf> <user email|id>")
+            return 1
+        import_vcf(argv[1], argv[2])
+        return 0
+    if cmd == "provision-users":
+        if len(argv) < 2:
+            print("Usage: python -m app.cli provision-users <members.csv> [trial_days]")
+            return 1
+        provision_users(argv[1], int(argv[2]) if len(argv) > 2 else None)
+        return 0
+    if cmd == "render-vcards":
+        args = [a for a in argv[1:] if a != "--force"]
+        render_vcards("--force" in argv[1:], int(args[0]) if args else None)
+        return 0
+    if cmd == "compact-slugs":
+        compact_slugs(int(argv[1]) if len(argv) > 1 else None)
+        return 0
+    if cmd == "qr-report":
+        ecc = argv[1].upper() if len(argv) > 1 else "M"
+        if ecc not in ("L", "M"):
+            print("Usage: python -m app.cli qr-report [L|M]")
+            return 1
+        qr_report(ecc)
+        return 0
     print(f"Unknown command: {cmd}")
     return 1
 
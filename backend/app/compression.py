@@ -0,0 +1,261 @@
+"""
+Response compression (gzip, and brotli when the optional `brotli` package is installed).
+
+Two paths:
+  - Cached scan artifacts (stored vCards, landing pages) are compressed once when they
+    are loaded into the cache (`precompress`) and served by `encoded_response`, so a hot
+    scan never compresses anything.
+  - Everything else (JSON from /api, dev routes, ...) goes through `CompressionMiddleware`,
+    which compresses on the fly at a cheaper level.
+
+Both only compress allowlisted content types at or above COMPRESS_MIN_SIZE bytes, always
+send `Vary: Accept-Encoding` for those types, and give each encoding its own strong ETag
+(`"<etag>-gzip"`, `"<etag>-br"`) so caches never hand gzip bytes to a client that can't
+take them. Responses that already carry a Content-Encoding pass through untouched.
+
+Config:
+  COMPRESS_MIN_SIZE       smallest body worth compressing (default 500)
+  COMPRESS_GZIP_LEVEL     on-the-fly gzip level (default 6; precompressed entries use 9)
+  COMPRESS_BROTLI_QUALITY on-the-fly brotli quality (default 4; precompressed entries use 11)
+"""
+import gzip
+import os
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip covers every browser
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "500"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/css",
+    "text/csv",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+    "text/vcard",
+    "text/x-vcard",
+    "text/xml",
+})
+
+
+def compressible(content_type: Optional[str]) -> bool:
+    return (content_type or "").split(";")[0].strip().lower() in COMPRESSIBLE_TYPES
+
+
+def available() -> Tuple[str, ...]:
+    """Encodings this process can produce, in order of preference."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str, offered: Iterable[str]) -> Optional[str]:
+    """Pick the best of `offered` for an Accept-Encoding header; None means identity.
+
+    Honours q-values (`gzip;q=0` refuses gzip) and `*`; ties go to the order of `offered`.
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for encoding in offered:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """Per-encoding variant of a strong ETag: "abc" -> "abc-gzip"."""
+    if encoding is None or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """True when If-None-Match names this resource in any encoding (or is `*`)."""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.strip('"')
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag == opaque or any(tag == f"{opaque}-{e}" for e in ("gzip", "br")):
+            return True
+    return False
+
+
+@dataclass
+class Precompressed:
+    """A cached body with its ETag and any encodings worth storing (None when too small)."""
+
+    body: bytes
+    etag: str
+    gzip: Optional[bytes] = None
+    br: Optional[bytes] = None
+
+    def encoded(self, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+        """Best stored body for the client: (body, Content-Encoding or None)."""
+        offered = [e for e in ("br", "gzip") if getattr(self, e) is not None]
+        encoding = negotiate(accept_encoding, offered) if offered else None
+        return (self.body, None) if encoding is None else (getattr(self, encoding), encoding)
+
+
+def precompress(body: bytes, etag: str) -> Precompressed:
+    if len(body) < COMPRESS_MIN_SIZE:
+        return Precompressed(body, etag)
+    return Precompressed(
+        body,
+        etag,
+        # mtime=0 keeps the gzip bytes deterministic for identical bodies
+        gzip=gzip.compress(body, compresslevel=9, mtime=0),
+        br=brotli.compress(body, quality=11) if brotli is not None else None,
+    )
+
+
+def encoded_response(request, entry: Precompressed, media_type: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serve a Precompressed entry: negotiate, per-encoding ETag, Vary, and 304 on If-None-Match."""
+    body, encoding = entry.encoded(request.headers.get("accept-encoding", ""))
+    headers = {
+        **(headers or {}),
+        # each encoding is its own representation, so it gets its own strong ETag
+        "ETag": encoded_etag(entry.etag, encoding),
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request.headers.get("if-none-match", ""), entry.etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        else:
+            self._gz = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data) if data else b""
+        return self._gz.compress(data)
+
+    def flush(self) -> bytes:
+        return self._br.finish() if self.encoding == "br" else self._gz.flush()
+
+
+class CompressionMiddleware:
+    """On-the-fly compression for responses the routes didn't precompress.
+
+    Single-message bodies below COMPRESS_MIN_SIZE are sent as-is; streamed bodies are
+    compressed chunk by chunk. Skips 304/204, range responses, `Cache-Control:
+    no-transform` and anything that already has a Content-Encoding.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = COMPRESS_MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = Headers(scope=scope).get("accept-encoding", "")
+        encoding = negotiate(accept, available()) if accept else None
+        start: Optional[Message] = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def wrapped_send(message: Message) -> None:
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                headers = Headers(raw=message["headers"])
+                if (
+                    not compressible(headers.get("content-type"))
+                    or "content-encoding" in headers
+                    or "content-range" in headers
+                    or "no-transform" in headers.get("cache-control", "")
+                    or message["status"] < 200
+                    or message["status"] in (204, 206, 304)
+                ):
+                    passthrough = True
+                    await send(message)
+                    return
+                # the representation depends on Accept-Encoding even when we send identity
+                _add_vary(MutableHeaders(raw=message["headers"]))
+                if encoding is None:
+                    passthrough = True
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if compressor is None:
+                if not more and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = encoding
+                if "etag" in headers:
+                    headers["ETag"] = _encoded_etag_header(headers["etag"], encoding)
+                del headers["content-length"]
+                if not more:
+                    data = compressor.compress(body) + compressor.flush()
+                    headers["Content-Length"] = str(len(data))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": data, "more_body": False})
+                    return
+                await send(start)
+            data = compressor.compress(body)
+            if not more:
+                data += compressor.flush()
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, wrapped_send)
+
+
+def _add_vary(headers: MutableHeaders) -> None:
+    vary: List[str] = [v.strip() for v in headers.get("vary", "").split(",") if v.strip()]
+    if not any(v.lower() in ("accept-encoding", "*") for v in vary):
+        vary.append("Accept-Encoding")
+        headers["Vary"] = ", ".join(vary)
+
+
+def _encoded_etag_header(etag: str, encoding: str) -> str:
+    # weak ETags already allow byte differences; only strong ones need a per-encoding tag
+    return etag if etag.startswith("W/") else encoded_etag(etag, encoding)
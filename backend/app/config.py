@@ -8,6 +8,10 @@ IS_PROD = ENV in ("prod", "production")
 # Feature flags derived from ENV
 ENABLE_DEV_ROUTES = IS_DEV
 ENABLE_CREATE_ALL = os.getenv("ENABLE_CREATE_ALL", "false").lower() in ("true", "1", "yes") or IS_DEV
+# Set by `python -m app.serve`; with several workers the master owns schema setup
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+MULTI_WORKER = WEB_CONCURRENCY > 1
+
 ENABLE_LOCAL_MEDIA = True   # allow serving /media in both, can be overridden later
 
 # CORS origins
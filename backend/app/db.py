@@ -1,14 +1,36 @@
+import logging
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import List, Optional
+
+from fastapi import Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL is not set. Start Postgres (docker) and set DATABASE_URL in backend/.env")
 
-# Fix Railway's postgresql:// to use psycopg (psycopg3) instead of psycopg2
-if DATABASE_URL.startswith("postgresql://"):
-    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg://", 1)
+
+def _normalize_url(url: str) -> str:
+    # Fix Railway's postgresql:// to use psycopg (psycopg3) instead of psycopg2
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+psycopg://", 1)
+    return url
+
+
+DATABASE_URL = _normalize_url(DATABASE_URL)
+
+log = logging.getLogger(__name__)
+
+# Optional read replicas (comma-separated); reads fall back to the primary when none are healthy
+DATABASE_REPLICA_URLS = [_normalize_url(u.strip()) for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+# After a user writes, their reads stay on the primary for this long (read-your-writes)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "10"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
 
 # Add connection parameters for database stability
 engine_args = {
@@ -23,8 +45,128 @@ engine = create_engine(DATABASE_URL, **engine_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-def get_db():
+# Session-cookie key holding the time of the user's last write
+WRITE_STAMP_KEY = "db_write_at"
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _mark_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+class Replica:
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        # unchecked replicas get no reads; the first check lands right after the first pick
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+
+
+class ReplicaRouter:
+    """Round-robin over healthy replicas.
+
+    Health and replication lag are re-checked every `check_interval` by one background
+    thread per process (started on the first `pick`, so forked workers get their own);
+    `pick` only reads the cached result and never waits on a replica.
+    """
+
+    def __init__(self, engines: List[Engine], max_lag: float = REPLICA_MAX_LAG_SECONDS, check_interval: float = REPLICA_CHECK_INTERVAL):
+        self.replicas = [Replica(e) for e in engines]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._next = 0
+        self._lock = threading.Lock()
+        self._checker_pid: Optional[int] = None
+
+    def pick(self) -> Optional[Engine]:
+        self._ensure_checker()
+        n = len(self.replicas)
+        for _ in range(n):
+            with self._lock:
+                replica = self.replicas[self._next % n]
+                self._next += 1
+            if replica.healthy:
+                return replica.engine
+        return None
+
+    def _ensure_checker(self) -> None:
+        pid = os.getpid()
+        if self._checker_pid == pid:
+            return
+        with self._lock:
+            if self._checker_pid == pid:
+                return
+            self._checker_pid = pid
+        threading.Thread(target=self._run_checks, name="replica-health", daemon=True).start()
+
+    def _run_checks(self) -> None:
+        while True:
+            self.check_all()
+            time.sleep(self.check_interval)
+
+    def check_all(self) -> None:
+        for replica in self.replicas:
+            self.check(replica)
+
+    def check(self, replica: Replica) -> None:
+        replica.checked_at = time.monotonic()
+        try:
+            with replica.engine.connect() as conn:
+                if replica.engine.dialect.name == "postgresql":
+                    # 0 when fully replayed; otherwise seconds behind the last replayed transaction
+                    replica.lag = float(conn.execute(text(
+                        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                    )).scalar() or 0)
+                else:
+                    conn.execute(text("SELECT 1"))
+                    replica.lag = 0.0
+            replica.healthy = replica.lag <= self.max_lag
+        except Exception as e:
+            replica.healthy = False
+            log.warning(
+                "replica unhealthy: %s: %s", type(e).__name__, e,
+                extra={"replica": replica.engine.url.render_as_string(hide_password=True)},
+            )
+
+    def status(self) -> list:
+        return [
+            {"url": r.engine.url.render_as_string(hide_password=True), "healthy": r.healthy, "lag": r.lag}
+            for r in self.replicas
+        ]
+
+
+replicas = ReplicaRouter([create_engine(url, **engine_args) for url in DATABASE_REPLICA_URLS])
+
+
+def wrote_recently(request: Request) -> bool:
+    if "session" not in request.scope:
+        return False
+    stamp = request.session.get(WRITE_STAMP_KEY)
+    return stamp is not None and time.time() - stamp < READ_YOUR_WRITES_SECONDS
+
+
+def get_db(request: Request):
+    """Primary session for writes. Writes pin the user's reads to the primary (and past shared caches) briefly."""
     db = SessionLocal()
+    try:
+        yield db
+        if db.info.get("wrote") and "session" in request.scope:
+            request.session[WRITE_STAMP_KEY] = time.time()
+    finally:
+        db.close()
+
+
+def read_session(sticky: bool = False):
+    """New session on a healthy replica (primary when `sticky` or none are available)."""
+    bind = replicas.pick() if replicas.replicas and not sticky else None
+    return SessionLocal(bind=bind) if bind is not None else SessionLocal()
+
+
+def get_read_db(request: Request):
+    """Session for read-only endpoints: a healthy replica unless the caller just wrote."""
+    db = read_session(sticky=wrote_recently(request))
     try:
         yield db
     finally:
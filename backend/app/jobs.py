@@ -0,0 +1,327 @@
+"""
+Background jobs for post-write work (republishing, cache warm-up, image variants).
+
+Jobs are plain functions registered by name with `@job(...)` (see app/tasks.py) and queued
+with `enqueue(name, *args, dedupe_key=...)`. Backends, chosen by JOBS_BACKEND:
+
+  local   (default) in-process thread/process pools; lost on restart
+  redis   durable list queue at REDIS_URL, drained by `python -m app.cli worker`
+          (at-least-once: jobs must be idempotent)
+  inline  run synchronously in the caller (tests, one-off scripts)
+
+Every backend applies the same per-job retries with exponential backoff, caps concurrency
+per job type, and de-duplicates by key while a job is still queued. Once a job starts the
+key is released: it may already have read stale state, so a new change must queue again.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+JOBS_BACKEND = os.getenv("JOBS_BACKEND", "local").lower()
+JOBS_THREADS = int(os.getenv("JOBS_THREADS", "4"))
+JOBS_PROCESSES = int(os.getenv("JOBS_PROCESSES", "2"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_PREFIX = os.getenv("JOBS_REDIS_PREFIX", "jobs")
+DEDUPE_TTL = int(os.getenv("JOBS_DEDUPE_TTL", "3600"))
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class JobSpec:
+    name: str
+    fn: Callable[..., Any]
+    pool: str = "thread"        # "thread" for I/O, "process" for CPU-bound work
+    max_concurrency: int = 2
+    retries: int = 3
+    backoff: float = 1.0        # seconds; doubles per attempt
+
+
+REGISTRY: Dict[str, JobSpec] = {}
+
+
+def job(name: str, pool: str = "thread", max_concurrency: int = 2, retries: int = 3, backoff: float = 1.0):
+    def register(fn):
+        REGISTRY[name] = JobSpec(name, fn, pool, max_concurrency, retries, backoff)
+        return fn
+    return register
+
+
+def _load_tasks() -> None:
+    # Registration happens on import; worker processes need it too
+    from . import tasks  # noqa: F401
+
+
+def _run_registered(name: str, args: tuple, kwargs: dict) -> Any:
+    """Process-pool entry point: look the job up by name in the child interpreter."""
+    _load_tasks()
+    return REGISTRY[name].fn(*args, **kwargs)
+
+
+@dataclass
+class _Job:
+    name: str
+    args: tuple
+    kwargs: dict
+    dedupe_key: Optional[str] = None
+    attempt: int = 0
+    # False when the caller (the Redis worker) schedules retries itself
+    local_retries: bool = True
+
+
+OnDone = Optional[Callable[[_Job, Optional[BaseException]], None]]
+
+
+class LocalExecutor:
+    """Thread/process pools with per-type concurrency caps, retries and de-duplication."""
+
+    def __init__(self, threads: int = JOBS_THREADS, processes: int = JOBS_PROCESSES):
+        self._threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="job")
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._process_count = processes
+        self._lock = threading.Lock()
+        self._running: Dict[str, int] = {}
+        self._waiting: Dict[str, Deque[Tuple[_Job, OnDone]]] = {}
+        self._keys: set = set()
+        self._timers: set = set()
+        self.stats = {"enqueued": 0, "deduped": 0, "succeeded": 0, "retried": 0, "failed": 0}
+
+    def submit(self, j: _Job, on_done: OnDone = None) -> bool:
+        spec = REGISTRY[j.name]
+        with self._lock:
+            if j.dedupe_key:
+                if j.dedupe_key in self._keys:
+                    self.stats["deduped"] += 1
+                    return False
+                self._keys.add(j.dedupe_key)
+            self.stats["enqueued"] += 1
+            if self._running.get(j.name, 0) >= spec.max_concurrency:
+                self._waiting.setdefault(j.name, deque()).append((j, on_done))
+                return True
+            self._running[j.name] = self._running.get(j.name, 0) + 1
+        self._start(j, on_done)
+        return True
+
+    def _start(self, j: _Job, on_done) -> None:
+        spec = REGISTRY[j.name]
+        if j.dedupe_key:
+            with self._lock:
+                self._keys.discard(j.dedupe_key)
+        if spec.pool == "process":
+            future = self._process_pool().submit(_run_registered, j.name, j.args, j.kwargs)
+        else:
+            future = self._threads.submit(spec.fn, *j.args, **j.kwargs)
+        future.add_done_callback(lambda f: self._finished(j, f.exception(), on_done))
+
+    def _finished(self, j: _Job, error: Optional[BaseException], on_done) -> None:
+        spec = REGISTRY[j.name]
+        retry = error is not None and j.local_retries and j.attempt < spec.retries
+        timer = None
+        if retry:
+            delay = spec.backoff * (2 ** j.attempt)
+            j.attempt += 1
+            timer = threading.Timer(delay, self._requeue, args=(j, on_done))
+            timer.daemon = True
+        with self._lock:
+            if retry:
+                self.stats["retried"] += 1
+                # registered before the running slot is released, so idle() never sees a gap
+                self._timers.add(timer)
+            elif error is not None:
+                self.stats["failed"] += 1
+            else:
+                self.stats["succeeded"] += 1
+            nxt = None
+            waiting = self._waiting.get(j.name)
+            if waiting:
+                nxt = waiting.popleft()
+            else:
+                self._running[j.name] -= 1
+        if error is not None and not retry and j.local_retries:
+            log.error("job %s failed after %d attempts", j.name, j.attempt + 1, exc_info=error)
+        if timer is not None:
+            timer.start()
+        elif on_done is not None:
+            on_done(j, error)
+        if nxt is not None:
+            self._start(*nxt)
+
+    def _requeue(self, j: _Job, on_done) -> None:
+        with self._lock:
+            # runs on the timer's own thread; the job takes over its place in idle()
+            self._timers.discard(threading.current_thread())
+            # the dedupe key stays held across retries, so bypass the check
+            if self._running.get(j.name, 0) >= REGISTRY[j.name].max_concurrency:
+                self._waiting.setdefault(j.name, deque()).append((j, on_done))
+                return
+            self._running[j.name] = self._running.get(j.name, 0) + 1
+        self._start(j, on_done)
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(max_workers=self._process_count)
+            return self._processes
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(self._running.values()) + sum(len(w) for w in self._waiting.values())
+
+    def idle(self) -> bool:
+        with self._lock:
+            return not any(self._waiting.values()) and not any(self._running.values()) and not self._timers
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            for t in self._timers:
+                t.cancel()
+            self._timers.clear()
+        self._threads.shutdown(wait=wait)
+        if self._processes is not None:
+            self._processes.shutdown(wait=wait)
+
+
+class RedisQueue:
+    """Durable queue: LPUSH on enqueue, BRPOPLPUSH into a processing list, delayed retries in a ZSET.
+
+    Jobs left in the processing list by a crashed worker are moved back on worker start.
+    """
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = REDIS_PREFIX):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.queue = f"{prefix}:queue"
+        self.processing = f"{prefix}:processing"
+        self.delayed = f"{prefix}:delayed"
+        self.dedupe_prefix = f"{prefix}:dedupe:"
+
+    def enqueue(self, j: _Job) -> bool:
+        if j.dedupe_key and not self.redis.set(self.dedupe_prefix + j.dedupe_key, 1, nx=True, ex=DEDUPE_TTL):
+            return False
+        self.redis.lpush(self.queue, self._dump(j))
+        return True
+
+    def work(self, executor: LocalExecutor, stop: threading.Event, max_inflight: int = 32) -> None:
+        # recover jobs a previous worker died holding
+        while self.redis.rpoplpush(self.processing, self.queue):
+            pass
+        while not stop.is_set():
+            self._promote_delayed()
+            if executor.pending() >= max_inflight:
+                time.sleep(0.05)
+                continue
+            raw = self.redis.brpoplpush(self.queue, self.processing, timeout=1)
+            if raw is None:
+                continue
+            j = self._load(raw)
+            if j.name not in REGISTRY:
+                log.warning("unknown job %r, dropping", j.name)
+                self.redis.lrem(self.processing, 1, raw)
+                continue
+            if j.dedupe_key:
+                self.redis.delete(self.dedupe_prefix + j.dedupe_key)
+            # the executor caps concurrency; retries stay in Redis so they survive restarts
+            j.dedupe_key, j.local_retries = None, False
+            executor.submit(j, on_done=lambda done, error, raw=raw: self._ack(done, error, raw))
+
+    def _ack(self, j: _Job, error: Optional[BaseException], raw: bytes) -> None:
+        spec = REGISTRY[j.name]
+        if error is not None and j.attempt < spec.retries:
+            retry = _Job(j.name, j.args, j.kwargs, attempt=j.attempt + 1)
+            self.redis.zadd(self.delayed, {self._dump(retry): time.time() + spec.backoff * (2 ** j.attempt)})
+        elif error is not None:
+            log.error("job %s failed after %d attempts", j.name, j.attempt + 1, exc_info=error)
+        self.redis.lrem(self.processing, 1, raw)
+
+    def _promote_delayed(self) -> None:
+        for raw in self.redis.zrangebyscore(self.delayed, 0, time.time()):
+            if self.redis.zrem(self.delayed, raw):
+                self.redis.lpush(self.queue, raw)
+
+    @staticmethod
+    def _dump(j: _Job) -> str:
+        return json.dumps({"name": j.name, "args": list(j.args), "kwargs": j.kwargs, "dedupe_key": j.dedupe_key, "attempt": j.attempt})
+
+    @staticmethod
+    def _load(raw: bytes) -> _Job:
+        d = json.loads(raw)
+        return _Job(d["name"], tuple(d["args"]), d["kwargs"], d.get("dedupe_key"), d.get("attempt", 0))
+
+
+_executor: Optional[LocalExecutor] = None
+_redis: Optional[RedisQueue] = None
+_init_lock = threading.Lock()
+
+
+def executor() -> LocalExecutor:
+    global _executor
+    with _init_lock:
+        if _executor is None:
+            _load_tasks()
+            _executor = LocalExecutor()
+        return _executor
+
+
+def redis_queue() -> RedisQueue:
+    global _redis
+    with _init_lock:
+        if _redis is None:
+            _load_tasks()
+            _redis = RedisQueue()
+        return _redis
+
+
+def enqueue(name: str, *args, dedupe_key: Optional[str] = None, **kwargs) -> bool:
+    """Queue a registered job; returns False when an identical (same dedupe_key) job is already pending."""
+    _load_tasks()
+    if name not in REGISTRY:
+        raise KeyError(f"Unknown job: {name}")
+    j = _Job(name, args, kwargs, dedupe_key)
+    if JOBS_BACKEND == "inline":
+        _run_inline(j)
+        return True
+    if JOBS_BACKEND == "redis":
+        return redis_queue().enqueue(j)
+    return executor().submit(j)
+
+
+def _run_inline(j: _Job) -> None:
+    spec = REGISTRY[j.name]
+    for attempt in range(spec.retries + 1):
+        try:
+            spec.fn(*j.args, **j.kwargs)
+            return
+        except Exception:
+            if attempt == spec.retries:
+                log.exception("job %s failed after %d attempts", j.name, attempt + 1)
+                return
+            time.sleep(spec.backoff * (2 ** attempt))
+
+
+def run_worker(threads: int = JOBS_THREADS, processes: int = JOBS_PROCESSES) -> None:
+    """Blocking Redis worker loop (python -m app.cli worker); stops on SIGINT/SIGTERM."""
+    import signal
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    queue = redis_queue()
+    local = LocalExecutor(threads=threads, processes=processes)
+    log.info("worker started", extra={"jobTypes": len(REGISTRY), "threads": threads, "processes": processes})
+    try:
+        queue.work(local, stop)
+    finally:
+        local.shutdown(wait=True)
+        log.info("worker stopped", extra=dict(local.stats))
+
+
+def shutdown(wait: bool = False) -> None:
+    if _executor is not None:
+        _executor.shutdown(wait=wait)
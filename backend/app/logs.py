@@ -0,0 +1,209 @@
+"""
+Structured, non-blocking logging with request correlation.
+
+`setup()` sends the `app.*` logger tree through a QueueHandler: the caller (event loop,
+request thread, job worker) only puts the record on an in-memory queue, and a
+QueueListener thread formats it and writes it out, so slow stdout/stderr never stalls a
+request. Each record carries the current request id (and trace id when the request is
+traced, see tracing.py) from contextvars, which follow requests into threadpool endpoints.
+
+`RequestContextMiddleware` assigns the request id (a safe incoming `X-Request-ID`, else a
+new one), echoes it on the response, wraps the request in a tracing span and writes one
+access line per request.
+
+Config:
+  LOG_LEVEL     default INFO
+  LOG_FORMAT    json | text (default json in production, text in development)
+  LOG_REQUESTS  one access line per request (default true)
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import tracing
+from .config import IS_DEV
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text" if IS_DEV else "json").lower()
+LOG_REQUESTS = os.getenv("LOG_REQUESTS", "true").lower() in ("true", "1", "yes")
+
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+# attributes every LogRecord has; anything else was passed via `extra=` and is logged as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id", "trace_id"}
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+log = logging.getLogger("app.request")
+
+
+def request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def _fields(record: logging.LogRecord) -> Dict:
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+
+
+class ContextFilter(logging.Filter):
+    """Stamp request/trace ids on the record in the emitting thread (contextvars don't cross the queue)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        record.trace_id = tracing.current_trace_id()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            out["requestId"] = record.request_id
+        if getattr(record, "trace_id", None):
+            out["traceId"] = record.trace_id
+        out.update(_fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        parts = [self.formatTime(record), record.levelname, record.name]
+        if getattr(record, "request_id", None):
+            parts.append(f"[{record.request_id}]")
+        parts.append(record.getMessage())
+        parts.extend(f"{k}={v}" for k, v in _fields(record).items())
+        line = " ".join(parts)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        return f"{line}\n{record.exc_text}" if record.exc_text else line
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # keep the traceback as its own field instead of QueueHandler's merged message text
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listeners: List[QueueListener] = []
+_configured_pid: Optional[int] = None
+
+
+def _route(logger: logging.Logger, handler: logging.Handler, level: str) -> None:
+    q: queue.SimpleQueue = queue.SimpleQueue()
+    qh = _QueueHandler(q)
+    qh.addFilter(ContextFilter())
+    logger.handlers[:] = [qh]
+    logger.setLevel(level)
+    logger.propagate = False
+    listener = QueueListener(q, handler, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+
+
+def setup(force: bool = False) -> None:
+    """Configure `app` logging (and the span exporter); idempotent per process."""
+    global _configured_pid
+    if _configured_pid == os.getpid() and not force:
+        return
+    shutdown()
+    _configured_pid = os.getpid()
+    out = logging.StreamHandler(sys.stdout)
+    out.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    _route(logging.getLogger("app"), out, LOG_LEVEL)
+    exporter = tracing.exporter_handler()
+    if exporter is not None:
+        _route(logging.getLogger(tracing.TRACE_LOGGER), exporter, "INFO")
+
+
+def shutdown() -> None:
+    """Drain the queues (records already logged are written) and stop the listener threads."""
+    while _listeners:
+        listener = _listeners.pop()
+        try:
+            listener.stop()
+        except Exception:
+            pass
+
+
+def _after_fork() -> None:
+    # listener threads don't survive fork: give each worker process its own
+    global _configured_pid
+    if _configured_pid is not None:
+        _listeners.clear()
+        _configured_pid = None
+        setup()
+
+
+atexit.register(shutdown)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+class RequestContextMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = Headers(scope=scope).get("x-request-id", "")
+        rid = incoming if _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+        token = _request_id.set(rid)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message)["X-Request-ID"] = rid
+            await send(message)
+
+        try:
+            with tracing.trace("http.request", method=scope["method"], path=scope["path"]) as span:
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    if span is not None:
+                        span.attrs["status"] = status
+                    if LOG_REQUESTS:
+                        log.info(
+                            "request",
+                            extra={
+                                "method": scope["method"],
+                                "path": scope["path"],
+                                "status": status,
+                                "durationMs": round((time.perf_counter() - started) * 1000, 2),
+                            },
+                        )
+        finally:
+            _request_id.reset(token)
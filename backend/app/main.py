@@ -1,4 +1,4 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 import os
@@ -8,8 +8,15 @@ from .routes.profiles import router as profiles_router
 from .routes.billing import router as billing_router
 from .routes.files import router as files_router
 from .routes.auth import router as auth_router
+from .routes.admin import router as admin_router
 from .db import Base, engine
-from fastapi.staticfiles import StaticFiles
+from .serializers import FastJSONResponse
+from .profiling import ProfilingMiddleware
+from .compression import CompressionMiddleware
+from .logs import RequestContextMiddleware
+from . import logs, migrations, jobs
+from .services import publisher, warmup
+from .media import MediaFiles
 from .config import (
     ENABLE_CREATE_ALL,
     ENABLE_DEV_ROUTES,
@@ -17,8 +24,12 @@ from .config import (
     FRONTEND_ORIGIN,
     SESSION_SECRET,
     IS_PROD,
+    MULTI_WORKER,
 )
 
+# queued JSON logs (and the span exporter) before anything logs
+logs.setup()
+
 app = FastAPI(title="QR Business Card API", version="0.1.0")
 
 # CORS Configuration
@@ -53,13 +64,31 @@ app.add_middleware(
 # Cookie sessions for auth
 app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET, same_site="lax", https_only=False)
 
+# gzip/br for API responses; scan routes serve their own precompressed cache entries
+app.add_middleware(CompressionMiddleware)
+
+# Server-Timing, SQL trace / N+1 warnings and opt-in stack profiles
+app.add_middleware(ProfilingMiddleware)
+
+# Outermost: request id (X-Request-ID), sampled tracing root span and the access log line
+app.add_middleware(RequestContextMiddleware)
+
 @app.get("/healthz")
 def healthz():
     return {"ok": True}
 
+@app.get("/readyz")
+def readyz():
+    # 503 until the pool is open and hot slugs are cached (or WARMUP_TIMEOUT passed)
+    snapshot = warmup.status.snapshot()
+    return FastJSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
+
 @app.get("/admin/init-db")
 def init_db():
     """Temporary endpoint to manually trigger table creation and see errors"""
+    if MULTI_WORKER:
+        # schema setup belongs to the serve master; workers must not race on DDL
+        raise HTTPException(status_code=404, detail="Not Found")
     try:
         Base.metadata.create_all(bind=engine)
         return {"success": True, "message": "Tables created successfully"}
@@ -70,23 +99,34 @@ def init_db():
 # Table creation on startup
 @app.on_event("startup")
 def on_startup():
-    if ENABLE_CREATE_ALL:
-        Base.metadata.create_all(bind=engine)
-    # One-time table creation for production if tables don't exist
-    elif IS_PROD:
-        try:
-            from sqlalchemy import inspect
-            inspector = inspect(engine)
-            if not inspector.get_table_names():
-                Base.metadata.create_all(bind=engine)
-        except Exception:
-            pass  # Tables might already exist
+    if MULTI_WORKER:
+        return  # app.serve ran create_all/migrations once before forking
+    if ENABLE_CREATE_ALL or IS_PROD:
+        # prod databases that already have tables still need new migrations (stored vCards, indexes)
+        migrations.ensure_schema(engine, create_all=ENABLE_CREATE_ALL)
+
+@app.on_event("startup")
+def start_warmup():
+    # runs in every worker: caches and pools are per process
+    warmup.start()
+
+@app.on_event("startup")
+def start_expiry_sweep():
+    # a trial running out writes nothing, so pre-published cards are removed on a timer;
+    # every worker starts it, the SweepLease holder is the only one that sweeps
+    publisher.start_expiry_sweep()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    # don't block shutdown on queued post-write work; it is rebuildable (publish-vcards, warm-up)
+    jobs.shutdown(wait=False)
 
 app.include_router(vcf_router)
 app.include_router(profiles_router, prefix="/api")
 app.include_router(files_router, prefix="/api")
 app.include_router(billing_router, prefix="/api")
 app.include_router(auth_router, prefix="/auth")
+app.include_router(admin_router, prefix="/admin")
 if ENABLE_DEV_ROUTES:
     from .routes.dev import router as dev_router
     app.include_router(dev_router, prefix="/dev")
@@ -94,6 +134,7 @@ if ENABLE_DEV_ROUTES:
 # Serve local media at /media (for local hosting option)
 if ENABLE_LOCAL_MEDIA:
     media_dir = os.getenv("UPLOAD_DIR", os.path.join(os.getcwd(), "media"))
-    # Ensure directory exists before mounting (StaticFiles checks at import time)
+    # Ensure directory exists before mounting
     os.makedirs(media_dir, exist_ok=True)
-    app.mount("/media", StaticFiles(directory=media_dir), name="media")
+    # Immutable caching for uuid keys, ETag/Range support and AVIF/WebP negotiation
+    app.mount("/media", MediaFiles(directory=media_dir), name="media")
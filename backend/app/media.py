@@ -0,0 +1,355 @@
+import mimetypes
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from email.utils import formatdate
+from typing import Dict, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.types import Receive, Scope, Send
+
+# Photo keys end in a random uuid4 hex (legacy) or the SHA-256 of the bytes, so their bytes never change.
+UUID_KEY_RE = re.compile(r"(?:^|/)[0-9a-f]{32}(?:[0-9a-f]{32})?(?:\.[A-Za-z0-9]+)?$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = os.getenv("MEDIA_CACHE_CONTROL", "public, max-age=300")
+MEDIA_INDEX_MAX = int(os.getenv("MEDIA_INDEX_MAX", "10000"))
+# Re-stat after this long so variants/deletions from other processes (jobs, GC) show up
+MEDIA_INDEX_TTL = float(os.getenv("MEDIA_INDEX_TTL", "60"))
+CHUNK_SIZE = 64 * 1024
+
+# Pre-encoded siblings stored next to the original as "<key><suffix>", best first.
+IMAGE_VARIANTS = (("image/avif", ".avif"), ("image/webp", ".webp"))
+ENCODING_VARIANTS = (("br", ".br"), ("gzip", ".gz"))
+CONTENT_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".avif": "image/avif",
+    ".svg": "image/svg+xml",
+    ".vcf": "text/vcard; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+    ".json": "application/json",
+}
+
+
+@dataclass
+class MediaEntry:
+    path: str
+    size: int
+    mtime: float
+    content_type: str
+    etag: str
+    last_modified: str
+    encoding: Optional[str] = None
+    loaded_at: float = 0.0
+    # media type -> entry for pre-encoded image variants, encoding -> entry for .br/.gz
+    images: Dict[str, "MediaEntry"] = field(default_factory=dict)
+    encodings: Dict[str, "MediaEntry"] = field(default_factory=dict)
+
+    @property
+    def vary(self) -> Optional[str]:
+        parts = []
+        if self.images:
+            parts.append("Accept")
+        if self.encodings:
+            parts.append("Accept-Encoding")
+        return ", ".join(parts) or None
+
+
+def _content_type(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in CONTENT_TYPES:
+        return CONTENT_TYPES[ext]
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def _stat_entry(path: str, content_type: Optional[str] = None, encoding: Optional[str] = None) -> Optional[MediaEntry]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not os.path.isfile(path):
+        return None
+    return MediaEntry(
+        path=path,
+        size=st.st_size,
+        mtime=st.st_mtime,
+        content_type=content_type or _content_type(path),
+        etag=f'"{st.st_size:x}-{int(st.st_mtime * 1_000_000):x}{"-" + encoding if encoding else ""}"',
+        last_modified=formatdate(st.st_mtime, usegmt=True),
+        encoding=encoding,
+    )
+
+
+class MediaIndex:
+    """Bounded in-memory map of media key -> stat metadata, so hot files are not stat'ed per request."""
+
+    def __init__(self, max_entries: int = MEDIA_INDEX_MAX, ttl: float = MEDIA_INDEX_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], MediaEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def peek(self, directory: str, key: str) -> Optional[MediaEntry]:
+        cache_key = (directory, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.loaded_at >= self.ttl:
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            return entry
+
+    def get(self, directory: str, key: str) -> Optional[MediaEntry]:
+        entry = self.peek(directory, key)
+        if entry is not None:
+            return entry
+        cache_key = (directory, key)
+        entry = self._load(directory, key)
+        if entry is None:
+            return None
+        with self._lock:
+            self._entries[cache_key] = entry
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                return
+            key = key.lstrip("/")
+            # A new variant sibling ("<key>.avif", "<key>.gz") changes what the original can negotiate.
+            keys = {key}
+            for _, suffix in IMAGE_VARIANTS + ENCODING_VARIANTS:
+                if key.endswith(suffix):
+                    keys.add(key[: -len(suffix)])
+            for cache_key in [k for k in self._entries if k[1] in keys]:
+                del self._entries[cache_key]
+
+    def _load(self, directory: str, key: str) -> Optional[MediaEntry]:
+        path = os.path.realpath(os.path.join(directory, key))
+        if os.path.commonpath([directory, path]) != directory:
+            return None
+        entry = _stat_entry(path)
+        if entry is None:
+            return None
+        entry.loaded_at = time.monotonic()
+        if entry.content_type.startswith("image/"):
+            for media_type, suffix in IMAGE_VARIANTS:
+                if media_type == entry.content_type:
+                    continue
+                variant = _stat_entry(path + suffix, content_type=media_type)
+                if variant is not None:
+                    entry.images[media_type] = variant
+        else:
+            for encoding, suffix in ENCODING_VARIANTS:
+                variant = _stat_entry(path + suffix, content_type=entry.content_type, encoding=encoding)
+                if variant is not None:
+                    entry.encodings[encoding] = variant
+        return entry
+
+
+index = MediaIndex()
+
+
+def _accepts(header: str, token: str) -> bool:
+    for part in header.split(","):
+        name, *params = [p.strip() for p in part.split(";")]
+        if name.lower() != token:
+            continue
+        for param in params:
+            k, _, v = param.partition("=")
+            if k.strip().lower() == "q":
+                try:
+                    return float(v) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` range into (start, end) inclusive; raise ValueError when unsatisfiable.
+
+    Multi-range requests return None so the full body is served, which RFC 9110 allows.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    if not (first.isdigit() or first == "") or not (last.isdigit() or last == "") or first == last == "":
+        return None
+    if first == "":
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError("empty suffix range")
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size:
+        raise ValueError("range not satisfiable")
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+class MediaFiles:
+    """ASGI app serving UPLOAD_DIR with immutable caching, ETags, Range and variant negotiation.
+
+    Drop-in replacement for `StaticFiles` on the `/media` mount. Full bodies and ranges go out
+    through the ASGI zero-copy (sendfile) or pathsend extensions when the server offers them,
+    otherwise they are streamed in chunks off the event loop.
+    """
+
+    def __init__(self, directory: str, media_index: Optional[MediaIndex] = None):
+        self.directory = os.path.realpath(directory)
+        self.index = media_index or index
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+        method = scope["method"]
+        if method not in ("GET", "HEAD"):
+            await self._send_status(send, 405, {"allow": "GET, HEAD"})
+            return
+        key = self._route_key(scope)
+        entry = None
+        if key:
+            # Index hits stay on the event loop; only misses pay for a threadpool stat().
+            entry = self.index.peek(self.directory, key)
+            if entry is None:
+                entry = await anyio.to_thread.run_sync(self.index.get, self.directory, key)
+        if entry is None:
+            await self._send_status(send, 404)
+            return
+
+        request_headers = Headers(scope=scope)
+        chosen = self._negotiate(entry, request_headers)
+        headers = {
+            "content-type": chosen.content_type,
+            "etag": chosen.etag,
+            "last-modified": chosen.last_modified,
+            "cache-control": IMMUTABLE_CACHE_CONTROL if UUID_KEY_RE.search(key) else DEFAULT_CACHE_CONTROL,
+            "accept-ranges": "bytes",
+        }
+        if entry.vary:
+            headers["vary"] = entry.vary
+        if chosen.encoding:
+            headers["content-encoding"] = chosen.encoding
+
+        if self._not_modified(chosen, request_headers):
+            headers.pop("content-type")
+            await self._send_status(send, 304, headers)
+            return
+
+        start, length, status = 0, chosen.size, 200
+        range_header = request_headers.get("range")
+        if range_header and self._if_range_matches(chosen, request_headers):
+            try:
+                byte_range = _parse_range(range_header, chosen.size)
+            except ValueError:
+                await self._send_status(send, 416, {"content-range": f"bytes */{chosen.size}"})
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                length = end - start + 1
+                status = 206
+                headers["content-range"] = f"bytes {start}-{end}/{chosen.size}"
+
+        headers["content-length"] = str(length)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()],
+        })
+        if method == "HEAD" or length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        await self._send_file(scope, send, chosen, start, length)
+
+    def _route_key(self, scope: Scope) -> Optional[str]:
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        key = os.path.normpath(path.lstrip("/"))
+        if key in ("", ".") or key.startswith("..") or os.path.isabs(key):
+            return None
+        return key.replace(os.sep, "/")
+
+    def _negotiate(self, entry: MediaEntry, headers: Headers) -> MediaEntry:
+        if entry.images:
+            accept = headers.get("accept", "")
+            for media_type, _ in IMAGE_VARIANTS:
+                if media_type in entry.images and _accepts(accept, media_type):
+                    return entry.images[media_type]
+        if entry.encodings:
+            accept_encoding = headers.get("accept-encoding", "")
+            for encoding, _ in ENCODING_VARIANTS:
+                if encoding in entry.encodings and _accepts(accept_encoding, encoding):
+                    return entry.encodings[encoding]
+        return entry
+
+    @staticmethod
+    def _not_modified(entry: MediaEntry, headers: Headers) -> bool:
+        if_none_match = headers.get("if-none-match")
+        if if_none_match:
+            tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+            return "*" in tags or entry.etag in tags
+        return headers.get("if-modified-since") == entry.last_modified
+
+    @staticmethod
+    def _if_range_matches(entry: MediaEntry, headers: Headers) -> bool:
+        if_range = headers.get("if-range")
+        return not if_range or if_range in (entry.etag, entry.last_modified)
+
+    @staticmethod
+    async def _send_status(send: Send, status: int, headers: Optional[Dict[str, str]] = None) -> None:
+        headers = dict(headers or {})
+        headers.setdefault("content-length", "0")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()],
+        })
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    @staticmethod
+    async def _send_file(scope: Scope, send: Send, entry: MediaEntry, start: int, length: int) -> None:
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            with open(entry.path, "rb") as f:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f.fileno(),
+                    "offset": start,
+                    "count": length,
+                    "more_body": False,
+                })
+            return
+        if "http.response.pathsend" in extensions and start == 0 and length == entry.size:
+            await send({"type": "http.response.pathsend", "path": entry.path})
+            return
+        remaining = length
+        async with await anyio.open_file(entry.path, "rb") as f:
+            if start:
+                await f.seek(start)
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # File shrank underneath us; close the response rather than hang the client.
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
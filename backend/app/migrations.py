@@ -0,0 +1,172 @@
+"""
+Idempotent, dialect-aware schema migrations applied on top of `create_all`.
+
+`create_all` only creates missing tables; anything that changes an existing table
+(new indexes, column type changes, FTS side tables) goes here. Applied ids are
+recorded in `schema_migrations`, so `upgrade()` is safe to run on every deploy:
+
+  python -m app.cli migrate
+
+Production startup runs `ensure_schema()` as well (once in the `app.serve` master, or in
+the single process), so a deploy never serves a model newer than its tables.
+"""
+from typing import Callable, Dict, List, Tuple, Union
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from .db import engine as default_engine
+
+_SQLITE_FTS_ROW = (
+    "new.id, new.user_id, new.full_name, coalesce(new.org, ''), coalesce(new.title, ''), "
+    "coalesce((SELECT group_concat(json_extract(value, '$.address'), ' ') FROM json_each(new.emails)), '')"
+)
+
+Step = Union[str, Callable[[Connection], None]]
+
+
+def add_column(table: str, column: str, ddl: str) -> Callable[[Connection], None]:
+    """ALTER TABLE ... ADD COLUMN unless create_all already made it (SQLite has no IF NOT EXISTS here)."""
+    def step(conn: Connection) -> None:
+        if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return step
+
+
+# (id, {dialect: [SQL or callable steps]}) in apply order. Never edit an applied migration; add a new one.
+MIGRATIONS: List[Tuple[str, Dict[str, List[Step]]]] = [
+    ("0001_profiles_search_indexes", {
+        "postgresql": [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            "ALTER TABLE profiles ALTER COLUMN phones TYPE jsonb USING phones::jsonb",
+            "ALTER TABLE profiles ALTER COLUMN emails TYPE jsonb USING emails::jsonb",
+            "ALTER TABLE profiles ALTER COLUMN address TYPE jsonb USING address::jsonb",
+            "ALTER TABLE profiles ALTER COLUMN social TYPE jsonb USING social::jsonb",
+            "CREATE INDEX IF NOT EXISTS ix_profiles_user_id ON profiles (user_id)",
+            "CREATE INDEX IF NOT EXISTS ix_profiles_full_name_trgm ON profiles USING gin (lower(full_name) gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS ix_profiles_org_trgm ON profiles USING gin (lower(org) gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS ix_profiles_title_trgm ON profiles USING gin (lower(title) gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS ix_profiles_emails_trgm ON profiles USING gin (lower(emails::text) gin_trgm_ops)",
+        ],
+        "sqlite": [
+            "CREATE INDEX IF NOT EXISTS ix_profiles_user_id ON profiles (user_id)",
+            "CREATE VIRTUAL TABLE IF NOT EXISTS profiles_fts USING fts5("
+            "profile_id UNINDEXED, user_id UNINDEXED, full_name, org, title, emails)",
+            "INSERT INTO profiles_fts (profile_id, user_id, full_name, org, title, emails) "
+            "SELECT " + _SQLITE_FTS_ROW.replace("new.", "profiles.") + " FROM profiles",
+            "CREATE TRIGGER IF NOT EXISTS profiles_fts_ai AFTER INSERT ON profiles BEGIN "
+            "INSERT INTO profiles_fts (profile_id, user_id, full_name, org, title, emails) "
+            f"VALUES ({_SQLITE_FTS_ROW}); END",
+            "CREATE TRIGGER IF NOT EXISTS profiles_fts_ad AFTER DELETE ON profiles BEGIN "
+            "DELETE FROM profiles_fts WHERE profile_id = old.id; END",
+            "CREATE TRIGGER IF NOT EXISTS profiles_fts_au AFTER UPDATE ON profiles BEGIN "
+            "DELETE FROM profiles_fts WHERE profile_id = old.id; "
+            "INSERT INTO profiles_fts (profile_id, user_id, full_name, org, title, emails) "
+            f"VALUES ({_SQLITE_FTS_ROW}); END",
+        ],
+    }),
+    ("0002_photo_refs", {
+        "postgresql": [
+            "CREATE TABLE IF NOT EXISTS photo_refs ("
+            "profile_id VARCHAR(32) PRIMARY KEY, key VARCHAR(512) NOT NULL, "
+            "updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now())",
+            "CREATE INDEX IF NOT EXISTS ix_photo_refs_key ON photo_refs (key)",
+        ],
+        "sqlite": [
+            "CREATE TABLE IF NOT EXISTS photo_refs ("
+            "profile_id VARCHAR(32) PRIMARY KEY, key VARCHAR(512) NOT NULL, "
+            "updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP)",
+            "CREATE INDEX IF NOT EXISTS ix_photo_refs_key ON photo_refs (key)",
+        ],
+    }),
+    # rows are filled by `python -m app.cli render-vcards`; until then scans render on the fly
+    ("0003_profiles_prerendered_vcard", {
+        "postgresql": [
+            add_column("profiles", "vcard", "BYTEA"),
+            add_column("profiles", "vcard_hash", "VARCHAR(64)"),
+            add_column("profiles", "vcard_length", "INTEGER"),
+            add_column("profiles", "vcard_version", "SMALLINT"),
+        ],
+        "sqlite": [
+            add_column("profiles", "vcard", "BLOB"),
+            add_column("profiles", "vcard_hash", "VARCHAR(64)"),
+            add_column("profiles", "vcard_length", "INTEGER"),
+            add_column("profiles", "vcard_version", "SMALLINT"),
+        ],
+    }),
+    ("0004_slug_aliases", {
+        "postgresql": [
+            "CREATE TABLE IF NOT EXISTS slug_aliases ("
+            "slug VARCHAR(64) PRIMARY KEY, profile_id VARCHAR(32) NOT NULL, "
+            "created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now())",
+            "CREATE INDEX IF NOT EXISTS ix_slug_aliases_profile_id ON slug_aliases (profile_id)",
+        ],
+        "sqlite": [
+            "CREATE TABLE IF NOT EXISTS slug_aliases ("
+            "slug VARCHAR(64) PRIMARY KEY, profile_id VARCHAR(32) NOT NULL, "
+            "created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP)",
+            "CREATE INDEX IF NOT EXISTS ix_slug_aliases_profile_id ON slug_aliases (profile_id)",
+        ],
+    }),
+    # users.provision stores normalized emails; rows that would collide with an existing
+    # lowercase address are left for a manual merge
+    ("0005_users_lowercase_email", {
+        "postgresql": [
+            "UPDATE users SET email = lower(trim(email)) WHERE email <> lower(trim(email)) "
+            "AND NOT EXISTS (SELECT 1 FROM users AS u WHERE u.email = lower(trim(users.email)))",
+        ],
+        "sqlite": [
+            "UPDATE users SET email = lower(trim(email)) WHERE email <> lower(trim(email)) "
+            "AND NOT EXISTS (SELECT 1 FROM users AS u WHERE u.email = lower(trim(users.email)))",
+        ],
+    }),
+    # warmup.top_slugs orders every worker's start-up query by updated_at
+    ("0006_profiles_updated_at_index", {
+        "postgresql": ["CREATE INDEX IF NOT EXISTS ix_profiles_updated_at ON profiles (updated_at)"],
+        "sqlite": ["CREATE INDEX IF NOT EXISTS ix_profiles_updated_at ON profiles (updated_at)"],
+    }),
+]
+
+
+def ensure_schema(engine: Engine = default_engine, create_all: bool = False) -> List[str]:
+    """create_all (when asked, or on an empty database), then every pending migration."""
+    from . import models  # noqa: F401  registers every table on Base.metadata
+    from .db import Base
+
+    if create_all or not inspect(engine).get_table_names():
+        Base.metadata.create_all(bind=engine)
+    return upgrade(engine)
+
+
+def applied(engine: Engine = default_engine) -> List[str]:
+    with engine.begin() as conn:
+        _ensure_table(conn)
+        return [r[0] for r in conn.execute(text("SELECT id FROM schema_migrations ORDER BY id"))]
+
+
+def upgrade(engine: Engine = default_engine) -> List[str]:
+    """Apply pending migrations for the engine's dialect; returns the ids applied now."""
+    dialect = engine.dialect.name
+    done = set(applied(engine))
+    ran = []
+    for mid, steps in MIGRATIONS:
+        if mid in done:
+            continue
+        # one transaction per migration so a failure leaves earlier ones recorded
+        with engine.begin() as conn:
+            for step in steps.get(dialect, []):
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(text(step))
+            conn.execute(text("INSERT INTO schema_migrations (id) VALUES (:id)"), {"id": mid})
+        ran.append(mid)
+    return ran
+
+
+def _ensure_table(conn) -> None:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "id VARCHAR(128) PRIMARY KEY, "
+        "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    ))
@@ -1,5 +1,7 @@
-from sqlalchemy import Column, String, DateTime, Boolean
+from sqlalchemy import Column, String, DateTime, Boolean, Integer, LargeBinary, SmallInteger, event, inspect
 from sqlalchemy import JSON
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from .db import Base
 import uuid
@@ -7,11 +9,14 @@ import uuid
 def gen_uuid() -> str:
     return uuid.uuid4().hex
 
+# JSONB on Postgres (indexable, no re-parse on read); plain JSON elsewhere (SQLite)
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
 class Profile(Base):
     __tablename__ = "profiles"
 
     id = Column(String(32), primary_key=True, default=gen_uuid)
-    user_id = Column(String(32), nullable=True)
+    user_id = Column(String(32), nullable=True, index=True)
     slug = Column(String(64), unique=True, nullable=False, index=True)
 
     # Core fields
@@ -25,13 +30,60 @@ class Profile(Base):
     note = Column(String(2048), nullable=True)
     photo_url = Column(String(2048), nullable=True)
 
-    # Structured fields stored as JSON
-    phones = Column(JSON, nullable=False, default=list)
-    emails = Column(JSON, nullable=False, default=list)
-    address = Column(JSON, nullable=False, default=dict)
-    social = Column(JSON, nullable=False, default=dict)
+    # Structured fields stored as JSON (search indexes live in migrations.py)
+    phones = Column(JSONType, nullable=False, default=list)
+    emails = Column(JSONType, nullable=False, default=list)
+    address = Column(JSONType, nullable=False, default=dict)
+    social = Column(JSONType, nullable=False, default=dict)
 
     active = Column(Boolean, nullable=False, default=True)
 
+    # build_vcard output kept in sync on every write (services/prerender.py), so scans
+    # return these bytes verbatim; NULL or an old version means "render on read".
+    # Deferred so list/search/editor loads don't pull the blob; scans select it explicitly
+    vcard = deferred(Column(LargeBinary, nullable=True))
+    vcard_hash = Column(String(64), nullable=True)
+    vcard_length = Column(Integer, nullable=True)
+    vcard_version = Column(SmallInteger, nullable=True)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # index: warmup.top_slugs reads the most recently updated cards (migration 0006)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False, index=True)
+
+
+# Card fields that feed build_vcard; changing any of them re-renders the stored vCard
+CARD_COLUMNS = (
+    "full_name", "first_name", "last_name", "org", "title", "url", "note", "photo_url",
+    "phones", "emails", "address", "social",
+)
+
+
+@event.listens_for(Profile, "before_insert")
+@event.listens_for(Profile, "before_update")
+def _prerender_vcard(mapper, connection, target):
+    from .services import prerender
+
+    state = inspect(target)
+    if state.persistent and prerender.is_current(target) and not any(
+        state.attrs[c].history.has_changes() for c in CARD_COLUMNS
+    ):
+        return
+    prerender.apply(target)
+
+
+class PhotoRef(Base):
+    """Storage key a profile's photo_url points at; photo GC keeps every key referenced here."""
+    __tablename__ = "photo_refs"
+
+    profile_id = Column(String(32), primary_key=True)
+    key = Column(String(512), nullable=False, index=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class SlugAlias(Base):
+    """A slug a profile used to have (printed QR codes); scans of it resolve to the profile."""
+    __tablename__ = "slug_aliases"
+
+    slug = Column(String(64), primary_key=True)
+    profile_id = Column(String(32), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -1,11 +1,18 @@
-from sqlalchemy import Column, String, DateTime, Boolean
+from sqlalchemy import Column, String, DateTime, Boolean, false
 from sqlalchemy.sql import func
 from .db import Base
 import uuid
+from datetime import datetime, timezone
 
 def gen_uuid() -> str:
     return uuid.uuid4().hex
 
+def as_utc(dt: datetime | None) -> datetime | None:
+    # SQLite returns naive datetimes even for DateTime(timezone=True); values are stored as UTC
+    if dt is not None and dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
 class User(Base):
     __tablename__ = "users"
 
@@ -16,7 +23,8 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     # Monetization
     trial_ends_at = Column(DateTime(timezone=True), nullable=True)
-    sub_active = Column(Boolean, nullable=False, server_default='false')
+    # false() renders per dialect; a literal 'false' string is truthy on SQLite
+    sub_active = Column(Boolean, nullable=False, server_default=false())
     sub_ends_at = Column(DateTime(timezone=True), nullable=True)
     plan = Column(String(64), nullable=True)
     stripe_customer_id = Column(String(128), nullable=True)
@@ -0,0 +1,219 @@
+"""
+Opt-in per-request profiling.
+
+A request is traced when any of these hold:
+  - SQL_TRACE is on (default in development): SQL trace, repeated-query warnings, Server-Timing
+  - PROFILE_SAMPLE_RATE > 0 and the request is sampled
+  - the request sends `X-Profile: 1` (development) or `X-Profile: <PROFILE_TOKEN>`
+
+Traced requests get a `Server-Timing` header (db, render, serialize, total). Sampled or
+header-triggered requests additionally run a stack sampler and write the collapsed stacks
+and SQL trace (statement, duration, rows) to PROFILE_DIR/<id>.json; the response carries
+`X-Profile-Id: <id>`.
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+import warnings
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import tracing
+from .config import IS_DEV
+
+SQL_TRACE = os.getenv("SQL_TRACE", "true" if IS_DEV else "false").lower() in ("true", "1", "yes")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.getcwd(), "profiles"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+# Same statement this many times in one request -> RepeatedQueryWarning (likely N+1)
+REPEATED_QUERY_THRESHOLD = int(os.getenv("REPEATED_QUERY_THRESHOLD", "5"))
+
+_NUMBERS = re.compile(r"\b\d+\b")
+
+
+class RepeatedQueryWarning(UserWarning):
+    """The same SQL statement ran repeatedly within one request (likely an N+1 pattern)."""
+
+
+class RequestTrace:
+    def __init__(self, method: str, path: str, sample_stacks: bool):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.queries: List[Dict] = []
+        self.phases: Dict[str, float] = {}
+        self.threads = {threading.get_ident()}
+        self.sampler: Optional[StackSampler] = StackSampler(self) if sample_stacks else None
+        self._lock = threading.Lock()
+
+    def add_query(self, statement: str, duration: float, rows: int) -> None:
+        with self._lock:
+            self.queries.append({"statement": statement, "ms": round(duration * 1000, 3), "rows": rows})
+            self.phases["db"] = self.phases.get("db", 0.0) + duration
+            self.threads.add(threading.get_ident())
+
+    def add_phase(self, name: str, duration: float) -> None:
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + duration
+            self.threads.add(threading.get_ident())
+
+    def repeated(self, threshold: int = REPEATED_QUERY_THRESHOLD) -> List[tuple]:
+        counts = Counter(_NUMBERS.sub("?", q["statement"]) for q in self.queries)
+        return [(stmt, n) for stmt, n in counts.items() if n >= threshold]
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.started
+        parts = []
+        for name in ("db", "render", "serialize"):
+            if name in self.phases:
+                desc = f';desc="{len(self.queries)} queries"' if name == "db" else ""
+                parts.append(f"{name};dur={self.phases[name] * 1000:.2f}{desc}")
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+    def dump(self) -> str:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{self.id}.json")
+        data = {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "phases_ms": {k: round(v * 1000, 3) for k, v in self.phases.items()},
+            "queries": self.queries,
+            "repeated": [{"statement": s, "count": n} for s, n in self.repeated()],
+            # collapsed "frame;frame;frame count" lines, ready for flamegraph tooling
+            "stacks": [f"{stack} {n}" for stack, n in self.sampler.stacks.most_common()] if self.sampler else [],
+        }
+        with open(path, "w") as f:
+            json.dump(data, f, indent=1)
+        return path
+
+
+class StackSampler:
+    """Samples the stacks of the threads a request has touched (event loop + threadpool)."""
+
+    def __init__(self, trace: RequestTrace, interval: float = PROFILE_INTERVAL):
+        self.trace = trace
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profile-{trace.id}", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in list(self.trace.threads):
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+
+_current: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def current() -> Optional[RequestTrace]:
+    return _current.get()
+
+
+@contextmanager
+def timed(phase: str):
+    """Attribute the enclosed block to a Server-Timing phase of the current request (if traced),
+    and to a tracing span of the same name (if the request is sampled for tracing)."""
+    trace = _current.get()
+    with tracing.span(phase):
+        if trace is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            trace.add_phase(phase, time.perf_counter() - start)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _current.get()
+    if trace is None:
+        return
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    trace.add_query(statement, time.perf_counter() - starts.pop(), cursor.rowcount)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requested = Headers(scope=scope).get("x-profile")
+        sample = bool(requested) and (IS_DEV or (PROFILE_TOKEN and requested == PROFILE_TOKEN))
+        sample = sample or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+        if not (sample or SQL_TRACE):
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(scope["method"], scope["path"], sample_stacks=sample)
+        token = _current.set(trace)
+        if trace.sampler:
+            trace.sampler.start()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", trace.server_timing())
+                if trace.sampler:
+                    headers.append("X-Profile-Id", trace.id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if trace.sampler:
+                trace.sampler.stop()
+                trace.dump()
+            for statement, count in trace.repeated():
+                warnings.warn(
+                    f"{scope['method']} {scope['path']} ran the same statement {count}x (possible N+1): {statement}",
+                    RepeatedQueryWarning,
+                    stacklevel=2,
+                )
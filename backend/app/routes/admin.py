@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import List, Literal, Optional
+import hmac
+import os
+
+from ..config import IS_DEV
+from ..db import get_db, replicas
+from ..services import users
+from ..services.cache import pages, vcards
+
+router = APIRouter()
+
+# Bearer token for /admin/* endpoints; without it they only exist in development
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+MAX_PROVISION_MEMBERS = 10000
+
+
+def require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        if IS_DEV:
+            return
+        raise HTTPException(status_code=404, detail="Not found")
+    supplied = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(supplied, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Admin token required")
+
+
+class Member(BaseModel):
+    email: str
+    name: Optional[str] = None
+    trialDays: Optional[int] = Field(None, ge=0, le=3650)
+
+
+class ProvisionReq(BaseModel):
+    members: List[Member] = Field(..., max_length=MAX_PROVISION_MEMBERS)
+    trialDays: int = Field(users.TRIAL_DAYS, ge=0, le=3650)
+    policy: Literal["backfill", "renew", "extend"] = "extend"
+
+
+@router.post("/users/provision", dependencies=[Depends(require_admin)])
+async def provision_users(req: ProvisionReq, db: Session = Depends(get_db)):
+    """Create or update team members and their trial windows in chunked upserts."""
+    return await run_in_threadpool(
+        users.provision_many, db, (m.model_dump() for m in req.members), req.trialDays, req.policy
+    )
+
+
+@router.get("/cache-stats", dependencies=[Depends(require_admin)])
+def cache_stats():
+    # hit/miss/coalesced/stale counters for the in-process scan caches, plus replica health
+    return {"caches": [vcards.snapshot(), pages.snapshot()], "replicas": replicas.status()}
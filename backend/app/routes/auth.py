@@ -1,15 +1,18 @@
 from fastapi import APIRouter, Request, Depends, HTTPException
 from fastapi.responses import RedirectResponse, JSONResponse
 from sqlalchemy.orm import Session
+import logging
 import os
-from datetime import datetime, timedelta, timezone
 
 from ..auth import oauth
-from ..db import get_db
+from ..db import get_db, get_read_db
 from ..models_user import User
 from ..config import IS_DEV, FRONTEND_ORIGIN
+from ..services import users
+from .. import tracing
 
 router = APIRouter()
+log = logging.getLogger(__name__)
 
 
 def _public_host(request: Request) -> str:
@@ -47,8 +50,7 @@ async def login(request: Request, db: Session = Depends(get_db)):
     redirect_uri = _public_host(request) + "/auth/callback"
     # Log computed values to server console for quick diagnosis in dev
     if IS_DEV:
-        print(f"[auth] Using GOOGLE_CLIENT_ID={client_id}")
-        print(f"[auth] Computed redirect_uri={redirect_uri}")
+        log.info("oauth login", extra={"client_id": client_id, "redirect_uri": redirect_uri})
     return await oauth.google.authorize_redirect(request, redirect_uri)
 
 
@@ -74,7 +76,8 @@ def auth_config(request: Request):
 @router.get("/callback")
 async def auth_callback(request: Request, db: Session = Depends(get_db)):
     try:
-        token = await oauth.google.authorize_access_token(request)
+        with tracing.span("oauth.exchange", provider="google"):
+            token = await oauth.google.authorize_access_token(request)
         userinfo = token.get('userinfo') or {}
         email = userinfo.get('email')
         if not email:
@@ -82,32 +85,9 @@ async def auth_callback(request: Request, db: Session = Depends(get_db)):
         name = userinfo.get('name')
         picture = userinfo.get('picture')
 
-        # upsert user
-        user = db.query(User).filter_by(email=email).first()
-        if not user:
-            # initialize trial period
-            trial_days = int(os.getenv('TRIAL_DAYS', '7'))
-            trial_ends = datetime.now(timezone.utc) + timedelta(days=trial_days)
-            user = User(email=email, name=name, picture=picture, trial_ends_at=trial_ends)
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-        else:
-            changed = False
-            if user.name != name:
-                user.name = name
-                changed = True
-            if user.picture != picture:
-                user.picture = picture
-                changed = True
-            # backfill trial end if missing
-            if user.trial_ends_at is None:
-                trial_days = int(os.getenv('TRIAL_DAYS', '7'))
-                user.trial_ends_at = datetime.now(timezone.utc) + timedelta(days=trial_days)
-                changed = True
-            if changed:
-                db.add(user)
-                db.commit()
+        # one upsert: trial starts on first login and is backfilled if missing
+        # (a backfilled trial flips entitlement; provision() notifies cached/published cards)
+        user = users.provision(db, email, name=name, picture=picture, policy="backfill")
 
         # set session
         request.session['user_id'] = user.id
@@ -116,15 +96,13 @@ async def auth_callback(request: Request, db: Session = Depends(get_db)):
         # Use config module instead of os.getenv to get correct value
         return RedirectResponse(url=FRONTEND_ORIGIN)
     except Exception as e:
-        # Log detailed error for debugging
-        import traceback
-        print(f"[auth/callback] ERROR: {type(e).__name__}: {str(e)}")
-        print(f"[auth/callback] Traceback:\n{traceback.format_exc()}")
+        # Log detailed error for debugging (queued: never blocks the event loop)
+        log.exception("oauth callback failed", extra={"error": type(e).__name__})
         raise HTTPException(status_code=400, detail=f"{type(e).__name__}: {str(e)}")
 
 
 @router.get("/me")
-def me(request: Request, db: Session = Depends(get_db)):
+def me(request: Request, db: Session = Depends(get_read_db)):
     uid = request.session.get('user_id')
     if not uid:
         return JSONResponse(status_code=200, content={"authenticated": False})
@@ -3,9 +3,8 @@ from sqlalchemy.orm import Session
 import os
 
 from ..db import get_db
-from ..models_user import User
 from ..models import Profile
-from datetime import datetime, timedelta, timezone
+from ..services import events, users
 
 router = APIRouter()
 
@@ -21,17 +20,8 @@ def _ensure_dev():
 def dev_login(request: Request, db: Session = Depends(get_db)):
     _ensure_dev()
     email = "dev@example.com"
-    user = db.query(User).filter_by(email=email).first()
-    if not user:
-        user = User(email=email, name="Dev User")
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-    # ensure dev user has a valid long trial
-    if user.trial_ends_at is None or user.trial_ends_at < datetime.now(timezone.utc):
-        user.trial_ends_at = datetime.now(timezone.utc) + timedelta(days=3650)
-        db.add(user)
-        db.commit()
+    # ensure dev user exists with a valid long trial (renewed once lapsed)
+    user = users.provision(db, email, name="Dev User", trial_days=3650, policy="renew")
     request.session['user_id'] = user.id
     request.session['email'] = user.email
     return {"ok": True, "user": {"id": user.id, "email": user.email}}
@@ -67,4 +57,5 @@ def seed_profile(request: Request, db: Session = Depends(get_db)):
     db.add(p)
     db.commit()
     db.refresh(p)
+    events.profile_changed(p.slug)
     return {"ok": True, "slug": p.slug}
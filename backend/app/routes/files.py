@@ -1,6 +1,9 @@
 from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-from ..storage import build_photo_key, create_presigned_put, build_public_url, save_local_bytes
+from typing import Optional
+from ..storage import build_photo_key, create_presigned_put, build_public_url, s3_configured
+from ..services import events, photos
+import base64
 import os
 
 router = APIRouter()
@@ -9,6 +12,9 @@ router = APIRouter()
 class UploadReq(BaseModel):
     filename: str
     contentType: str
+    # hex SHA-256 of the bytes; with presigned S3 uploads the key is content-addressed and the
+    # store verifies it. Local uploads are hashed by the server, so it is ignored there
+    sha256: Optional[str] = None
 
 
 @router.post("/upload-photo")
@@ -18,23 +24,36 @@ def upload_photo(req: UploadReq, request: Request):
         raise HTTPException(status_code=401, detail="Login required")
     if not req.contentType.lower().startswith("image/"):
         raise HTTPException(status_code=400, detail="Only image uploads are allowed")
-    key = build_photo_key(uid, req.filename, req.contentType)
+    sha256 = req.sha256.lower() if req.sha256 else None
+    if sha256 is not None and not photos.SHA256_RE.match(sha256):
+        raise HTTPException(status_code=400, detail="sha256 must be 64 hex characters")
     # If S3/R2 is configured, return a presigned PUT; else use local direct upload
-    if os.getenv("S3_ENDPOINT_URL") and os.getenv("S3_BUCKET") and os.getenv("S3_ACCESS_KEY_ID"):
+    if s3_configured():
+        if sha256:
+            key = photos.content_key(sha256, req.contentType, req.filename)
+        else:
+            key = build_photo_key(uid, req.filename, req.contentType)
         try:
             cache_control = os.getenv("UPLOAD_CACHE_CONTROL", "public, max-age=31536000, immutable")
-            url = create_presigned_put(key, req.contentType, cache_control=cache_control)
+            # content-addressed keys are shared: the store rejects bytes that don't match the hash
+            checksum = base64.b64encode(bytes.fromhex(sha256)).decode() if sha256 else None
+            url = create_presigned_put(key, req.contentType, cache_control=cache_control, checksum_sha256=checksum)
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
+        headers = {"Content-Type": req.contentType, "Cache-Control": cache_control}
+        if checksum:
+            headers["x-amz-checksum-sha256"] = checksum
         return {
             "uploadUrl": url,
             "method": "PUT",
-            "headers": {"Content-Type": req.contentType, "Cache-Control": cache_control},
+            "headers": headers,
             "publicUrl": build_public_url(key),
             "key": key,
         }
     else:
-        # local mode: client should POST raw bytes to direct endpoint
+        # local mode: client should POST raw bytes to direct endpoint, which derives the
+        # content key from them; this per-user key stays valid as a link to the stored file
+        key = build_photo_key(uid, req.filename, req.contentType)
         return {
             "uploadUrl": f"/api/upload-photo-direct?key={key}",
             "method": "POST",
@@ -57,8 +76,22 @@ async def upload_photo_direct(request: Request, key: str):
         raise HTTPException(status_code=400, detail="No data")
     if len(data) > max_bytes:
         raise HTTPException(status_code=413, detail="File too large")
+    claimed = photos.key_hash(key)
+    if claimed is None and not key.lstrip("/").startswith(f"{photos.LEGACY_PREFIX}{uid}/"):
+        raise HTTPException(status_code=403, detail="Key belongs to another user")
+    # hash the received bytes: identical photos land on one content-addressed object
+    digest = photos.sha256_hex(data)
+    if claimed is not None and digest != claimed:
+        # shared key: only the bytes it names may be stored there
+        raise HTTPException(status_code=400, detail="Content does not match key hash")
+    stored = photos.content_key(digest, request.headers.get("content-type", ""), key)
     try:
-        save_local_bytes(key, data)
+        written = photos.store_local(stored, data)
+        if stored != key:
+            # clients that kept the publicUrl from /upload-photo get the same file, not a copy
+            photos.link_local(key, stored)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    return {"ok": True, "publicUrl": build_public_url(key), "key": key}
+    if written:
+        events.photo_uploaded(stored)
+    return {"ok": True, "publicUrl": build_public_url(stored), "key": stored}
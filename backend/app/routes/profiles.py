@@ -1,24 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
 from sqlalchemy.orm import Session
-from typing import Dict
-import secrets
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, Optional
+import os
+import tempfile
 
-from ..db import get_db
+from ..db import get_db, get_read_db
 from ..models import Profile as ProfileModel
-from ..schemas import ProfileIn, ProfileOut
+from ..schemas import ProfileIn, ProfileOut, ProfileSearchOut
+from ..serializers import FastJSONResponse, profile_to_card, profile_to_out, profile_response
+from ..profiling import timed
+from ..services.search import search_profiles, MAX_LIMIT
+from ..services import events, photos, slugs
+from ..services.importer import import_vcards
 from .vcf import PROFILES as VCF_PROFILES
 
 router = APIRouter()
 
 def _gen_slug(db: Session) -> str:
-    for _ in range(5):
-        slug = secrets.token_urlsafe(6).replace("_", "").replace("-", "")[:8]
-        exists = db.query(ProfileModel).filter_by(slug=slug).first()
-        if not exists:
-            return slug
-    return secrets.token_urlsafe(12).replace("_", "").replace("-", "")[:12]
+    # compact (QR alphanumeric) slugs when COMPACT_SLUGS is on; see services/slugs.py
+    return slugs.new_slugs(db, 1)[0]
 
-@router.post("/profile", response_model=ProfileOut)
+@router.post("/profile", response_model=ProfileOut, response_class=FastJSONResponse)
 def create_or_update_profile(profile: ProfileIn, request: Request, db: Session = Depends(get_db)):
     uid = request.session.get('user_id')
     if not uid:
@@ -41,62 +44,70 @@ def create_or_update_profile(profile: ProfileIn, request: Request, db: Session =
         social=profile.social.model_dump(mode='json') if profile.social else {},
     )
     db.add(m)
+    db.flush()
+    photos.sync_ref(db, m)
     db.commit()
     db.refresh(m)
 
-    VCF_PROFILES[m.slug] = {
-        "fullName": m.full_name,
-        "firstName": m.first_name,
-        "lastName": m.last_name,
-        "org": m.org,
-        "title": m.title,
-        "phones": m.phones,
-        "emails": m.emails,
-        "url": m.url,
-        "social": m.social,
-        "address": m.address,
-        "note": m.note,
-        "photoUrl": m.photo_url,
-    }
+    VCF_PROFILES[m.slug] = profile_to_card(m)
+    events.profile_changed(m.slug)
+    return profile_response(m)
 
-    return ProfileOut(
-        id=m.id,
-        slug=m.slug,
-        fullName=m.full_name,
-        firstName=m.first_name,
-        lastName=m.last_name,
-        org=m.org,
-        title=m.title,
-        phones=m.phones,
-        emails=m.emails,
-        url=m.url,
-        social=m.social,
-        address=m.address,
-        note=m.note,
-        photoUrl=m.photo_url,
-    )
-
-@router.get("/profile/{id}", response_model=ProfileOut)
-def get_profile(id: str, request: Request, db: Session = Depends(get_db)):
+@router.get("/profile/{id}", response_model=ProfileOut, response_class=FastJSONResponse)
+def get_profile(id: str, request: Request, db: Session = Depends(get_read_db)):
     uid = request.session.get('user_id')
     m = db.get(ProfileModel, id)
     if not m:
         raise HTTPException(status_code=404, detail="Not found")
     if not uid or m.user_id != uid:
         raise HTTPException(status_code=403, detail="Forbidden")
-    return ProfileOut(
-        id=m.id,
-        slug=m.slug,
-        fullName=m.full_name,
-        firstName=m.first_name,
-        lastName=m.last_name,
-        org=m.org,
-        title=m.title,
-        phones=m.phones,
-        emails=m.emails,
-        url=m.url,
-        social=m.social,
-        address=m.address,
-        note=m.note,
-        photoUrl=m.photo_url,
-    )
+    # Returning a Response skips FastAPI's second response_model validation pass
+    return profile_response(m)
+
+@router.get("/profiles/search", response_model=ProfileSearchOut, response_class=FastJSONResponse)
+def search(
+    request: Request,
+    q: Optional[str] = None,
+    name: Optional[str] = None,
+    org: Optional[str] = None,
+    title: Optional[str] = None,
+    email: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_LIMIT),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db),
+):
+    uid = request.session.get('user_id')
+    if not uid:
+        raise HTTPException(status_code=401, detail="Login required")
+    results = search_profiles(db, uid, q=q, name=name, org=org, title=title, email=email, limit=limit, offset=offset)
+    with timed("serialize"):
+        return FastJSONResponse({
+            "results": [profile_to_out(m) for m in results],
+            "limit": limit,
+            "offset": offset,
+        })
+
+
+# Whole-file cap for /profiles/import; the body is spooled to disk past IMPORT_SPOOL_BYTES
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+IMPORT_SPOOL_BYTES = 1024 * 1024
+
+@router.post("/profiles/import")
+async def import_profiles(request: Request, db: Session = Depends(get_db)):
+    """Create one profile per card in a raw .vcf body (vCard 2.1/3.0/4.0)."""
+    uid = request.session.get('user_id')
+    if not uid:
+        raise HTTPException(status_code=401, detail="Login required")
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES) as body:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > IMPORT_MAX_BYTES:
+                raise HTTPException(status_code=413, detail="File too large")
+            body.write(chunk)
+        if not size:
+            raise HTTPException(status_code=400, detail="No data")
+        body.seek(0)
+        # parsing and inserts are blocking; keep them off the event loop
+        result = await run_in_threadpool(import_vcards, db, uid, body)
+    return FastJSONResponse(result.as_dict())
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Response, HTTPException, Depends
-from sqlalchemy.orm import Session
-from ..services.vcard import build_vcard
-from ..db import get_db
-from ..models import Profile as ProfileModel
-from ..models_user import User
-from datetime import datetime, timezone
+from fastapi import APIRouter, Request
+from typing import Callable, Dict, Tuple
+from ..compression import Precompressed, encoded_response, precompress
+from ..services.landing import build_page, cached_page, load_page
+from ..services import prerender
+from ..services.scan import cached_vcard, load_vcard
+from ..db import wrote_recently
+from ..profiling import timed
 
 router = APIRouter()
 
@@ -37,50 +38,61 @@ PROFILES = {
     }
 }
 
+# slug -> (stub profile dict, its built entry). Writes replace the dict rather than mutate
+# it, so an identical object means the entry is current and nothing is rendered or compressed.
+_static_vcards: Dict[str, Tuple[Dict, Precompressed]] = {}
+_static_pages: Dict[str, Tuple[Dict, Precompressed]] = {}
+
+
+def _static_entry(entries: Dict[str, Tuple[Dict, Precompressed]], slug: str, profile: Dict, build: Callable[[], Precompressed]) -> Precompressed:
+    hit = entries.get(slug)
+    if hit is not None and hit[0] is profile:
+        return hit[1]
+    entry = build()
+    entries[slug] = (profile, entry)
+    return entry
+
+
+def _build_static_vcard(profile: Dict) -> Precompressed:
+    with timed("render"):
+        fields = prerender.render_fields(profile)
+        return precompress(fields["vcard"], prerender.etag(fields["vcard_hash"]))
+
+
 @router.get("/u/{slug}.vcf")
-def get_vcard(slug: str, db: Session = Depends(get_db)):
+def get_vcard(slug: str, request: Request):
     profile = PROFILES.get(slug)
-    if not profile:
-        # Fallback to DB
-        m = db.query(ProfileModel).filter_by(slug=slug).first()
-        if not m or not m.active:
-            raise HTTPException(status_code=404, detail="Profile not found")
-        # Monetization gate: require active subscription or valid trial on owner
-        if m.user_id:
-            u = db.get(User, m.user_id)
-            if not _user_has_access(u):
-                raise HTTPException(status_code=402, detail="Subscription required or trial ended")
-        profile = {
-            "fullName": m.full_name,
-            "firstName": m.first_name,
-            "lastName": m.last_name,
-            "org": m.org,
-            "title": m.title,
-            "phones": m.phones,
-            "emails": m.emails,
-            "url": m.url,
-            "social": m.social,
-            "address": m.address,
-            "note": m.note,
-            "photoUrl": m.photo_url,
-        }
-    vcf = build_vcard(profile)
+    if profile:
+        vcf = _static_entry(_static_vcards, slug, profile, lambda: _build_static_vcard(profile))
+    elif wrote_recently(request):
+        # owner just edited: read-your-writes from the primary, bypassing the shared cache
+        vcf, _ = load_vcard(slug, sticky=True)
+    else:
+        vcf = cached_vcard(slug)
     headers = {
         "Content-Type": "text/vcard; charset=utf-8",
         "Content-Disposition": "attachment; filename=contact.vcf",
         "Cache-Control": "public, max-age=300",
     }
-    return Response(content=vcf, media_type="text/vcard", headers=headers)
+    # stored bytes (or their stored gzip/br encoding) go out verbatim: no render, no compress
+    return encoded_response(request, vcf, "text/vcard", headers)
+
 
+@router.get("/C/{slug}")
+def get_compact_vcard(slug: str, request: Request):
+    """Compact QR link (services/slugs.py): same vCard as /u/{slug}.vcf, no redirect round trip."""
+    # compact slugs are uppercase; some scanners lowercase the path
+    return get_vcard(slug.upper(), request)
 
-def _user_has_access(user: User | None) -> bool:
-    if not user:
-        return False
-    now = datetime.now(timezone.utc)
-    # active subscription (optionally with end date)
-    if user.sub_active and (user.sub_ends_at is None or user.sub_ends_at > now):
-        return True
-    # valid trial
-    if user.trial_ends_at and user.trial_ends_at > now:
-        return True
-    return False
+
+@router.get("/u/{slug}")
+def get_card_page(slug: str, request: Request):
+    """HTML landing page with an "Add contact" button; same data and gate as get_vcard."""
+    profile = PROFILES.get(slug)
+    if profile:
+        page = _static_entry(_static_pages, slug, profile, lambda: build_page(profile, slug))
+    elif wrote_recently(request):
+        page, _ = load_page(slug, sticky=True)
+    else:
+        page = cached_page(slug)
+    return encoded_response(request, page, "text/html; charset=utf-8", {"Cache-Control": "public, max-age=300"})
@@ -56,4 +56,11 @@ class ProfileIn(BaseModel):
 class ProfileOut(ProfileIn):
     id: str
     slug: str
+    # link to encode in the QR code (compact /C/{SLUG} for compact slugs)
+    scanUrl: Optional[str] = None
 
+
+class ProfileSearchOut(BaseModel):
+    results: List[ProfileOut]
+    limit: int
+    offset: int
@@ -0,0 +1,54 @@
+from typing import Any, Dict
+
+from fastapi.responses import JSONResponse
+
+try:
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+    import orjson  # noqa: F401  (ORJSONResponse only fails at render time without it)
+except ImportError:  # orjson is optional; plain JSON still skips the re-validation pass
+    FastJSONResponse = JSONResponse
+
+from .models import Profile as ProfileModel
+from .profiling import timed
+from .services.slugs import scan_url
+
+EMPTY_SOCIAL = {"linkedin": None, "instagram": None, "twitter": None, "facebook": None}
+EMPTY_ADDRESS = {"street": "", "city": "", "region": "", "postcode": "", "country": ""}
+
+
+def profile_to_card(m: ProfileModel) -> Dict[str, Any]:
+    """Map a Profile row to the camelCase shape shared by `build_vcard` and the API.
+
+    Rows are only written from validated `ProfileIn` data, so nothing is re-validated here.
+    """
+    return {
+        "fullName": m.full_name,
+        "firstName": m.first_name,
+        "lastName": m.last_name,
+        "org": m.org,
+        "title": m.title,
+        "phones": m.phones or [],
+        "emails": m.emails or [],
+        "url": m.url,
+        "social": m.social or {},
+        "address": m.address or {},
+        "note": m.note,
+        "photoUrl": m.photo_url,
+    }
+
+
+def profile_to_out(m: ProfileModel) -> Dict[str, Any]:
+    """`ProfileOut`-shaped dict for API responses, with the defaults `ProfileOut` would fill in."""
+    out = profile_to_card(m)
+    out["social"] = {**EMPTY_SOCIAL, **out["social"]}
+    out["address"] = {**EMPTY_ADDRESS, **out["address"]}
+    out["id"] = m.id
+    out["slug"] = m.slug
+    out["scanUrl"] = scan_url(m.slug)
+    return out
+
+
+def profile_response(m: ProfileModel) -> JSONResponse:
+    """Serialized `ProfileOut` response, bypassing response_model re-validation."""
+    with timed("serialize"):
+        return FastJSONResponse(profile_to_out(m))
@@ -0,0 +1,211 @@
+"""
+Production entry point: `python -m app.serve`.
+
+Sizes worker processes from the CPUs and memory actually available to the container,
+imports the app once in the master and forks workers from it (imports shared
+copy-on-write), and runs uvicorn workers with uvloop/httptools when installed.
+
+Config:
+  PORT                       listen port (default 3001)
+  WEB_CONCURRENCY            worker count; default min(CPUs, memory / WEB_WORKER_MEMORY_MB)
+  WEB_WORKER_MEMORY_MB       memory budget per worker used for sizing (default 256)
+  WEB_MAX_REQUESTS           gunicorn only: recycle a worker after this many requests (default 10000, 0 = never)
+  WEB_MAX_REQUESTS_JITTER    random extra requests so workers don't recycle together (default 1000)
+  WEB_GRACEFUL_TIMEOUT       seconds to drain in-flight requests on SIGTERM (default 30)
+  WEB_KEEPALIVE              keep-alive seconds (default 5)
+
+With more than one worker, schema setup (create_all + migrations) runs once in the master
+before forking; the per-worker startup hook and `/admin/init-db` are disabled.
+Needs gunicorn for multi-worker mode; without it a single uvicorn process is started.
+"""
+import logging
+import os
+import sys
+from typing import Optional
+
+log = logging.getLogger("app.serve")  # __name__ is "__main__" under python -m
+
+
+def _cgroup_cpus() -> Optional[float]:
+    try:
+        quota, period = open("/sys/fs/cgroup/cpu.max").read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read())
+        period = int(open("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _cgroup_memory() -> Optional[int]:
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            value = open(path).read().strip()
+        except OSError:
+            continue
+        # cgroup v1 reports "unlimited" as a huge number
+        if value != "max" and int(value) < 1 << 60:
+            return int(value)
+    return None
+
+
+def available_cpus() -> float:
+    try:
+        cpus = float(len(os.sched_getaffinity(0)))
+    except AttributeError:
+        cpus = float(os.cpu_count() or 1)
+    quota = _cgroup_cpus()
+    return min(cpus, quota) if quota else cpus
+
+
+def available_memory() -> Optional[int]:
+    limit = _cgroup_memory()
+    if limit:
+        return limit
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def worker_count(cpus: float, memory: Optional[int], per_worker_mb: int = 256) -> int:
+    """One async worker per CPU, capped by how many fit in memory; always at least one."""
+    workers = max(1, int(cpus))
+    if memory:
+        workers = min(workers, memory // (per_worker_mb * 1024 * 1024))
+    return max(1, workers)
+
+
+def _prepare_schema() -> None:
+    """Run once in the master so workers never race on create_all / migrations."""
+    from .config import ENABLE_CREATE_ALL, IS_PROD
+    from .db import engine
+    from . import migrations
+
+    if ENABLE_CREATE_ALL or IS_PROD:
+        ran = migrations.ensure_schema(engine, create_all=ENABLE_CREATE_ALL)
+        log.info("schema ensured; migrations applied: %s", ", ".join(ran) if ran else "none pending")
+
+
+def _dispose_pools() -> None:
+    # connections opened in the master must not be shared across forks
+    from .db import engine, replicas
+
+    engine.dispose(close=False)
+    for r in replicas.replicas:
+        r.engine.dispose(close=False)
+
+
+def _uvicorn_options() -> dict:
+    def installed(module: str) -> bool:
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            return False
+
+    return {
+        "loop": "uvloop" if installed("uvloop") else "asyncio",
+        "http": "httptools" if installed("httptools") else "h11",
+    }
+
+
+def run_single(port: int, options: dict) -> None:
+    import uvicorn
+
+    from .main import app
+
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=port,
+        timeout_graceful_shutdown=int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30")),
+        timeout_keep_alive=int(os.getenv("WEB_KEEPALIVE", "5")),
+        # no limit_max_requests: with nothing to respawn it, hitting the limit stops the server
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+        # app.logs writes one queued access line per request instead
+        access_log=False,
+        **options,
+    )
+
+
+def run_multi(port: int, workers: int, options: dict) -> None:
+    from gunicorn.app.base import BaseApplication
+    from uvicorn.workers import UvicornWorker
+
+    class Worker(UvicornWorker):
+        CONFIG_KWARGS = {
+            **UvicornWorker.CONFIG_KWARGS, **options, "proxy_headers": True, "forwarded_allow_ips": "*", "access_log": False,
+        }
+
+    class Server(BaseApplication):
+        def __init__(self, app, settings: dict):
+            self.application = app
+            self.settings = settings
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    # importing the app registers every model on Base.metadata before schema setup
+    from .main import app
+
+    _prepare_schema()
+    _dispose_pools()
+    Server(app, {
+        "bind": f"0.0.0.0:{port}",
+        "workers": workers,
+        "worker_class": Worker,
+        # the app is imported above, so forked workers share its pages copy-on-write
+        "preload_app": True,
+        "post_fork": lambda server, worker: _dispose_pools(),
+        "max_requests": int(os.getenv("WEB_MAX_REQUESTS", "10000")),
+        "max_requests_jitter": int(os.getenv("WEB_MAX_REQUESTS_JITTER", "1000")),
+        "graceful_timeout": int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30")),
+        "timeout": int(os.getenv("WEB_WORKER_TIMEOUT", "60")),
+        "keepalive": int(os.getenv("WEB_KEEPALIVE", "5")),
+        "accesslog": "-" if os.getenv("WEB_ACCESS_LOG", "false").lower() in ("true", "1", "yes") else None,
+    }).run()
+
+
+def main(argv: Optional[list] = None) -> int:
+    port = int(os.getenv("PORT", "3001"))
+    if os.getenv("WEB_CONCURRENCY"):
+        workers = int(os.environ["WEB_CONCURRENCY"])
+    else:
+        workers = worker_count(available_cpus(), available_memory(), int(os.getenv("WEB_WORKER_MEMORY_MB", "256")))
+    options = _uvicorn_options()
+    fallback = False
+    if workers > 1:
+        try:
+            import gunicorn  # noqa: F401
+        except ImportError:
+            fallback, workers = True, 1
+    # read by app.config before the app is imported, so multi-worker guards apply everywhere
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    from . import logs
+
+    logs.setup()
+    if fallback:
+        log.warning("gunicorn is not installed; falling back to a single worker")
+    log.info("starting", extra={"port": port, "workers": workers, **options})
+    if workers > 1:
+        run_multi(port, workers, options)
+    else:
+        run_single(port, options)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
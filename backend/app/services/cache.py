@@ -0,0 +1,195 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Type
+
+from fastapi import HTTPException
+
+
+@dataclass
+class _Entry:
+    value: Any
+    stored_at: float
+    tag: Optional[Hashable] = None
+
+
+class SingleFlight:
+    """Per-key call coalescing: concurrent callers for the same key share one execution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn once per key at a time; returns (result, shared) where shared means we waited on another caller."""
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._flights[key] = future
+        if not leader:
+            return future.result(), True
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+
+
+class SWRCache:
+    """Bounded in-process cache with single-flight loads, stale-while-revalidate and stale-if-error.
+
+    Ages (seconds since the value was loaded):
+      < ttl                          fresh hit
+      < ttl + stale_ttl              served as-is while one background refresh runs
+      < ttl + stale_if_error_ttl     served only when a (coalesced) reload fails with a non-HTTP error
+
+    HTTPExceptions from the loader (404, 402, ...) are real answers, not outages: they evict the
+    key and propagate, so a card that lost access never keeps serving from cache.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        stale_ttl: float = 0,
+        stale_if_error_ttl: float = 0,
+        max_entries: int = 10000,
+        refresh_workers: int = 2,
+        passthrough: Tuple[Type[BaseException], ...] = (HTTPException,),
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.stale_if_error_ttl = stale_if_error_ttl
+        self.max_entries = max_entries
+        self.passthrough = passthrough
+        self.flight = SingleFlight()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix=f"{name}-refresh")
+        self._refreshing: set = set()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "stale": 0, "stale_error": 0, "refreshes": 0, "errors": 0}
+
+    def get(self, key: Hashable, loader: Callable[[], Tuple[Any, Optional[Hashable]]]) -> Any:
+        """Return the cached value for key, loading via loader() -> (value, tag) when needed.
+
+        `tag` groups entries for invalidate_tag (e.g. the owning user id).
+        """
+        now = time.monotonic()
+        entry = self._peek(key)
+        age = now - entry.stored_at if entry else None
+        if entry and age < self.ttl:
+            self._count("hits")
+            return entry.value
+        if entry and age < self.ttl + self.stale_ttl:
+            self._count("stale")
+            self._refresh_in_background(key, loader)
+            return entry.value
+        self._count("misses")
+        try:
+            value, shared = self.flight.do(key, lambda: self._load(key, loader))
+        except self.passthrough:
+            raise
+        except Exception:
+            self._count("errors")
+            if entry and age < self.ttl + self.stale_if_error_ttl:
+                self._count("stale_error")
+                return entry.value
+            raise
+        if shared:
+            self._count("coalesced")
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_tag(self, tag: Hashable) -> None:
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e.tag == tag]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def put(self, key: Hashable, value: Any, tag: Optional[Hashable] = None) -> None:
+        with self._lock:
+            self._entries[key] = _Entry(value, time.monotonic(), tag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+        return {"name": self.name, "size": size, **self.stats}
+
+    def _peek(self, key: Hashable) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _load(self, key: Hashable, loader) -> Any:
+        try:
+            value, tag = loader()
+        except self.passthrough:
+            self.invalidate(key)
+            raise
+        self.put(key, value, tag)
+        return value
+
+    def _refresh_in_background(self, key: Hashable, loader) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._count("refreshes")
+                self.flight.do(key, lambda: self._load(key, loader))
+            except Exception:
+                # keep serving the stale value; the next foreground miss surfaces the error
+                self._count("errors")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresher.submit(run)
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+
+def _env_float(name: str, default: str) -> float:
+    return float(os.getenv(name, default))
+
+
+def _scan_cache(name: str) -> SWRCache:
+    return SWRCache(
+        name,
+        ttl=_env_float("VCARD_CACHE_TTL", "30"),
+        stale_ttl=_env_float("VCARD_CACHE_STALE_TTL", "300"),
+        stale_if_error_ttl=_env_float("VCARD_CACHE_STALE_IF_ERROR_TTL", "3600"),
+        max_entries=int(os.getenv("VCARD_CACHE_MAX", "10000")),
+    )
+
+
+# Rendered vCards and landing pages by slug, tagged with the owner's user id
+vcards = _scan_cache("vcards")
+pages = _scan_cache("pages")
@@ -0,0 +1,16 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from ..models_user import User, as_utc
+
+
+def user_has_access(user: Optional[User], now: Optional[datetime] = None) -> bool:
+    """Active subscription (optionally with end date) or a valid trial."""
+    if not user:
+        return False
+    now = now or datetime.now(timezone.utc)
+    if user.sub_active and (user.sub_ends_at is None or as_utc(user.sub_ends_at) > now):
+        return True
+    if user.trial_ends_at and as_utc(user.trial_ends_at) > now:
+        return True
+    return False
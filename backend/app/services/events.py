@@ -0,0 +1,63 @@
+"""
+Fan-out for "something a scan depends on changed". Routes call these after committing;
+each consumer (in-process caches, pre-published files) hooks in here rather than in
+every route. Slow follow-up work goes through app.jobs so requests never block on it.
+The write has already committed by then, so a queue that can't be reached is logged
+rather than turned into an error response.
+"""
+import logging
+
+from .. import jobs
+from . import publisher
+from .cache import pages, vcards
+
+log = logging.getLogger(__name__)
+
+
+def _enqueue(name: str, *args, dedupe_key: str) -> None:
+    try:
+        jobs.enqueue(name, *args, dedupe_key=dedupe_key)
+    except Exception:
+        log.exception("could not queue job %s", name, extra={"dedupeKey": dedupe_key})
+
+
+def profile_changed(slug: str) -> None:
+    # entries are keyed by current slugs only (scan.cached_by_slug), so this covers old links too
+    vcards.invalidate(slug)
+    pages.invalidate(slug)
+    # warming fills the cache of whichever process runs the job: only useful in-process
+    if jobs.JOBS_BACKEND in ("local", "inline"):
+        _enqueue("warm_vcard", slug, dedupe_key=f"warm:{slug}")
+    if publisher.enabled():
+        _enqueue("publish_slug", slug, dedupe_key=f"publish:{slug}")
+
+
+def slug_moved(old: str, new: str) -> None:
+    """A profile got a new slug (slugs.compact); `old` keeps resolving through slug_aliases."""
+    vcards.invalidate(old)
+    pages.invalidate(old)
+    profile_changed(new)
+    if publisher.enabled():
+        # no profile has the old slug any more, so publish_slug removes its file; scans of
+        # printed codes fall through to get_vcard, which resolves the alias
+        _enqueue("publish_slug", old, dedupe_key=f"publish:{old}")
+
+
+def profiles_imported(user_id: str) -> None:
+    # new slugs have nothing cached; only pre-published files need writing
+    if publisher.enabled():
+        _enqueue("publish_user", user_id, dedupe_key=f"publish-user:{user_id}")
+
+
+def entitlement_changed(user_id: str) -> None:
+    vcards.invalidate_tag(user_id)
+    pages.invalidate_tag(user_id)
+    if publisher.enabled():
+        _enqueue("publish_user", user_id, dedupe_key=f"publish-user:{user_id}")
+
+
+def photo_uploaded(key: str) -> None:
+    from ..tasks import VARIANTS_ENABLED
+
+    if VARIANTS_ENABLED:
+        _enqueue("media_variants", key, dedupe_key=f"variants:{key}")
@@ -0,0 +1,140 @@
+"""
+Bulk import of multi-contact `.vcf` files into profiles.
+
+Cards stream out of `vcard.iter_vcards`, are mapped onto `ProfileIn` and validated one
+batch at a time, and each batch is written with one executemany INSERT (plus one for
+photo references) in its own transaction. Only the current batch and a capped error
+list are held in memory, whatever the size of the file.
+"""
+import os
+from typing import Dict, Iterable, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from ..models import PhotoRef, Profile as ProfileModel, gen_uuid
+from ..schemas import ProfileIn
+from ..serializers import profile_to_card
+from . import events, photos, prerender, slugs
+from .vcard import iter_vcards, record_to_profile
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+# Per-record errors beyond this are only counted
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+
+class ImportResult:
+    def __init__(self, max_errors: int = IMPORT_MAX_ERRORS):
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[Dict] = []
+        self.max_errors = max_errors
+
+    def fail(self, record: int, line: int, name: Optional[str], errors: List[str]) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"record": record, "line": line, "fullName": name or None, "errors": errors})
+
+    def as_dict(self) -> Dict:
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errorsTruncated": self.failed > len(self.errors),
+        }
+
+
+def _validation_messages(e: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()]
+
+
+def _row(p: ProfileIn, user_id: str, slug: str) -> Dict:
+    # same mapping as routes.profiles.create_or_update_profile
+    row = {
+        "id": gen_uuid(),
+        "slug": slug,
+        "user_id": user_id,
+        "full_name": p.fullName,
+        "first_name": p.firstName,
+        "last_name": p.lastName,
+        "org": p.org,
+        "title": p.title,
+        "url": str(p.url) if p.url else None,
+        "note": p.note,
+        "photo_url": str(p.photoUrl) if p.photoUrl else None,
+        "phones": [ph.model_dump() for ph in p.phones],
+        "emails": [e.model_dump() for e in p.emails],
+        "address": p.address.model_dump(mode="json") if p.address else {},
+        "social": p.social.model_dump(mode="json") if p.social else {},
+        "active": True,
+    }
+    # Core inserts skip the ORM hook that pre-renders the vCard, so render it here
+    row.update(prerender.render_fields(profile_to_card(ProfileModel(**row))))
+    return row
+
+
+def _refs(rows: List[Dict]) -> List[Dict]:
+    return [{"profile_id": row["id"], "key": key} for row in rows if (key := photos.key_for_url(row["photo_url"]))]
+
+
+def _insert(db: Session, rows: List[Dict]) -> None:
+    db.execute(insert(ProfileModel), rows)
+    refs = _refs(rows)
+    if refs:
+        db.execute(insert(PhotoRef), refs)
+    db.commit()
+
+
+def _write_batch(db: Session, user_id: str, batch: List[tuple], result: ImportResult) -> None:
+    """batch: (record_no, line, ProfileIn). One bulk INSERT; if the database rejects it, isolate the bad rows."""
+    if not batch:
+        return
+    rows = [_row(p, user_id, slug) for (_, _, p), slug in zip(batch, slugs.new_slugs(db, len(batch)))]
+    try:
+        _insert(db, rows)
+        result.imported += len(rows)
+        return
+    except DBAPIError:
+        db.rollback()
+    # rare: a concurrent slug collision or a value the column can't hold; fall back to row by row
+    for (record_no, line, p), row in zip(batch, rows):
+        row["slug"] = slugs.new_slugs(db, 1)[0]
+        try:
+            _insert(db, [row])
+            result.imported += 1
+        except DBAPIError as e:
+            db.rollback()
+            result.fail(record_no, line, p.fullName, [f"database: {e.orig}"])
+
+
+def import_vcards(
+    db: Session,
+    user_id: str,
+    lines: Iterable[bytes],
+    batch_size: int = IMPORT_BATCH_SIZE,
+    max_errors: int = IMPORT_MAX_ERRORS,
+) -> ImportResult:
+    """Import every card in `lines` (an open binary file works) as profiles owned by user_id."""
+    result = ImportResult(max_errors)
+    batch: List[tuple] = []
+    for record_no, record in enumerate(iter_vcards(lines), 1):
+        if record.error:
+            result.fail(record_no, record.line, None, [record.error])
+            continue
+        data = record_to_profile(record)
+        if not data["fullName"]:
+            result.fail(record_no, record.line, None, ["fullName: no FN, N or ORG on the card"])
+            continue
+        try:
+            batch.append((record_no, record.line, ProfileIn.model_validate(data)))
+        except ValidationError as e:
+            result.fail(record_no, record.line, data.get("fullName"), _validation_messages(e))
+        if len(batch) >= batch_size:
+            _write_batch(db, user_id, batch, result)
+            batch = []
+    _write_batch(db, user_id, batch, result)
+    if result.imported:
+        events.profiles_imported(user_id)
+    return result
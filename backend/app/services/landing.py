@@ -0,0 +1,78 @@
+"""
+Server-rendered landing page for `GET /u/{slug}`: a small HTML card with an "Add contact"
+button (linking to `/u/{slug}.vcf`) and Open Graph tags, for scanners and in-app browsers
+that handle a raw `.vcf` download poorly.
+
+The template is parsed once at import. Rendered pages are cached per slug in
+`cache.pages` together with their gzip (and brotli, when installed) encodings and an
+ETag, so a hit costs the same as a cached vCard.
+"""
+import hashlib
+import os
+from html import escape
+from pathlib import Path
+from string import Template
+from typing import Dict, Optional, Tuple
+
+from ..compression import Precompressed, precompress
+from ..profiling import timed
+from .cache import pages
+from .scan import cached_by_slug, load_card
+
+TEMPLATE = Template((Path(__file__).resolve().parent.parent / "templates" / "card.html").read_text())
+
+
+# Cached page: HTML body, ETag and its stored encodings
+Page = Precompressed
+
+
+def _item(label: str, text: str, href: str) -> str:
+    return f'<li><a href="{escape(href)}" rel="noopener"><span>{escape(label)}</span>{escape(text)}</a></li>\n'
+
+
+def render_html(card: Dict, slug: str) -> str:
+    first, last = card.get("firstName") or "", card.get("lastName") or ""
+    name = card.get("fullName") or f"{first} {last}".strip()
+    headline = " · ".join(p for p in (card.get("title"), card.get("org")) if p)
+    public_host = os.getenv("PUBLIC_HOST", "http://localhost:3001").rstrip("/")
+    photo = card.get("photoUrl")
+
+    items = []
+    for ph in card.get("phones") or []:
+        if ph.get("number"):
+            items.append(_item(ph.get("type") or "phone", ph["number"], f"tel:{ph['number']}"))
+    for em in card.get("emails") or []:
+        if em.get("address"):
+            items.append(_item(em.get("type") or "email", em["address"], f"mailto:{em['address']}"))
+    if card.get("url"):
+        items.append(_item("website", card["url"], card["url"]))
+    for kind, link in (card.get("social") or {}).items():
+        if link:
+            items.append(_item(kind, link, link))
+
+    return TEMPLATE.substitute(
+        name=escape(name),
+        headline=escape(headline),
+        page_url=escape(f"{public_host}/u/{slug}"),
+        vcf_url=escape(f"/u/{slug}.vcf"),
+        og_image=f'<meta property="og:image" content="{escape(photo)}">\n' if photo else "",
+        photo=f'<img class="photo" src="{escape(photo)}" alt="">\n' if photo else "",
+        items="".join(items),
+    )
+
+
+def build_page(card: Dict, slug: str, compress: bool = True) -> Page:
+    with timed("render"):
+        html = render_html(card, slug).encode("utf-8")
+        pack = precompress if compress else Page
+        return pack(html, '"' + hashlib.blake2b(html, digest_size=12).hexdigest() + '"')
+
+
+def load_page(slug: str, sticky: bool = False, aliases: bool = True) -> Tuple[Page, Optional[str]]:
+    card, owner = load_card(slug, sticky=sticky, aliases=aliases)
+    # a sticky page is served once and never cached: CompressionMiddleware encodes it cheaply
+    return build_page(card, slug, compress=not sticky), owner
+
+
+def cached_page(slug: str) -> Page:
+    return cached_by_slug(pages, slug, load_page)
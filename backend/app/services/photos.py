@@ -0,0 +1,248 @@
+"""
+Content-addressed profile photos and garbage collection of unreferenced uploads.
+
+New uploads are keyed by the SHA-256 of their bytes (`photos/ab/<sha256>.jpg`), so identical
+images are stored once. `photo_refs` records which stored key each profile's `photo_url`
+points at; `gc()` walks the storage listing page by page and bulk-deletes objects nobody
+references once they are older than the grace period (which covers uploads whose profile
+has not been saved yet).
+
+Config:
+  PHOTO_PREFIX          key prefix for content-addressed uploads (default "photos/")
+  PHOTO_GC_GRACE_HOURS  never delete objects younger than this (default 24)
+"""
+import hashlib
+import os
+import re
+import shutil
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from .. import storage
+from ..media import IMAGE_VARIANTS, ENCODING_VARIANTS, index as media_index
+from ..models import PhotoRef, Profile as ProfileModel
+
+PHOTO_PREFIX = os.getenv("PHOTO_PREFIX", "photos/")
+# Keys written before content addressing (storage.build_photo_key); swept by GC as well
+LEGACY_PREFIX = "profiles/"
+GC_GRACE_HOURS = float(os.getenv("PHOTO_GC_GRACE_HOURS", "24"))
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+_CONTENT_KEY_RE = re.compile(r"/([0-9a-f]{64})(?:\.[A-Za-z0-9]+)?$")
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def content_key(sha256: str, content_type: str, filename: str = "") -> str:
+    ext = storage.guess_ext(content_type)
+    if not ext and "." in filename:
+        ext = "." + filename.rsplit(".", 1)[-1].lower()
+    return f"{PHOTO_PREFIX}{sha256[:2]}/{sha256}{ext}"
+
+
+def key_hash(key: str) -> Optional[str]:
+    """The SHA-256 a content-addressed key claims, or None for legacy keys."""
+    if not key.startswith(PHOTO_PREFIX):
+        return None
+    m = _CONTENT_KEY_RE.search(key)
+    return m.group(1) if m else None
+
+
+def touch_local(key: str) -> bool:
+    """Refresh a stored object's mtime so gc treats it as a new upload; False when it isn't stored.
+
+    A dedup hit hands out a key nobody may reference yet, so the object gets a fresh grace
+    period to cover the time until the profile that uses it is saved.
+    """
+    path = storage.local_path(key)
+    if not path.is_file():
+        return False
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def store_local(key: str, data: bytes) -> bool:
+    """Write a content-addressed upload unless the same bytes are already stored; True when written."""
+    if touch_local(key):
+        return False
+    storage.save_local_bytes(key, data)
+    return True
+
+
+def link_local(alias: str, key: str) -> None:
+    """Make `alias` name the bytes stored under `key`: a hard link, or a copy where links fail."""
+    src, dst = storage.local_path(key), storage.local_path(alias)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+    media_index.invalidate(alias.replace("..", "").lstrip("/"))
+
+
+def key_for_url(url: Optional[str]) -> Optional[str]:
+    """Map a profile's photo_url back to our storage key (None for external URLs)."""
+    if not url:
+        return None
+    bases = []
+    if os.getenv("IMAGE_PUBLIC_BASE"):
+        bases.append(os.getenv("IMAGE_PUBLIC_BASE").rstrip("/") + "/")
+    bases.append(os.getenv("PUBLIC_HOST", "http://localhost:3001").rstrip("/") + "/media/")
+    for base in bases:
+        if url.startswith(base):
+            return url[len(base):].split("?", 1)[0] or None
+    return None
+
+
+def sync_ref(db: Session, m: ProfileModel) -> None:
+    """Point the profile's reference at its current photo (call before committing a profile write)."""
+    key = key_for_url(m.photo_url)
+    ref = db.get(PhotoRef, m.id)
+    if key is None:
+        if ref is not None:
+            db.delete(ref)
+    elif ref is None:
+        db.add(PhotoRef(profile_id=m.id, key=key))
+    else:
+        ref.key = key
+
+
+def backfill_refs(db: Session, batch_size: int = 500) -> int:
+    """Rebuild photo_refs from every profile's photo_url; returns the number of references."""
+    count = 0
+    batch: Dict[str, Optional[str]] = {}
+    query = db.query(ProfileModel.id, ProfileModel.photo_url).order_by(ProfileModel.id).yield_per(batch_size)
+    for profile_id, url in query:
+        batch[profile_id] = key_for_url(url)
+        if len(batch) >= batch_size:
+            count += _write_refs(db, batch)
+            batch = {}
+    count += _write_refs(db, batch)
+    # references left behind by deleted profiles
+    db.query(PhotoRef).filter(~PhotoRef.profile_id.in_(db.query(ProfileModel.id))).delete(synchronize_session=False)
+    db.commit()
+    return count
+
+
+def _write_refs(db: Session, batch: Dict[str, Optional[str]]) -> int:
+    if not batch:
+        return 0
+    existing = {r.profile_id: r for r in db.query(PhotoRef).filter(PhotoRef.profile_id.in_(batch))}
+    for profile_id, key in batch.items():
+        ref = existing.get(profile_id)
+        if key is None:
+            if ref is not None:
+                db.delete(ref)
+        elif ref is None:
+            db.add(PhotoRef(profile_id=profile_id, key=key))
+        else:
+            ref.key = key
+    db.flush()
+    return sum(1 for key in batch.values() if key)
+
+
+def base_key(key: str) -> str:
+    """Strip a pre-encoded variant suffix (`.webp`, `.br`, ...) added next to an original."""
+    for _, suffix in IMAGE_VARIANTS + ENCODING_VARIANTS:
+        if key.endswith(suffix):
+            return key[: -len(suffix)]
+    return key
+
+
+def referenced(db: Session, keys: Iterable[str]) -> Set[str]:
+    keys = list(set(keys))
+    found: Set[str] = set()
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        found.update(k for (k,) in db.query(PhotoRef.key).filter(PhotoRef.key.in_(chunk)).distinct())
+    return found
+
+
+class LocalStore:
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.getenv("UPLOAD_DIR", os.path.join(os.getcwd(), "media"))
+
+    def list(self, prefix: str) -> Iterator[Tuple[str, datetime]]:
+        root = Path(self.directory)
+        for dirpath, _, filenames in os.walk(storage.local_path(prefix, self.directory)):
+            for name in filenames:
+                path = Path(dirpath) / name
+                try:
+                    mtime = path.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                yield path.relative_to(root).as_posix(), datetime.fromtimestamp(mtime, timezone.utc)
+
+    def delete(self, keys: List[str]) -> None:
+        for key in keys:
+            storage.local_path(key, self.directory).unlink(missing_ok=True)
+            media_index.invalidate(key)
+
+
+class S3Store:
+    def __init__(self, bucket: Optional[str] = None, client=None):
+        self.bucket = bucket or os.getenv("S3_BUCKET")
+        self.client = client or storage.get_s3_client()
+
+    def list(self, prefix: str) -> Iterator[Tuple[str, datetime]]:
+        return storage.list_s3_keys(prefix, bucket=self.bucket, client=self.client)
+
+    def delete(self, keys: List[str]) -> None:
+        storage.delete_s3_objects(keys, bucket=self.bucket, client=self.client)
+
+
+def get_store():
+    return S3Store() if storage.s3_configured() else LocalStore()
+
+
+def gc(
+    db: Session,
+    store=None,
+    grace_hours: float = GC_GRACE_HOURS,
+    page_size: int = 1000,
+    dry_run: bool = False,
+    prefixes: Tuple[str, ...] = (PHOTO_PREFIX, LEGACY_PREFIX),
+) -> Dict[str, int]:
+    """Delete stored photos (and their variants) that no profile references and that are older than the grace period.
+
+    The listing is consumed `page_size` keys at a time; each page costs one reference
+    query and one bulk delete, so memory stays flat however large the bucket is.
+    """
+    store = store or get_store()
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=grace_hours)
+    counts = {"scanned": 0, "referenced": 0, "recent": 0, "deleted": 0}
+
+    def sweep(page: List[Tuple[str, datetime]]) -> None:
+        refs = referenced(db, [k for k, _ in page] + [base_key(k) for k, _ in page])
+        doomed = []
+        for key, modified in page:
+            if key in refs or base_key(key) in refs:
+                counts["referenced"] += 1
+            elif modified > cutoff:
+                counts["recent"] += 1
+            else:
+                doomed.append(key)
+        counts["deleted"] += len(doomed)
+        if doomed and not dry_run:
+            store.delete(doomed)
+
+    for prefix in prefixes:
+        page: List[Tuple[str, datetime]] = []
+        for key, modified in store.list(prefix):
+            counts["scanned"] += 1
+            page.append((key, modified))
+            if len(page) >= page_size:
+                sweep(page)
+                page = []
+        if page:
+            sweep(page)
+    return counts
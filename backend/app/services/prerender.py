@@ -0,0 +1,67 @@
+"""
+vCards rendered once on write and stored on the profile row (`vcard`, `vcard_hash`,
+`vcard_length`, `vcard_version`).
+
+ORM writes re-render through a before_insert/before_update hook on `Profile` (see
+models.py); bulk Core inserts (the importer) call `render_fields` themselves. Bump
+VCARD_RENDER_VERSION whenever `build_vcard` output changes: older rows are rendered on
+read until `python -m app.cli render-vcards` rewrites them.
+"""
+import hashlib
+from typing import Any, Dict
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from ..models import Profile as ProfileModel
+from ..serializers import profile_to_card
+from .vcard import build_vcard
+
+VCARD_RENDER_VERSION = 1
+
+
+def render_fields(card: Dict[str, Any]) -> Dict[str, Any]:
+    body = build_vcard(card).encode("utf-8")
+    return {
+        "vcard": body,
+        "vcard_hash": hashlib.sha256(body).hexdigest(),
+        "vcard_length": len(body),
+        "vcard_version": VCARD_RENDER_VERSION,
+    }
+
+
+def apply(m: ProfileModel) -> None:
+    for key, value in render_fields(profile_to_card(m)).items():
+        setattr(m, key, value)
+
+
+def is_current(row) -> bool:
+    # the hash is written with the bytes, so this never touches the deferred `vcard` column
+    return row.vcard_hash is not None and row.vcard_version == VCARD_RENDER_VERSION
+
+
+def etag(vcard_hash: str) -> str:
+    return f'"{vcard_hash[:32]}"'
+
+
+def backfill(db: Session, batch_size: int = 500, force: bool = False) -> int:
+    """Render missing/outdated stored vCards (every row with force) in id-ordered batches; returns rows written."""
+    written, last_id = 0, ""
+    while True:
+        query = db.query(ProfileModel).filter(ProfileModel.id > last_id)
+        if not force:
+            query = query.filter(or_(
+                ProfileModel.vcard.is_(None),
+                ProfileModel.vcard_version.is_(None),
+                ProfileModel.vcard_version != VCARD_RENDER_VERSION,
+            ))
+        batch = query.order_by(ProfileModel.id).limit(batch_size).all()
+        if not batch:
+            return written
+        for m in batch:
+            apply(m)
+        last_id = batch[-1].id
+        db.commit()
+        # keep memory flat across batches
+        db.expunge_all()
+        written += len(batch)
@@ -0,0 +1,347 @@
+"""
+Pre-publish rendered vCards so scans of `/u/{slug}.vcf` can be served straight from
+object storage (or a local directory behind a static server / CDN) without reaching
+FastAPI. The `get_vcard` route stays as the fallback for anything not yet published.
+
+Config:
+  PUBLISH_TARGET   "s3" (bucket from PUBLISH_BUCKET or S3_BUCKET), "local", or unset (disabled)
+  PUBLISH_DIR      root for the local target (default "published")
+  PUBLISH_PREFIX   key prefix (default "u/"), so files land at u/{slug}.vcf
+  PUBLISH_WORKERS  parallel uploads during a full rebuild (default 16)
+  PUBLISH_EXPIRY_SWEEP_SECONDS  how often the files of users whose trial or subscription just
+                   ended are removed (default 300, 0 disables)
+
+Nothing writes when a trial simply runs out, so `unpublish_lapsed` looks for access that
+ended since its last run; `python -m app.cli unpublish-lapsed [hours]` runs it from cron.
+Every web process starts the sweep thread, but only the holder of `SweepLease` runs it, so
+one process in the deployment sweeps and another takes over when it exits.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import and_, or_, text
+from sqlalchemy.orm import Session, undefer
+
+from .. import storage
+from ..db import SessionLocal, engine
+from ..models import Profile as ProfileModel
+from ..models_user import User
+from ..serializers import profile_to_card
+from . import prerender
+from .entitlements import user_has_access
+from .vcard import build_vcard
+
+PUBLISH_PREFIX = os.getenv("PUBLISH_PREFIX", "u/")
+PUBLISH_WORKERS = int(os.getenv("PUBLISH_WORKERS", "16"))
+PUBLISH_EXPIRY_SWEEP_SECONDS = float(os.getenv("PUBLISH_EXPIRY_SWEEP_SECONDS", "300"))
+# Postgres advisory lock key shared by every process that might sweep
+EXPIRY_SWEEP_LOCK_ID = 0x71726376
+VCARD_HEADERS = {
+    "ContentDisposition": "attachment; filename=contact.vcf",
+    "CacheControl": "public, max-age=300",
+}
+VCARD_CONTENT_TYPE = "text/vcard; charset=utf-8"
+
+log = logging.getLogger(__name__)
+
+
+class LocalTarget:
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def put(self, key: str, data: bytes) -> None:
+        path = storage.local_path(key, self.directory)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # write-then-rename so a static server never sees a half-written card
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            storage.local_path(key, self.directory).unlink(missing_ok=True)
+
+    def keys(self, prefix: str) -> Iterator[str]:
+        root = Path(self.directory)
+        base = storage.local_path(prefix, self.directory)
+        if not base.exists():
+            return
+        for path in base.rglob("*.vcf"):
+            yield path.relative_to(root).as_posix()
+
+
+class S3Target:
+    def __init__(self, bucket: str, client=None):
+        self.bucket = bucket
+        self.client = client or storage.get_s3_client()
+
+    def put(self, key: str, data: bytes) -> None:
+        storage.put_s3_bytes(key, data, VCARD_CONTENT_TYPE, bucket=self.bucket, client=self.client, **VCARD_HEADERS)
+
+    def delete(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if keys:
+            storage.delete_s3_objects(keys, bucket=self.bucket, client=self.client)
+
+    def keys(self, prefix: str) -> Iterator[str]:
+        for key, _ in storage.list_s3_keys(prefix, bucket=self.bucket, client=self.client):
+            yield key
+
+
+_target = None
+
+
+def get_target():
+    """Configured publish target, or None when publishing is disabled."""
+    global _target
+    if _target is None:
+        kind = os.getenv("PUBLISH_TARGET", "").lower()
+        if kind == "s3":
+            _target = S3Target(os.getenv("PUBLISH_BUCKET") or os.getenv("S3_BUCKET"))
+        elif kind == "local":
+            _target = LocalTarget(os.getenv("PUBLISH_DIR", os.path.join(os.getcwd(), "published")))
+    return _target
+
+
+def enabled() -> bool:
+    return get_target() is not None
+
+
+def key_for(slug: str) -> str:
+    return f"{PUBLISH_PREFIX}{slug}.vcf"
+
+
+def render(m: ProfileModel) -> bytes:
+    if prerender.is_current(m):
+        return m.vcard
+    return build_vcard(profile_to_card(m)).encode("utf-8")
+
+
+def should_publish(m: ProfileModel, owner: Optional[User], now: Optional[datetime] = None) -> bool:
+    # mirrors the gate in routes/vcf.get_vcard
+    return bool(m.active) and (not m.user_id or user_has_access(owner, now))
+
+
+def sync_profile(db: Session, m: ProfileModel, target=None) -> bool:
+    """Publish or unpublish one profile; returns True when it is now published."""
+    target = target or get_target()
+    if target is None:
+        return False
+    owner = db.get(User, m.user_id) if m.user_id else None
+    if should_publish(m, owner):
+        target.put(key_for(m.slug), render(m))
+        return True
+    target.delete([key_for(m.slug)])
+    return False
+
+
+def publish_slug(slug: str) -> None:
+    """Incremental republish after a profile write (safe to run as a background task)."""
+    if not enabled():
+        return
+    with SessionLocal() as db:
+        m = db.query(ProfileModel).filter_by(slug=slug).first()
+        if m is None:
+            get_target().delete([key_for(slug)])
+            return
+        sync_profile(db, m)
+
+
+def publish_user(user_id: str) -> None:
+    """Republish (or remove) every card owned by a user after their entitlement changed."""
+    if not enabled():
+        return
+    with SessionLocal() as db:
+        for m in db.query(ProfileModel).filter_by(user_id=user_id).all():
+            sync_profile(db, m)
+
+
+def rebuild_all(db: Session, target=None, workers: int = PUBLISH_WORKERS, batch_size: int = 500) -> Dict[str, int]:
+    """Full rebuild: publish every entitled card, delete the rest, then drop orphans left in the target.
+
+    Rows are streamed in batches with at most `workers * 4` uploads in flight; deletes go out
+    `batch_size` keys at a time, and orphans are found by checking each page of the target
+    listing against the profiles table, so no per-profile state is kept.
+    """
+    target = target or get_target()
+    if target is None:
+        raise RuntimeError("Publishing is disabled; set PUBLISH_TARGET=s3|local")
+    now = datetime.now(timezone.utc)
+    counts = {"published": 0, "removed": 0, "orphans": 0}
+    unpublish: List[str] = []
+    query = (
+        db.query(ProfileModel, User)
+        .outerjoin(User, User.id == ProfileModel.user_id)
+        .options(undefer(ProfileModel.vcard))
+        .order_by(ProfileModel.id)
+        .yield_per(batch_size)
+    )
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for m, owner in query:
+            key = key_for(m.slug)
+            if should_publish(m, owner, now):
+                counts["published"] += 1
+                pending.add(pool.submit(target.put, key, render(m)))
+                if len(pending) >= workers * 4:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in done:
+                        f.result()
+            else:
+                unpublish.append(key)
+                if len(unpublish) >= batch_size:
+                    target.delete(unpublish)
+                    counts["removed"] += len(unpublish)
+                    unpublish = []
+        for f in pending:
+            f.result()
+    target.delete(unpublish)
+    counts["removed"] += len(unpublish)
+
+    # every profile's file is now current or gone; what's left without a profile is an orphan
+    page: List[str] = []
+    for key in target.keys(PUBLISH_PREFIX):
+        page.append(key)
+        if len(page) >= batch_size:
+            counts["orphans"] += _drop_orphans(db, target, page)
+            page = []
+    counts["orphans"] += _drop_orphans(db, target, page)
+    return counts
+
+
+def _slug_for(key: str) -> Optional[str]:
+    if key.startswith(PUBLISH_PREFIX) and key.endswith(".vcf"):
+        return key[len(PUBLISH_PREFIX):-len(".vcf")]
+    return None
+
+
+def _drop_orphans(db: Session, target, keys: List[str]) -> int:
+    if not keys:
+        return 0
+    slugs = {_slug_for(k) for k in keys} - {None}
+    existing = {s for (s,) in db.query(ProfileModel.slug).filter(ProfileModel.slug.in_(slugs))}
+    orphans = [k for k in keys if _slug_for(k) not in existing]
+    target.delete(orphans)
+    return len(orphans)
+
+
+def unpublish_lapsed(db: Session, since: datetime, now: Optional[datetime] = None, target=None) -> Dict[str, int]:
+    """Remove the files of users whose trial or subscription ended in (since, now]."""
+    target = target or get_target()
+    counts = {"users": 0, "removed": 0}
+    if target is None:
+        return counts
+    now = now or datetime.now(timezone.utc)
+    ended = or_(
+        and_(User.trial_ends_at > since, User.trial_ends_at <= now),
+        and_(User.sub_ends_at > since, User.sub_ends_at <= now),
+    )
+    # a trial ending under an active subscription (or the reverse) leaves access intact
+    lapsed = [u.id for u in db.query(User).filter(ended).all() if not user_has_access(u, now)]
+    for i in range(0, len(lapsed), 500):
+        chunk = lapsed[i:i + 500]
+        keys = [key_for(slug) for (slug,) in db.query(ProfileModel.slug).filter(ProfileModel.user_id.in_(chunk))]
+        target.delete(keys)
+        counts["users"] += len(chunk)
+        counts["removed"] += len(keys)
+    return counts
+
+
+class SweepLease:
+    """Leadership for the expiry sweep: `held()` is True in exactly one process at a time.
+
+    Postgres: a session advisory lock kept on a dedicated autocommit connection; it goes away
+    with the holder (or its connection) and the next process to ask takes it. Other dialects
+    (SQLite, so one host): a non-blocking flock on a file in the temp directory.
+    """
+
+    def __init__(self, lock_id: int = EXPIRY_SWEEP_LOCK_ID, bind=None):
+        self.lock_id = lock_id
+        self.bind = bind or engine
+        self._conn = None
+        self._file = None
+
+    def held(self) -> bool:
+        if self.bind.dialect.name == "postgresql":
+            return self._advisory()
+        return self._flock()
+
+    def _advisory(self) -> bool:
+        if self._conn is not None:
+            try:
+                self._conn.execute(text("SELECT 1"))
+                return True
+            except Exception:
+                self.release()  # the session, and with it the lock, is gone
+        conn = self.bind.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            got = conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": self.lock_id}).scalar()
+        except Exception:
+            conn.close()
+            raise
+        if not got:
+            conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    def _flock(self) -> bool:
+        if self._file is not None:
+            return True
+        try:
+            import fcntl
+        except ImportError:
+            return True  # no flock (Windows): single-process development only
+        f = open(os.path.join(tempfile.gettempdir(), f"qrcard-sweep-{self.lock_id:x}.lock"), "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+        if self._file is not None:
+            self._file.close()  # closing drops the flock
+            self._file = None
+
+
+def _sweep_expired(interval: float) -> None:
+    lease = SweepLease()
+    # a new holder looks back one day so expiries while nobody swept are caught
+    since = None
+    while True:
+        now = datetime.now(timezone.utc)
+        try:
+            if lease.held():
+                with SessionLocal() as db:
+                    counts = unpublish_lapsed(db, since or now - timedelta(days=1), now)
+                if counts["removed"]:
+                    log.info("unpublished lapsed cards", extra=counts)
+                since = now
+            else:
+                since = None
+        except Exception:
+            log.exception("expiry sweep failed")  # retried with the same window next time
+        time.sleep(interval)
+
+
+def start_expiry_sweep(interval: float = PUBLISH_EXPIRY_SWEEP_SECONDS) -> None:
+    """Start the expiry sweep thread; only the process holding the `SweepLease` unpublishes."""
+    if interval <= 0 or not enabled():
+        return
+    threading.Thread(target=_sweep_expired, args=(interval,), name="publish-expiry", daemon=True).start()
@@ -0,0 +1,124 @@
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from ..compression import Precompressed, precompress
+from ..db import read_session
+from ..models import Profile as ProfileModel, SlugAlias
+from ..models_user import User
+from ..profiling import timed
+from ..serializers import profile_to_card
+from . import prerender
+from .cache import SWRCache, vcards
+from .entitlements import user_has_access
+
+
+# Cached vCard: the stored bytes, their ETag and gzip/brotli encodings made once per load
+StoredVCard = Precompressed
+
+
+def _gate(m, user: Optional[User]) -> None:
+    if not m or not m.active:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    # Monetization gate: require active subscription or valid trial on owner
+    if m.user_id and not user_has_access(user):
+        raise HTTPException(status_code=402, detail="Subscription required or trial ended")
+
+
+# alias -> the slug its profile has now. An alias never moves to another profile, so the
+# mapping can be remembered; cache entries are only ever keyed by current slugs.
+_alias_targets: Dict[str, str] = {}
+_aliases_lock = threading.Lock()
+
+
+def _by_slug(query, slug: str, aliases: bool = True):
+    """First row for a slug; on a miss, the profile that used to have it (slug_aliases) unless `aliases` is off."""
+    row = query.filter(ProfileModel.slug == slug).first()
+    if row is None and aliases:
+        row = query.join(SlugAlias, SlugAlias.profile_id == ProfileModel.id).filter(SlugAlias.slug == slug).first()
+    return row
+
+
+def resolve_alias(slug: str) -> Optional[str]:
+    """Current slug of the profile that used to be at `slug`; None when it isn't an alias."""
+    with _aliases_lock:
+        target = _alias_targets.get(slug)
+    if target is not None:
+        return target
+    with read_session() as db:
+        row = (
+            db.query(ProfileModel.slug)
+            .join(SlugAlias, SlugAlias.profile_id == ProfileModel.id)
+            .filter(SlugAlias.slug == slug)
+            .first()
+        )
+    if row is None:
+        return None
+    with _aliases_lock:
+        _alias_targets[slug] = row.slug
+    return row.slug
+
+
+def cached_by_slug(cache: SWRCache, slug: str, load: Callable[..., Tuple[Any, Optional[str]]]) -> Any:
+    """`cache` entry for a slug, always stored under the profile's current slug.
+
+    An old slug 404s on the direct lookup and is then resolved through slug_aliases, so
+    invalidating the current slug (events.profile_changed) covers every printed link.
+    """
+    with _aliases_lock:
+        target = _alias_targets.get(slug, slug)
+    try:
+        return cache.get(target, lambda: load(target, aliases=False))
+    except HTTPException as e:
+        if e.status_code != 404 or target != slug:
+            raise
+        target = resolve_alias(slug)
+        if target is None:
+            raise
+    return cache.get(target, lambda: load(target, aliases=False))
+
+
+def load_card(slug: str, sticky: bool = False, aliases: bool = True) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Load a scannable DB profile; returns (card dict, owner user id) or raises 404/402."""
+    with read_session(sticky=sticky) as db:
+        m = _by_slug(db.query(ProfileModel), slug, aliases)
+        _gate(m, db.get(User, m.user_id) if m and m.user_id else None)
+        return profile_to_card(m), m.user_id
+
+
+def load_vcard(slug: str, sticky: bool = False, aliases: bool = True) -> Tuple[StoredVCard, Optional[str]]:
+    """The stored vCard of a DB profile; returns (vcard, owner user id) or raises 404/402.
+
+    One query for the narrow row (stored bytes + owner); rows not yet pre-rendered, or
+    rendered by an older VCARD_RENDER_VERSION, fall back to loading the card and rendering.
+    Sticky (read-your-writes) loads are served once and never cached, so they skip the
+    max-level precompression and leave encoding to CompressionMiddleware.
+    """
+    pack = Precompressed if sticky else precompress
+    with read_session(sticky=sticky) as db:
+        query = (
+            db.query(
+                ProfileModel.slug,
+                ProfileModel.active,
+                ProfileModel.user_id,
+                ProfileModel.vcard,
+                ProfileModel.vcard_hash,
+                ProfileModel.vcard_version,
+                User,
+            )
+            .outerjoin(User, User.id == ProfileModel.user_id)
+        )
+        row = _by_slug(query, slug, aliases)
+        _gate(row, row.User if row else None)
+        if prerender.is_current(row):
+            return pack(row.vcard, prerender.etag(row.vcard_hash)), row.user_id
+    card, owner = load_card(slug, sticky=sticky, aliases=aliases)
+    with timed("render"):
+        fields = prerender.render_fields(card)
+    return pack(fields["vcard"], prerender.etag(fields["vcard_hash"])), owner
+
+
+def cached_vcard(slug: str) -> StoredVCard:
+    # hot slugs share one load; stale renders cover refreshes and DB blips
+    return cached_by_slug(vcards, slug, load_vcard)
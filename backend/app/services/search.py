@@ -0,0 +1,93 @@
+from typing import List, Optional
+
+from sqlalchemy import Text, cast, column, func, or_, table, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from ..models import Profile as ProfileModel
+
+MAX_LIMIT = 100
+SEARCH_FIELDS = ("name", "org", "title", "email")
+# search field -> profiles_fts column (SQLite)
+_FTS_COLUMNS = {"name": "full_name", "org": "org", "title": "title", "email": "emails"}
+# the FTS5 side table from migration 0001 (not an ORM model: create_all must not make it)
+_fts = table("profiles_fts", column("profile_id"), column("user_id"))
+
+
+def search_profiles(
+    db: Session,
+    user_id: str,
+    q: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+    **fields: Optional[str],
+) -> List[ProfileModel]:
+    """Search the profiles owned by `user_id`.
+
+    `q` matches name, org or title (and email addresses when it contains "@"); the
+    keyword filters (`name`, `org`, `title`, `email`) must all match. Postgres uses
+    the pg_trgm GIN indexes from migrations.py, SQLite the `profiles_fts` FTS5 table,
+    falling back to LIKE scans if that table has not been migrated yet.
+    """
+    terms = {k: v.strip().lower() for k, v in fields.items() if k in SEARCH_FIELDS and v and v.strip()}
+    q = (q or "").strip().lower() or None
+    limit = max(1, min(limit, MAX_LIMIT))
+    offset = max(0, offset)
+
+    if db.get_bind().dialect.name == "sqlite":
+        try:
+            return _search_fts(db, user_id, q, terms, limit, offset)
+        except OperationalError:
+            db.rollback()
+    return _search_like(db, user_id, q, terms, limit, offset)
+
+
+def _q_fields(q: str) -> tuple:
+    return SEARCH_FIELDS if "@" in q else ("name", "org", "title")
+
+
+def _like_column(field: str):
+    if field == "email":
+        return func.lower(cast(ProfileModel.emails, Text))
+    return func.lower({"name": ProfileModel.full_name, "org": ProfileModel.org, "title": ProfileModel.title}[field])
+
+
+def _like(field: str, term: str):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return _like_column(field).like(f"%{escaped}%", escape="\\")
+
+
+def _search_like(db: Session, user_id: str, q, terms, limit: int, offset: int) -> List[ProfileModel]:
+    query = db.query(ProfileModel).filter(ProfileModel.user_id == user_id)
+    if q:
+        query = query.filter(or_(*[_like(f, q) for f in _q_fields(q)]))
+    for field, term in terms.items():
+        query = query.filter(_like(field, term))
+    return query.order_by(ProfileModel.full_name, ProfileModel.id).offset(offset).limit(limit).all()
+
+
+def _fts_phrase(term: str) -> str:
+    # quoted FTS5 string (tokenized as a phrase), prefix-matched on its last token
+    return '"' + term.replace('"', '""') + '"*'
+
+
+def _search_fts(db: Session, user_id: str, q, terms, limit: int, offset: int) -> List[ProfileModel]:
+    clauses = []
+    if q:
+        columns = " ".join(_FTS_COLUMNS[f] for f in _q_fields(q))
+        clauses.append(f"{{{columns}}} : {_fts_phrase(q)}")
+    for field, term in terms.items():
+        clauses.append(f"{_FTS_COLUMNS[field]} : {_fts_phrase(term)}")
+    if not clauses:
+        return _search_like(db, user_id, None, {}, limit, offset)
+    # one statement: the match, owner filter, ordering and page all run in SQLite
+    return (
+        db.query(ProfileModel)
+        .join(_fts, _fts.c.profile_id == ProfileModel.id)
+        .filter(text("profiles_fts MATCH :match"), _fts.c.user_id == user_id, ProfileModel.user_id == user_id)
+        .params(match=" AND ".join(clauses))
+        .order_by(ProfileModel.full_name, ProfileModel.id)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
@@ -0,0 +1,168 @@
+"""
+Profile slugs and the scan links printed in QR codes.
+
+Legacy slugs are 8 mixed-case url-safe characters served at `/u/{slug}.vcf`; lowercase
+letters force QR byte mode (8 bits per character). Compact slugs are uppercase Crockford
+base32 (no I/L/O/U) served at `/C/{SLUG}`. With the scheme and host uppercased (both are
+case-insensitive), the whole link stays inside the QR alphanumeric set, which costs 5.5
+bits per character, so the printed code is usually one or two versions smaller.
+
+Config:
+  COMPACT_SLUGS        new profiles get compact slugs (default false)
+  COMPACT_SLUG_LENGTH  characters per compact slug (default 8, 40 bits)
+
+`python -m app.cli compact-slugs` moves existing profiles onto compact slugs; each old
+slug is kept in `slug_aliases`, so codes that are already printed keep resolving.
+"""
+import os
+import re
+import secrets
+from typing import Dict, Iterator, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from ..models import Profile as ProfileModel, SlugAlias
+
+COMPACT_SLUGS = os.getenv("COMPACT_SLUGS", "false").lower() in ("true", "1", "yes")
+COMPACT_SLUG_LENGTH = int(os.getenv("COMPACT_SLUG_LENGTH", "8"))
+COMPACT_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+COMPACT_PREFIX = "/C/"
+
+_COMPACT_RE = re.compile(f"^[{COMPACT_ALPHABET}]+$")
+QR_ALPHANUMERIC = frozenset("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:")
+
+# Data codewords per QR version 1..40 (ISO/IEC 18004 table 7)
+_DATA_CODEWORDS = {
+    "L": (19, 34, 55, 80, 108, 136, 156, 194, 232, 274, 324, 370, 428, 461, 523, 589, 647, 721, 795, 861,
+          932, 1006, 1094, 1174, 1276, 1370, 1468, 1531, 1631, 1735, 1843, 1955, 2071, 2191, 2306, 2434, 2566, 2702, 2812, 2956),
+    "M": (16, 28, 44, 64, 86, 108, 124, 154, 182, 216, 254, 290, 334, 365, 415, 453, 507, 563, 627, 669,
+          714, 782, 860, 914, 1000, 1062, 1128, 1193, 1267, 1373, 1455, 1541, 1631, 1725, 1812, 1914, 1992, 2102, 2216, 2334),
+}
+
+
+def legacy_slug() -> str:
+    return secrets.token_urlsafe(6).replace("_", "").replace("-", "")[:8]
+
+
+def compact_slug(length: int = COMPACT_SLUG_LENGTH) -> str:
+    return "".join(secrets.choice(COMPACT_ALPHABET) for _ in range(length))
+
+
+def is_compact(slug: str) -> bool:
+    return bool(_COMPACT_RE.match(slug))
+
+
+def _taken(db: Session, candidates: Set[str]) -> Set[str]:
+    # an alias still belongs to its profile, so it is never handed out again
+    taken = {s for (s,) in db.query(ProfileModel.slug).filter(ProfileModel.slug.in_(candidates))}
+    taken.update(s for (s,) in db.query(SlugAlias.slug).filter(SlugAlias.slug.in_(candidates)))
+    return taken
+
+
+def new_slugs(db: Session, n: int, compact: Optional[bool] = None) -> List[str]:
+    """n unused slugs with one lookup per round."""
+    make = compact_slug if (COMPACT_SLUGS if compact is None else compact) else legacy_slug
+    slugs: List[str] = []
+    while len(slugs) < n:
+        batch = {make() for _ in range(n - len(slugs))}
+        taken = _taken(db, batch)
+        slugs.extend(s for s in batch if s not in taken and s not in slugs)
+    return slugs
+
+
+def _public_host() -> str:
+    return os.getenv("PUBLIC_HOST", "http://localhost:3001").rstrip("/")
+
+
+def legacy_url(slug: str) -> str:
+    return f"{_public_host()}/u/{slug}.vcf"
+
+
+def compact_url(slug: str) -> str:
+    scheme, sep, rest = _public_host().partition("://")
+    host, slash, path = rest.partition("/")
+    # scheme and host are case-insensitive; a path in PUBLIC_HOST is kept as configured
+    return f"{scheme.upper()}{sep}{host.upper()}{slash}{path}{COMPACT_PREFIX}{slug}"
+
+
+def scan_url(slug: str) -> str:
+    """The link to encode in a profile's QR code."""
+    return compact_url(slug) if is_compact(slug) else legacy_url(slug)
+
+
+def _segment_bits(text: str, version: int) -> int:
+    """Bits for one QR segment holding `text` (alphanumeric mode when possible, else byte mode)."""
+    small, medium = version <= 9, version <= 26
+    if all(c in QR_ALPHANUMERIC for c in text):
+        count_bits = 9 if small else 11 if medium else 13
+        return 4 + count_bits + 11 * (len(text) // 2) + 6 * (len(text) % 2)
+    count_bits = 8 if small else 16
+    return 4 + count_bits + 8 * len(text.encode("utf-8"))
+
+
+def qr_version(text: str, ecc: str = "M") -> Optional[int]:
+    """Smallest QR version (1-40) holding `text` as one segment at the given error correction; None if none does."""
+    for version, codewords in enumerate(_DATA_CODEWORDS[ecc], 1):
+        if _segment_bits(text, version) <= codewords * 8:
+            return version
+    return None
+
+
+def modules(version: int) -> int:
+    """Side length of a QR symbol in modules."""
+    return 17 + 4 * version
+
+
+def compact(db: Session, m: ProfileModel) -> Optional[str]:
+    """Move a profile onto a new compact slug, keeping the old one as an alias; returns the old slug."""
+    if is_compact(m.slug):
+        return None
+    old = m.slug
+    db.add(SlugAlias(slug=old, profile_id=m.id))
+    m.slug = new_slugs(db, 1, compact=True)[0]
+    return old
+
+
+def compact_all(db: Session, batch_size: int = 500) -> Iterator[Dict[str, str]]:
+    """Compact every legacy slug in id-ordered batches (one commit each); yields {old, new} per profile."""
+    last_id = ""
+    while True:
+        batch = (
+            db.query(ProfileModel)
+            .filter(ProfileModel.id > last_id)
+            .order_by(ProfileModel.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return
+        moved = [(m.slug, old) for m in batch if (old := compact(db, m)) is not None]
+        db.commit()
+        last_id = batch[-1].id
+        for new, old in moved:
+            yield {"old": old, "new": new}
+
+
+def report(db: Session, ecc: str = "M", batch_size: int = 500) -> Iterator[Dict]:
+    """QR version of each profile's current link next to its compact link.
+
+    Profiles still on a legacy slug are measured against a compact slug of COMPACT_SLUG_LENGTH
+    (the version only depends on length and character set); compacted profiles are measured
+    against their oldest alias.
+    """
+    query = db.query(ProfileModel.id, ProfileModel.slug).order_by(ProfileModel.id).yield_per(batch_size)
+    placeholder = COMPACT_ALPHABET[0] * COMPACT_SLUG_LENGTH
+    aliases: Dict[str, str] = {}
+    for alias in db.query(SlugAlias).order_by(SlugAlias.created_at.desc()):
+        aliases[alias.profile_id] = alias.slug
+    for profile_id, slug in query:
+        legacy = slug if not is_compact(slug) else aliases.get(profile_id)
+        compact_link = compact_url(slug if is_compact(slug) else placeholder)
+        before = qr_version(legacy_url(legacy), ecc) if legacy else None
+        after = qr_version(compact_link, ecc)
+        yield {
+            "slug": slug,
+            "legacyVersion": before,
+            "compactVersion": after,
+            "saved": before - after if before and after else None,
+        }
@@ -0,0 +1,166 @@
+"""
+User provisioning with single-statement upserts.
+
+`provision()` is one `INSERT ... ON CONFLICT (email) DO UPDATE ... RETURNING` round trip
+(Postgres, and SQLite >= 3.35 with the same syntax), so concurrent first logins for the same
+email converge on one row instead of racing SELECT-then-INSERT. `provision_many()` sends
+the same statement as an executemany per chunk for bulk team onboarding.
+
+Trial windows on conflict follow a policy:
+  backfill  keep the existing trial; set it only when missing (OAuth login)
+  renew     replace it when missing or already lapsed (dev login)
+  extend    keep whichever of the existing and requested end is later (admin bulk)
+"""
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ..models_user import User, as_utc, gen_uuid
+from . import events
+
+TRIAL_DAYS = int(os.getenv("TRIAL_DAYS", "7"))
+PROVISION_BATCH_SIZE = int(os.getenv("PROVISION_BATCH_SIZE", "500"))
+TRIAL_POLICIES = ("backfill", "renew", "extend")
+
+
+@dataclass
+class Provisioned:
+    id: str
+    email: str
+    trial_ends_at: Optional[datetime]
+    created: bool
+    # the trial end this call wrote to an existing user (entitlement may have flipped)
+    trial_changed: bool
+
+
+def _insert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(User)
+    if dialect == "sqlite":
+        return sqlite.insert(User)
+    raise RuntimeError(f"user upsert needs INSERT ... ON CONFLICT (postgresql or sqlite), not {dialect}")
+
+
+def _upsert(db: Session, policy: str, now: datetime):
+    if policy not in TRIAL_POLICIES:
+        raise ValueError(f"trial policy must be one of {TRIAL_POLICIES}")
+    stmt = _insert(db)
+    existing, requested = User.trial_ends_at, stmt.excluded.trial_ends_at
+    if policy == "backfill":
+        trial = func.coalesce(existing, requested)
+    elif policy == "renew":
+        trial = case((existing.is_(None), requested), (existing < now, requested), else_=existing)
+    else:
+        later = func.greatest if db.get_bind().dialect.name == "postgresql" else func.max
+        trial = later(func.coalesce(existing, requested), requested)
+    return stmt.on_conflict_do_update(
+        index_elements=[User.email],
+        set_={
+            # bulk rows may omit profile fields; never blank out what login already filled in
+            "name": func.coalesce(stmt.excluded.name, User.name),
+            "picture": func.coalesce(stmt.excluded.picture, User.picture),
+            "trial_ends_at": trial,
+        },
+    ).returning(User.id, User.email, User.trial_ends_at)
+
+
+def _result(row, sent: Dict) -> Provisioned:
+    trial = as_utc(row.trial_ends_at)
+    created = row.id == sent["id"]
+    return Provisioned(
+        id=row.id,
+        email=row.email,
+        trial_ends_at=trial,
+        created=created,
+        trial_changed=not created and sent["trial_ends_at"] is not None and trial == sent["trial_ends_at"],
+    )
+
+
+def provision(
+    db: Session,
+    email: str,
+    name: Optional[str] = None,
+    picture: Optional[str] = None,
+    trial_days: int = TRIAL_DAYS,
+    policy: str = "backfill",
+) -> Provisioned:
+    """Create or update one user in a single round trip and commit; ValueError for an unusable email."""
+    normalized = normalize_email(email)
+    if normalized is None:
+        raise ValueError(f"invalid email: {email!r}")
+    now = datetime.now(timezone.utc)
+    sent = {"id": gen_uuid(), "email": normalized, "name": name, "picture": picture, "trial_ends_at": now + timedelta(days=trial_days)}
+    row = db.execute(_upsert(db, policy, now).values(**sent)).one()
+    db.commit()
+    result = _result(row, sent)
+    if result.trial_changed:
+        events.entitlement_changed(result.id)
+    return result
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    email = (email or "").strip().lower()
+    local, _, domain = email.partition("@")
+    return email if local and "." in domain else None
+
+
+def _chunks(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk: List[Dict] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def provision_many(
+    db: Session,
+    members: Iterable[Dict],
+    trial_days: int = TRIAL_DAYS,
+    policy: str = "extend",
+    batch_size: int = PROVISION_BATCH_SIZE,
+) -> Dict:
+    """Bulk upsert of {email, name?, trialDays?} dicts, one executemany statement per chunk.
+
+    Returns {"created", "updated", "invalid": [emails]}; each chunk commits on its own.
+    """
+    now = datetime.now(timezone.utc)
+    counts = {"created": 0, "updated": 0, "invalid": []}
+    stmt = None
+
+    def rows() -> Iterator[Dict]:
+        for m in members:
+            email = normalize_email(m.get("email"))
+            if email is None:
+                counts["invalid"].append(m.get("email"))
+                continue
+            days = m.get("trialDays")
+            yield {
+                "id": gen_uuid(),
+                "email": email,
+                "name": m.get("name") or None,
+                "picture": None,
+                "trial_ends_at": now + timedelta(days=trial_days if days is None else int(days)),
+            }
+
+    for chunk in _chunks(rows(), batch_size):
+        # ON CONFLICT can't touch the same row twice in one statement: last entry per email wins
+        chunk = list({r["email"]: r for r in chunk}.values())
+        stmt = stmt if stmt is not None else _upsert(db, policy, now)
+        returned = db.execute(stmt, chunk).all()
+        db.commit()
+        sent = {r["email"]: r for r in chunk}
+        for row in returned:
+            result = _result(row, sent[row.email])
+            counts["created" if result.created else "updated"] += 1
+            if result.trial_changed:
+                events.entitlement_changed(result.id)
+    return counts
@@ -1,4 +1,6 @@
-from typing import Dict, List
+import quopri
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
 
 def _escape(text: str) -> str:
     if text is None:
@@ -84,3 +86,277 @@ def build_vcard(profile: Dict) -> str:
     lines.append("END:VCARD")
     return "\r\n".join(lines) + "\r\n"
 
+
+
+# --- Parsing (inverse of build_vcard) -------------------------------------------------
+
+# Cards bigger than this (usually inline base64 photos we don't keep) are reported, not buffered
+MAX_CARD_BYTES = 256 * 1024
+SOCIAL_KINDS = ("linkedin", "instagram", "twitter", "facebook")
+_SOCIAL_HOSTS = {
+    "linkedin.com": "linkedin",
+    "instagram.com": "instagram",
+    "twitter.com": "twitter",
+    "x.com": "twitter",
+    "facebook.com": "facebook",
+}
+
+
+class VCardRecord:
+    """One BEGIN:VCARD..END:VCARD block: (name, params, raw value) properties plus where it started."""
+
+    def __init__(self, line: int):
+        self.line = line
+        self.props: List[Tuple[str, Dict[str, List[str]], str]] = []
+        self.size = 0
+        self.error: Optional[str] = None
+
+
+def _split_unescaped(value: str, sep: str) -> List[str]:
+    parts, cur, i = [], [], 0
+    while i < len(value):
+        ch = value[i]
+        if ch == "\\" and i + 1 < len(value):
+            cur.append(value[i:i + 2])
+            i += 2
+            continue
+        if ch == sep:
+            parts.append("".join(cur))
+            cur = []
+        else:
+            cur.append(ch)
+        i += 1
+    parts.append("".join(cur))
+    return parts
+
+
+def _unescape(text: str) -> str:
+    out, i = [], 0
+    while i < len(text):
+        ch = text[i]
+        if ch == "\\" and i + 1 < len(text):
+            nxt = text[i + 1]
+            out.append("\n" if nxt in "nN" else nxt)
+            i += 2
+            continue
+        out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+def _parse_line(line: str) -> Optional[Tuple[str, Dict[str, List[str]], str]]:
+    # name;param=a,b;BARE:value -- ':' inside a quoted param value doesn't end the name
+    quoted = False
+    for i, ch in enumerate(line):
+        if ch == '"':
+            quoted = not quoted
+        elif ch == ":" and not quoted:
+            head, value = line[:i], line[i + 1:]
+            break
+    else:
+        return None
+    parts = head.split(";")
+    name = parts[0].rsplit(".", 1)[-1].upper()  # drop "item1." groups
+    params: Dict[str, List[str]] = {}
+    for p in parts[1:]:
+        if "=" in p:
+            k, v = p.split("=", 1)
+            params.setdefault(k.upper(), []).extend(x.strip('"').lower() for x in v.split(","))
+        elif p:
+            # vCard 2.1 bare params: TEL;WORK;VOICE:...
+            params.setdefault("TYPE", []).append(p.lower())
+    return name, params, value
+
+
+def _is_qp(line: str) -> bool:
+    head = line.split(":", 1)[0].upper()
+    return "QUOTED-PRINTABLE" in head
+
+
+def _decode(params: Dict[str, List[str]], value: str) -> str:
+    if "quoted-printable" in params.get("ENCODING", []):
+        charset = (params.get("CHARSET") or ["utf-8"])[0]
+        try:
+            return quopri.decodestring(value.encode("latin-1", "replace")).decode(charset, "replace")
+        except LookupError:
+            return quopri.decodestring(value.encode("latin-1", "replace")).decode("utf-8", "replace")
+    return value
+
+
+def bounded_lines(stream, limit: int = MAX_CARD_BYTES) -> Iterator[bytes]:
+    """Physical lines of a binary stream, reading at most `limit + 1` bytes of any one line.
+
+    A longer line is yielded cut to `limit + 1` bytes (still over the card cap, so its card
+    is rejected) and the rest of it is skipped in chunks of the same size.
+    """
+    while True:
+        line = stream.readline(limit + 1)
+        if not line:
+            return
+        if len(line) > limit and line[-1:] not in (b"\n", "\n"):
+            while True:
+                rest = stream.readline(limit + 1)
+                if not rest or rest[-1:] in (b"\n", "\n"):
+                    break
+        yield line
+
+
+def iter_vcards(lines: Iterable[bytes]) -> Iterator[VCardRecord]:
+    """Stream vCard 2.1/3.0/4.0 records from raw lines (e.g. an open binary file).
+
+    Streams (anything with `readline`) are read through `bounded_lines`, so a physical line
+    without a newline never sits in memory whole. Folded lines (leading space/tab) and 2.1
+    quoted-printable soft breaks are unfolded one logical line at a time and capped at
+    MAX_CARD_BYTES, so memory stays near that cap whatever the size of the file. Plain
+    iterables of lines are trusted to bound each line themselves.
+    """
+    if hasattr(lines, "readline"):
+        lines = bounded_lines(lines)
+    record: Optional[VCardRecord] = None
+    pending: Optional[str] = None
+    pending_line = 0
+    # the logical line outgrew MAX_CARD_BYTES: the rest of its continuation lines are dropped
+    discarding = False
+
+    def reject() -> None:
+        record.error = f"card larger than {MAX_CARD_BYTES} bytes"
+        record.props = []
+
+    def overflows(text: str) -> bool:
+        # checked while unfolding, so one endlessly folded line can't grow without bound
+        if (record.size if record is not None else 0) + len(text) <= MAX_CARD_BYTES:
+            return False
+        if record is not None and not record.error:
+            reject()
+        return True
+
+    def flush(text: str, lineno: int) -> Optional[VCardRecord]:
+        nonlocal record
+        upper = text.strip().upper()
+        if upper == "BEGIN:VCARD":
+            record = VCardRecord(lineno)
+            return None
+        if record is None:
+            return None
+        if upper == "END:VCARD":
+            done, record = record, None
+            return done
+        if record.error:
+            return None
+        record.size += len(text)
+        if record.size > MAX_CARD_BYTES:
+            reject()
+            return None
+        parsed = _parse_line(text)
+        if parsed is None:
+            return None
+        name, params, value = parsed
+        if name == "PHOTO" and not value.lower().startswith(("http://", "https://")):
+            return None  # inline image data; only photo URLs are kept
+        record.props.append((name, params, _decode(params, value)))
+        return None
+
+    for lineno, raw in enumerate(lines, 1):
+        line = raw.decode("utf-8", "replace") if isinstance(raw, bytes) else raw
+        line = line.rstrip("\r\n")
+        if pending is not None and line[:1] in (" ", "\t"):
+            if not discarding:
+                pending += line[1:]
+                if overflows(pending):
+                    pending, discarding = "", True
+            continue
+        if pending is not None and _is_qp(pending) and pending.endswith("="):
+            pending = pending[:-1] + line  # quoted-printable soft line break
+            if overflows(pending):
+                pending, discarding = "", True
+            continue
+        if pending is not None:
+            done = flush(pending, pending_line)
+            if done is not None:
+                yield done
+        pending, pending_line, discarding = line, lineno, False
+    if pending is not None:
+        done = flush(pending, pending_line)
+        if done is not None:
+            yield done
+
+
+def _phone_type(types: List[str]) -> str:
+    if "work" in types:
+        return "work"
+    if "home" in types:
+        return "home"
+    return "cell"
+
+
+def _social_kind(link: str) -> Optional[str]:
+    host = urlsplit(link).hostname or ""
+    host = host[4:] if host.startswith("www.") else host
+    return _SOCIAL_HOSTS.get(host)
+
+
+def record_to_profile(record: VCardRecord) -> Dict:
+    """Map a parsed card onto the ProfileIn shape (camelCase dict; validation is the caller's)."""
+    out: Dict = {"phones": [], "emails": [], "social": {}}
+    urls: List[str] = []
+    address = None
+    for name, params, value in record.props:
+        types = params.get("TYPE", [])
+        if name == "FN":
+            out["fullName"] = _unescape(value).strip()
+        elif name == "N":
+            parts = [_unescape(p).strip() for p in _split_unescaped(value, ";")] + ["", ""]
+            out.setdefault("lastName", parts[0] or None)
+            out.setdefault("firstName", parts[1] or None)
+        elif name == "ORG":
+            org = ", ".join(p for p in (_unescape(c).strip() for c in _split_unescaped(value, ";")) if p)
+            out.setdefault("org", org or None)
+        elif name == "TITLE":
+            out.setdefault("title", _unescape(value).strip() or None)
+        elif name == "TEL":
+            number = _unescape(value).strip()
+            if number.lower().startswith("tel:"):
+                number = number[4:]
+            if number:
+                out["phones"].append({"type": _phone_type(types), "number": number})
+        elif name == "EMAIL":
+            addr = _unescape(value).strip()
+            if addr.lower().startswith("mailto:"):
+                addr = addr[7:]
+            if addr:
+                out["emails"].append({"type": "home" if "home" in types else "work", "address": addr})
+        elif name == "X-SOCIALPROFILE":
+            link = _unescape(value).strip()
+            if link.startswith("x-apple:"):
+                link = link[len("x-apple:"):]
+            kind = next((t for t in types if t in SOCIAL_KINDS), None) or _social_kind(link)
+            if kind and link:
+                out["social"].setdefault(kind, link)
+        elif name == "URL":
+            urls.append(_unescape(value).strip())
+        elif name == "ADR":
+            # first ADR wins unless a later one is explicitly the work address
+            if address is None or ("work" in types and "work" not in address[0]):
+                address = (types, [_unescape(p).strip() for p in _split_unescaped(value, ";")] + [""] * 7)
+        elif name == "NOTE":
+            out.setdefault("note", _unescape(value) or None)
+        elif name == "PHOTO":
+            out.setdefault("photoUrl", _unescape(value).strip())
+
+    # build_vcard writes each social link as URL + X-SOCIALPROFILE; the rest is the website
+    social_links = set(out["social"].values())
+    for link in urls:
+        if not link or link in social_links:
+            continue
+        kind = _social_kind(link)
+        if kind and kind not in out["social"]:
+            out["social"][kind] = link
+        elif "url" not in out:
+            out["url"] = link
+    if address is not None:
+        parts = address[1]
+        out["address"] = {"street": parts[2], "city": parts[3], "region": parts[4], "postcode": parts[5], "country": parts[6]}
+    if not out.get("fullName"):
+        name = " ".join(p for p in (out.get("firstName"), out.get("lastName")) if p)
+        out["fullName"] = name or out.get("org") or ""
+    return out
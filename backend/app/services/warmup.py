@@ -0,0 +1,145 @@
+"""
+Startup warm-up and readiness.
+
+Each worker process, on startup, in a background thread:
+  1. opens WARMUP_CONNECTIONS pooled connections (primary and replicas), so the first
+     scans skip connect + TLS + auth;
+  2. loads the WARMUP_TOP_N most recently updated active slugs (there is no scan analytics
+     table yet) through the vCard and landing-page caches. Entries carry the owner's
+     entitlement check, and running the slug/owner lookups fills SQLAlchemy's compiled
+     statement cache (and psycopg's prepared statements once hot).
+
+`/readyz` answers 503 until warm-up finishes or WARMUP_TIMEOUT seconds pass, whichever
+comes first, so a load balancer only routes to warm workers; `/healthz` stays a liveness
+check.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from ..db import SessionLocal, engine, replicas
+from ..models import Profile as ProfileModel
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("true", "1", "yes")
+WARMUP_TOP_N = int(os.getenv("WARMUP_TOP_N", "200"))
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "20"))
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "5"))
+WARMUP_WORKERS = int(os.getenv("WARMUP_WORKERS", "4"))
+
+log = logging.getLogger(__name__)
+
+
+class WarmupState:
+    def __init__(self):
+        self.state = "pending"  # pending | running | done | failed
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.deadline: Optional[float] = None
+        self.connections = 0
+        self.slugs = 0
+        self.warmed = 0
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def ready(self) -> bool:
+        if self.state == "done":
+            return True
+        # a slow or failed warm-up must not keep the worker out of rotation forever
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def snapshot(self) -> Dict:
+        elapsed = None
+        if self.started is not None:
+            elapsed = round((self.finished or time.monotonic()) - self.started, 3)
+        return {
+            "ready": self.ready(),
+            "state": "timeout" if self.state != "done" and self.ready() else self.state,
+            "elapsed": elapsed,
+            "connections": self.connections,
+            "slugs": self.slugs,
+            "warmed": self.warmed,
+            "error": self.error,
+        }
+
+
+status = WarmupState()
+
+
+def open_pool(n: int = WARMUP_CONNECTIONS) -> int:
+    """Check out n connections at once (so the pool really grows), ping them and return them."""
+    opened = 0
+    for e in [engine] + [r.engine for r in replicas.replicas]:
+        conns = []
+        try:
+            for _ in range(max(1, min(n, getattr(e.pool, "size", lambda: n)()))):
+                conns.append(e.connect())
+            for conn in conns:
+                conn.execute(text("SELECT 1"))
+            opened += len(conns)
+        finally:
+            for conn in conns:
+                conn.close()
+    return opened
+
+
+def top_slugs(n: int = WARMUP_TOP_N) -> List[str]:
+    with SessionLocal() as db:
+        rows = (
+            db.query(ProfileModel.slug)
+            .filter(ProfileModel.active.is_(True))
+            .order_by(ProfileModel.updated_at.desc())
+            .limit(n)
+        )
+        return [slug for (slug,) in rows]
+
+
+def _warm_slug(slug: str) -> bool:
+    from .landing import cached_page
+    from .scan import cached_vcard
+
+    try:
+        cached_vcard(slug)
+        cached_page(slug)
+        return True
+    except HTTPException:
+        return False  # 404/402: nothing to serve, nothing to cache
+
+
+def run(state: WarmupState = status, timeout: float = WARMUP_TIMEOUT, top_n: int = WARMUP_TOP_N) -> WarmupState:
+    state.started = time.monotonic()
+    state.deadline = state.started + timeout
+    state.state = "running"
+    try:
+        state.connections = open_pool()
+        slugs = top_slugs(top_n)
+        state.slugs = len(slugs)
+        with ThreadPoolExecutor(max_workers=WARMUP_WORKERS, thread_name_prefix="warmup") as pool:
+            futures = [pool.submit(_warm_slug, s) for s in slugs]
+            done, pending = wait(futures, timeout=max(0.0, state.deadline - time.monotonic()))
+            for f in pending:
+                f.cancel()
+            state.warmed = sum(1 for f in done if not f.exception() and f.result())
+        state.state = "done"
+    except Exception as e:
+        state.state = "failed"
+        state.error = f"{type(e).__name__}: {e}"
+        log.exception("warm-up failed")
+    finally:
+        state.finished = time.monotonic()
+    log.info("warm-up %s", state.state, extra=state.snapshot())
+    return state
+
+
+def start() -> None:
+    """Run warm-up in a background thread (startup must not block liveness checks)."""
+    if not WARMUP_ENABLED:
+        status.state = "done"
+        return
+    status.deadline = time.monotonic() + WARMUP_TIMEOUT
+    threading.Thread(target=run, name="warmup", daemon=True).start()
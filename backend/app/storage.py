@@ -7,6 +7,9 @@ from pathlib import Path
 
 import boto3
 
+from . import tracing
+from .media import index as media_index
+
 
 def get_s3_client():
     endpoint_url = os.getenv("S3_ENDPOINT_URL")
@@ -48,7 +51,13 @@ def build_public_url(key: str) -> str:
     return f"{public_host.rstrip('/')}/media/{key}"
 
 
-def create_presigned_put(key: str, content_type: str, expires_in: int = 900, cache_control: str | None = None) -> str:
+def create_presigned_put(
+    key: str,
+    content_type: str,
+    expires_in: int = 900,
+    cache_control: str | None = None,
+    checksum_sha256: str | None = None,
+) -> str:
     bucket = os.getenv("S3_BUCKET")
     client = get_s3_client()
     params = {
@@ -58,18 +67,63 @@ def create_presigned_put(key: str, content_type: str, expires_in: int = 900, cac
     }
     if cache_control:
         params["CacheControl"] = cache_control
-    url = client.generate_presigned_url(
-        "put_object", Params=params, ExpiresIn=expires_in
-    )
+    if checksum_sha256:
+        # base64 SHA-256; the PUT must send a matching x-amz-checksum-sha256 header
+        params["ChecksumSHA256"] = checksum_sha256
+    with tracing.span("storage.sign", operation="put_object", key=key):
+        url = client.generate_presigned_url(
+            "put_object", Params=params, ExpiresIn=expires_in
+        )
     return url
 
 
 def save_local_bytes(key: str, data: bytes):
-    upload_dir = os.getenv("UPLOAD_DIR", os.path.join(os.getcwd(), "media"))
-    # prevent path traversal
     safe_key = key.replace("..", "").lstrip("/")
-    path = Path(upload_dir) / safe_key
+    path = local_path(key)
     path.parent.mkdir(parents=True, exist_ok=True)
     with open(path, "wb") as f:
         f.write(data)
+    # drop cached metadata so /media picks up the new bytes (and any new variants)
+    media_index.invalidate(safe_key)
     return str(path)
+
+
+def local_path(key: str, base_dir: str | None = None) -> Path:
+    upload_dir = base_dir or os.getenv("UPLOAD_DIR", os.path.join(os.getcwd(), "media"))
+    # prevent path traversal
+    safe_key = key.replace("..", "").lstrip("/")
+    return Path(upload_dir) / safe_key
+
+
+def put_s3_bytes(key: str, data: bytes, content_type: str, bucket: str | None = None, client=None, **extra) -> None:
+    """Upload bytes to S3/R2. `extra` passes through put_object args (CacheControl, ContentDisposition, ...)."""
+    client = client or get_s3_client()
+    client.put_object(
+        Bucket=bucket or os.getenv("S3_BUCKET"),
+        Key=key,
+        Body=data,
+        ContentType=content_type or "application/octet-stream",
+        **extra,
+    )
+
+
+def delete_s3_objects(keys: list[str], bucket: str | None = None, client=None) -> None:
+    client = client or get_s3_client()
+    bucket = bucket or os.getenv("S3_BUCKET")
+    # DeleteObjects accepts at most 1000 keys per call
+    for i in range(0, len(keys), 1000):
+        chunk = keys[i:i + 1000]
+        client.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": k} for k in chunk], "Quiet": True})
+
+
+def list_s3_keys(prefix: str, bucket: str | None = None, client=None):
+    """Yield (key, last_modified) under prefix, one listing page at a time."""
+    client = client or get_s3_client()
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket or os.getenv("S3_BUCKET"), Prefix=prefix):
+        for obj in page.get("Contents", []):
+            yield obj["Key"], obj["LastModified"]
+
+
+def s3_configured() -> bool:
+    return bool(os.getenv("S3_ENDPOINT_URL") and os.getenv("S3_BUCKET") and os.getenv("S3_ACCESS_KEY_ID"))
@@ -0,0 +1,73 @@
+"""
+Job definitions. Imported lazily by app.jobs so every process (web, worker, process-pool
+child) sees the same registry.
+"""
+import os
+import tempfile
+
+from fastapi import HTTPException
+
+from .jobs import job
+from .services import publisher
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it uploads are served as-is
+    Image = None
+
+# Image variants are written next to the original for MediaFiles to negotiate by Accept
+VARIANT_FORMATS = (("webp", ".webp"), ("avif", ".avif"))
+VARIANTS_ENABLED = Image is not None and os.getenv("MEDIA_VARIANTS", "true").lower() in ("true", "1", "yes")
+
+
+@job("publish_slug", max_concurrency=4)
+def publish_slug(slug: str) -> None:
+    publisher.publish_slug(slug)
+
+
+@job("publish_user", max_concurrency=2)
+def publish_user(user_id: str) -> None:
+    publisher.publish_user(user_id)
+
+
+@job("warm_vcard", max_concurrency=4, retries=1)
+def warm_vcard(slug: str) -> None:
+    from .services.scan import cached_vcard
+
+    try:
+        cached_vcard(slug)
+    except HTTPException:
+        pass  # 404/402 are answers, not failures
+
+
+@job("media_variants", pool="process", max_concurrency=2, retries=1)
+def media_variants(key: str) -> list:
+    """Encode WebP/AVIF siblings of an uploaded image in UPLOAD_DIR; returns the keys written.
+
+    Runs in a process pool; the web process's media index picks the siblings up when its
+    entry expires (MEDIA_INDEX_TTL).
+    """
+    if Image is None:
+        return []
+    from .storage import local_path
+
+    src = local_path(key)
+    written = []
+    with Image.open(src) as im:
+        im.load()
+        for fmt, suffix in VARIANT_FORMATS:
+            dst = src.with_name(src.name + suffix)
+            # encode beside the target and rename over it, so /media never serves a half-written file
+            fd, tmp = tempfile.mkstemp(dir=src.parent, prefix=f".{dst.name}.", suffix=".tmp")
+            os.close(fd)
+            try:
+                im.save(tmp, format=fmt.upper(), quality=80)
+                os.replace(tmp, dst)
+            except (KeyError, OSError, ValueError):
+                continue  # this Pillow build lacks the encoder
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            written.append(key + suffix)
+    return written
+
@@ -0,0 +1,153 @@
+"""
+Lightweight local tracing spans.
+
+A trace starts per request (logs.RequestContextMiddleware) and is kept for only
+TRACE_SAMPLE_RATE of requests. Inside a sampled trace, `span(name)` times a block and
+records its parent span. DB statements, `profiling.timed` phases (render, serialize),
+storage signing and the OAuth exchange are spanned. Outside a sampled trace `span()` is a
+single contextvar read, so an unsampled request pays next to nothing.
+
+Finished spans go to the `app.trace` logger, one JSON object per span. logs.setup()
+routes that logger through its own queue to the exporter, so exporting never blocks a
+request.
+
+Config:
+  TRACE_EXPORTER     none | console | file (default none: tracing off)
+  TRACE_FILE         JSON-lines file for the file exporter (default traces.jsonl)
+  TRACE_SAMPLE_RATE  fraction of requests traced (default 0.01)
+"""
+import json
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_LOGGER = "app.trace"
+# long statements (bulk inserts) are cut in span attributes
+MAX_STATEMENT_CHARS = 500
+
+_log = logging.getLogger(TRACE_LOGGER)
+
+
+@dataclass
+class Span:
+    trace_id: str
+    name: str
+    parent_id: Optional[str] = None
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    start: float = field(default_factory=time.time)
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    def finish(self, duration: float, error: Optional[BaseException] = None) -> None:
+        out = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentId": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "durationMs": round(duration * 1000, 3),
+            "attrs": self.attrs,
+        }
+        if error is not None:
+            out["error"] = f"{type(error).__name__}: {error}"
+        _log.info("span", extra={"span": out})
+
+
+_span: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+def enabled() -> bool:
+    return TRACE_EXPORTER in ("console", "file") and TRACE_SAMPLE_RATE > 0
+
+
+def current_trace_id() -> Optional[str]:
+    s = _span.get()
+    return s.trace_id if s is not None else None
+
+
+@contextmanager
+def _run(s: Span) -> Iterator[Span]:
+    token = _span.set(s)
+    started = time.perf_counter()
+    error = None
+    try:
+        yield s
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _span.reset(token)
+        s.finish(time.perf_counter() - started, error)
+
+
+@contextmanager
+def trace(name: str, **attrs) -> Iterator[Optional[Span]]:
+    """Start a new trace (a root span) if this unit of work is sampled; yields the span or None."""
+    if not enabled() or random.random() >= TRACE_SAMPLE_RATE:
+        yield None
+        return
+    with _run(Span(uuid.uuid4().hex, name, attrs=attrs)) as s:
+        yield s
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Optional[Span]]:
+    """Child span of the current one; a no-op (yields None) when the work isn't traced."""
+    parent = _span.get()
+    if parent is None:
+        yield None
+        return
+    with _run(Span(parent.trace_id, name, parent_id=parent.span_id, attrs=attrs)) as s:
+        yield s
+
+
+class SpanFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(getattr(record, "span", {}), default=str)
+
+
+def exporter_handler() -> Optional[logging.Handler]:
+    """Handler that writes finished spans for TRACE_EXPORTER (None when tracing is off)."""
+    if TRACE_EXPORTER == "file":
+        handler: logging.Handler = logging.FileHandler(TRACE_FILE, delay=True)
+    elif TRACE_EXPORTER == "console":
+        handler = logging.StreamHandler(sys.stderr)
+    else:
+        return None
+    handler.setFormatter(SpanFormatter())
+    return handler
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _span.get() is not None:
+        conn.info.setdefault("trace_query_start", []).append((time.time(), time.perf_counter()))
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _span.get()
+    starts = conn.info.get("trace_query_start")
+    if parent is None or not starts:
+        return
+    wall, started = starts.pop()
+    s = Span(
+        parent.trace_id,
+        "db.query",
+        parent_id=parent.span_id,
+        start=wall,
+        attrs={"statement": statement[:MAX_STATEMENT_CHARS], "rows": cursor.rowcount, "executemany": executemany},
+    )
+    s.finish(time.perf_counter() - started)
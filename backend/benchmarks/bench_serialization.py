@@ -0,0 +1,94 @@
+"""
+Per-request cost of turning a Profile row into the /api/profile JSON body.
+
+  before: hand-built ProfileOut -> FastAPI response_model validation -> jsonable_encoder -> JSONResponse
+  after:  serializers.profile_to_out -> FastJSONResponse (orjson when installed)
+
+Usage (from backend/):
+  python -m benchmarks.bench_serialization [iterations]
+"""
+import os
+import sys
+import timeit
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.models import Profile as ProfileModel
+from app.schemas import ProfileOut
+from app.serializers import FastJSONResponse, profile_to_out
+
+
+def _row() -> ProfileModel:
+    return ProfileModel(
+        id="0123456789abcdef0123456789abcdef",
+        slug="AbCd1234",
+        user_id="fedcba9876543210fedcba9876543210",
+        full_name="Ada Lovelace",
+        first_name="Ada",
+        last_name="Lovelace",
+        org="Analytical Engines",
+        title="Engineer",
+        url="https://example.com/",
+        note="Scan to save.",
+        photo_url="https://i.example.com/profiles/u/0123456789abcdef0123456789abcdef.jpg",
+        phones=[{"type": "cell", "number": "+15551234567"}, {"type": "work", "number": "+15557654321"}],
+        emails=[{"type": "work", "address": "ada@example.com"}],
+        address={"street": "1 Computing Way", "city": "London", "region": "", "postcode": "SW1A 1AA", "country": "UK"},
+        social={
+            "linkedin": "https://www.linkedin.com/in/adalovelace",
+            "instagram": "https://www.instagram.com/ada",
+            "twitter": "https://twitter.com/ada",
+            "facebook": "https://www.facebook.com/ada",
+        },
+    )
+
+
+FIELD = create_model_field(name="Response_profile", type_=ProfileOut, mode="serialization")
+
+
+def before(m: ProfileModel) -> bytes:
+    out = ProfileOut(
+        id=m.id,
+        slug=m.slug,
+        fullName=m.full_name,
+        firstName=m.first_name,
+        lastName=m.last_name,
+        org=m.org,
+        title=m.title,
+        phones=m.phones,
+        emails=m.emails,
+        url=m.url,
+        social=m.social,
+        address=m.address,
+        note=m.note,
+        photoUrl=m.photo_url,
+    )
+    # serialize_response never suspends for async endpoints, so drive it without an event loop
+    coro = serialize_response(field=FIELD, response_content=out, is_coroutine=True)
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        content = done.value
+    return JSONResponse(content).body
+
+
+def after(m: ProfileModel) -> bytes:
+    return FastJSONResponse(profile_to_out(m)).body
+
+
+def main(argv: list[str]) -> int:
+    iterations = int(argv[0]) if argv else 20000
+    m = _row()
+    for name, fn in (("before", before), ("after", after)):
+        best = min(timeit.repeat(lambda: fn(m), number=iterations, repeat=5))
+        print(f"{name:>6}: {best / iterations * 1e6:8.2f} us/request")
+    print(f"(after uses {FastJSONResponse.__name__})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,107 @@
+"""
+Startup time and throughput of the production entry point.
+
+Starts `python -m app.serve` (or the old single `uvicorn app.main:app` with --baseline) on a
+scratch SQLite database, times how long until /healthz answers, then drives `path` from
+`concurrency` keep-alive client threads for `seconds` and reports requests/second.
+
+Usage (from backend/):
+  python -m benchmarks.bench_serve [--baseline] [workers] [seconds] [concurrency] [path]
+
+  e.g. python -m benchmarks.bench_serve 4 10 32 /u/demo123.vcf
+"""
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PORT = int(os.getenv("BENCH_PORT", "3291"))
+
+
+def _start(baseline: bool, workers: int, db_path: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "ENV": "development",
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "PORT": str(PORT),
+        "WEB_CONCURRENCY": str(workers),
+        "SQL_TRACE": "false",
+    }
+    if baseline:
+        cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(PORT), "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-m", "app.serve"]
+    return subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _wait_ready(proc: subprocess.Popen, timeout: float = 30) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=1)
+            conn.request("GET", "/healthz")
+            if conn.getresponse().status == 200:
+                return time.perf_counter() - started
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("server did not become ready")
+
+
+def _drive(path: str, seconds: float, concurrency: int) -> tuple:
+    deadline = time.perf_counter() + seconds
+    counts = [0] * concurrency
+    errors = [0] * concurrency
+
+    def client(i: int):
+        conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=10)
+        while time.perf_counter() < deadline:
+            try:
+                conn.request("GET", path)
+                r = conn.getresponse()
+                r.read()
+                if r.status == 200:
+                    counts[i] += 1
+                else:
+                    errors[i] += 1
+            except (OSError, http.client.HTTPException):
+                errors[i] += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=10)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts), sum(errors)
+
+
+def main(argv: list[str]) -> int:
+    baseline = "--baseline" in argv
+    args = [a for a in argv if a != "--baseline"]
+    workers = int(args[0]) if len(args) > 0 else 2
+    seconds = float(args[1]) if len(args) > 1 else 5
+    concurrency = int(args[2]) if len(args) > 2 else 16
+    path = args[3] if len(args) > 3 else "/u/demo123.vcf"
+    with tempfile.TemporaryDirectory() as tmp:
+        proc = _start(baseline, workers, os.path.join(tmp, "bench.db"))
+        try:
+            ready = _wait_ready(proc)
+            ok, errors = _drive(path, seconds, concurrency)
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=60)
+    label = "uvicorn (baseline)" if baseline else f"app.serve workers={workers}"
+    print(f"{label}: ready in {ready * 1000:.0f} ms")
+    print(f"  GET {path}: {ok / seconds:,.0f} req/s over {seconds:g}s, concurrency={concurrency}, errors={errors}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
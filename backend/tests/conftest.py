@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+
+# app.db reads DATABASE_URL on import, so the defaults must be set before any test module imports the app
+_TMP = tempfile.mkdtemp(prefix="qrcard-tests-")
+os.environ.setdefault("ENV", "development")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP, 'test.db')}")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_TMP, "media"))
+os.environ.setdefault("PUBLIC_HOST", "http://localhost:3001")
+os.environ.setdefault("PUBLISH_TARGET", "")
+
+
+def _drain_jobs(timeout: float = 5.0) -> None:
+    # background jobs from the previous module may still hold a connection
+    from app import jobs
+
+    if jobs._executor is None:
+        return
+    deadline = time.time() + timeout
+    while not jobs._executor.idle() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def fresh_database():
+    """Give every test module an empty, fully migrated database."""
+    import app.main  # noqa: F401  registers every model on Base.metadata
+    from app import migrations
+    from app.db import Base, engine
+
+    _drain_jobs()
+    # pooled connections keep the old file open; drop them before replacing it
+    engine.dispose()
+    path = engine.url.database
+    if engine.url.get_backend_name() == "sqlite" and path and path != ":memory:":
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    Base.metadata.create_all(bind=engine)
+    migrations.upgrade(engine)
+    yield
+    _drain_jobs()
+    engine.dispose()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_TMP, ignore_errors=True)
@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app import jobs
+from app.services.cache import SWRCache, vcards
+
+
+def test_concurrent_misses_share_one_load():
+    cache = SWRCache("t", ttl=60)
+    calls = []
+    gate = threading.Event()
+
+    def loader():
+        calls.append(1)
+        gate.wait(2)
+        return "card", None
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("slug", loader))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert results == ["card"] * 8
+    assert len(calls) == 1
+    assert cache.stats["coalesced"] == 7
+
+
+def test_stale_while_revalidate_and_on_error():
+    cache = SWRCache("t", ttl=0, stale_ttl=60, stale_if_error_ttl=120)
+    cache.put("slug", "old", tag="u1")
+    refreshed = threading.Event()
+
+    def refresh():
+        refreshed.set()
+        return "new", "u1"
+
+    assert cache.get("slug", refresh) == "old"
+    assert refreshed.wait(2)
+    assert cache.stats["stale"] == 1
+
+    outage = SWRCache("t", ttl=0, stale_ttl=0, stale_if_error_ttl=120)
+    outage.put("slug", "last-good")
+
+    def broken():
+        raise RuntimeError("db down")
+
+    assert outage.get("slug", broken) == "last-good"
+    assert outage.stats["stale_error"] == 1
+
+    def gone():
+        raise HTTPException(status_code=402)
+
+    # a real answer (402/404) evicts instead of serving stale
+    with pytest.raises(HTTPException):
+        outage.get("slug", gone)
+    with pytest.raises(RuntimeError):
+        outage.get("slug", broken)
+
+
+def test_vcard_route_uses_cache():
+    client = TestClient(app)
+    client.post("/dev/login")
+    assert client.post("/dev/seed-profile").status_code == 200
+    # let the post-write warm-up job finish before measuring
+    deadline = time.time() + 5
+    while not jobs.executor().idle() and time.time() < deadline:
+        time.sleep(0.01)
+    vcards.clear()
+
+    # fresh client: no read-your-writes pin, so scans go through the cache
+    scanner = TestClient(app)
+    before = dict(vcards.stats)
+    for _ in range(3):
+        r = scanner.get("/u/devcard.vcf")
+        assert r.status_code == 200
+        assert "FN:Dev User" in r.text
+    assert vcards.stats["misses"] - before["misses"] == 1
+    assert vcards.stats["hits"] - before["hits"] == 2
+    assert scanner.get("/admin/cache-stats").json()["caches"][0]["name"] == "vcards"
+
+
+def test_cache_stats_needs_the_admin_token(monkeypatch):
+    from app.routes import admin
+
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "s3cret")
+    client = TestClient(app)
+    assert client.get("/admin/cache-stats").status_code == 401
+    r = client.get("/admin/cache-stats", headers={"Authorization": "Bearer s3cret"})
+    assert r.status_code == 200 and "replicas" in r.json()
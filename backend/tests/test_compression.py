@@ -0,0 +1,91 @@
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.compression import CompressionMiddleware, negotiate
+from app.main import app
+from app.routes import vcf
+
+
+def test_negotiate_honours_q_values_and_preference():
+    assert negotiate("gzip, br", ("br", "gzip")) == "br"
+    assert negotiate("br;q=0.5, gzip", ("br", "gzip")) == "gzip"
+    assert negotiate("gzip;q=0", ("gzip",)) is None
+    assert negotiate("*", ("gzip",)) == "gzip"
+    assert negotiate("identity", ("br", "gzip")) is None
+
+
+def _app():
+    api = FastAPI()
+    api.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @api.get("/big")
+    def big():
+        return PlainTextResponse("x" * 1000, headers={"ETag": '"abc"'})
+
+    @api.get("/small")
+    def small():
+        return PlainTextResponse("tiny")
+
+    @api.get("/png")
+    def png():
+        return Response(b"\x89PNG" * 500, media_type="image/png")
+
+    @api.get("/stream")
+    def stream():
+        return StreamingResponse((b"line %d\n" % i for i in range(500)), media_type="text/csv")
+
+    return TestClient(api)
+
+
+def test_middleware_compresses_allowlisted_bodies_over_threshold():
+    c = _app()
+    r = c.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip" and r.text == "x" * 1000
+    assert r.headers["etag"] == '"abc-gzip"' and r.headers["vary"] == "Accept-Encoding"
+    assert int(r.headers["content-length"]) < 1000
+
+    r = c.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in r.headers and r.headers["etag"] == '"abc"'
+    assert r.headers["vary"] == "Accept-Encoding"
+
+    assert "content-encoding" not in c.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    r = c.get("/png", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers and "vary" not in r.headers
+
+    r = c.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip" and r.text.count("\n") == 500
+
+
+def test_scan_routes_serve_precompressed_entries():
+    c = TestClient(app)
+    r = c.get("/u/demo123.vcf", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200 and r.headers["content-encoding"] == "gzip"
+    assert "FN:Ada Lovelace" in r.text and r.headers["vary"] == "Accept-Encoding"
+    gz_etag = r.headers["etag"]
+    assert gz_etag.endswith('-gzip"')
+
+    plain = c.get("/u/demo123.vcf", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers and plain.headers["etag"] != gz_etag
+
+    # a validator for either representation revalidates the resource
+    for etag in (gz_etag, plain.headers["etag"]):
+        r = c.get("/u/demo123.vcf", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert r.status_code == 304 and r.headers["etag"] == gz_etag
+
+
+def test_static_cards_compress_once_and_sticky_reads_not_at_all():
+    c = TestClient(app)
+    c.get("/u/demo123.vcf")
+    entry = vcf._static_vcards["demo123"][1]
+    c.get("/u/demo123.vcf")
+    assert vcf._static_vcards["demo123"][1] is entry
+
+    # the owner's next reads are sticky: stored bytes go out, the middleware compresses them
+    c.post("/dev/login")
+    slug = c.post("/api/profile", json={"fullName": "Sticky Reader", "note": "n" * 800}).json()["slug"]
+    vcf.PROFILES.pop(slug, None)
+    loaded, _ = vcf.load_vcard(slug, sticky=True)
+    assert loaded.gzip is None and loaded.br is None
+    r = c.get(f"/u/{slug}.vcf", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip" and "FN:Sticky Reader" in r.text
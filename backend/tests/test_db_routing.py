@@ -0,0 +1,51 @@
+import time
+
+from sqlalchemy import create_engine
+from starlette.requests import Request
+
+from app import db as dbmod
+
+
+def _request(session=None):
+    scope = {"type": "http", "headers": []}
+    if session is not None:
+        scope["session"] = session
+    return Request(scope)
+
+
+def test_read_routing(monkeypatch):
+    replica = create_engine("sqlite://")
+    broken = create_engine("postgresql+psycopg://nobody@127.0.0.1:1/none", connect_args={"connect_timeout": 1})
+    router = dbmod.ReplicaRouter([broken, replica], check_interval=60)
+    monkeypatch.setattr(dbmod, "replicas", router)
+    # the test runs the checks itself instead of the background thread
+    monkeypatch.setattr(router, "_ensure_checker", lambda: None)
+
+    # before any check has landed, reads stay on the primary
+    assert router.pick() is None
+    router.check_all()
+
+    # health checks belong to the background thread; picking must never run one
+    def no_check(replica):
+        raise AssertionError("health check on the request path")
+
+    monkeypatch.setattr(router, "check", no_check)
+
+    # anonymous reads skip the unreachable replica and land on the healthy one
+    gen = dbmod.get_read_db(_request({}))
+    assert next(gen).get_bind() is replica
+    gen.close()
+    assert [r["healthy"] for r in router.status()] == [False, True]
+
+    # a recent write pins reads to the primary
+    gen = dbmod.get_read_db(_request({dbmod.WRITE_STAMP_KEY: time.time()}))
+    assert next(gen).get_bind() is dbmod.engine
+    gen.close()
+
+    # writes through get_db stamp the cookie session
+    session = {}
+    gen = dbmod.get_db(_request(session))
+    db = next(gen)
+    db.info["wrote"] = True
+    next(gen, None)
+    assert dbmod.WRITE_STAMP_KEY in session
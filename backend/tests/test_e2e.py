@@ -12,7 +12,9 @@ from app.main import app
 
 
 def setup_module(module):
-    # Clean test artifacts
+    # Clean test artifacts (pooled connections would keep writing to the unlinked file)
+    from app.db import engine
+    engine.dispose()
     db = Path("test_e2e.db")
     if db.exists():
         db.unlink()
@@ -82,6 +84,13 @@ def test_end_to_end_flow():
     slug = r.json().get("slug")
     assert slug
 
+    # Fetch profile back (same shape as create, defaults filled in)
+    created = r.json()
+    r = client.get(f"/api/profile/{created['id']}")
+    assert r.status_code == 200
+    assert r.json() == created
+    assert r.json()["social"]["twitter"] is None
+
     # Fetch vCard
     r = client.get(f"/u/{slug}.vcf")
     assert r.status_code == 200
@@ -0,0 +1,112 @@
+import io
+import tracemalloc
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.db import SessionLocal
+from app.models import Profile
+from app.routes.vcf import PROFILES
+from app.services.importer import import_vcards
+from app.services.vcard import MAX_CARD_BYTES, build_vcard, iter_vcards, record_to_profile
+
+
+def test_parse_is_inverse_of_build():
+    card = PROFILES["demo123"]
+    text = build_vcard(card) + build_vcard({**card, "fullName": "Second; Card, Esq.", "note": "two\nlines"})
+    records = list(iter_vcards(io.BytesIO(text.encode())))
+    assert len(records) == 2
+    assert record_to_profile(records[0]) == {k: v for k, v in card.items() if v}
+    second = record_to_profile(records[1])
+    assert second["fullName"] == "Second; Card, Esq." and second["note"] == "two\nlines"
+
+
+def test_parse_vcard21_and_40_quirks():
+    data = (
+        b"BEGIN:VCARD\r\nVERSION:2.1\r\n"
+        b"N;CHARSET=UTF-8;ENCODING=QUOTED-PRINTABLE:M=C3=BCller;J=\r\n=C3=BCrgen\r\n"
+        b"TEL;WORK;VOICE:+1 555 0100\r\n"
+        b"PHOTO;ENCODING=BASE64;TYPE=JPEG:/9j/4AAQSkZJRg\r\n AAAA\r\n\r\n"
+        b"END:VCARD\r\n"
+        b"BEGIN:VCARD\r\nVERSION:4.0\r\nFN:Grace Hopper\r\n"
+        b"TEL;VALUE=uri;TYPE=\"voice,home\":tel:+1-555-0199\r\n"
+        b"item1.EMAIL;TYPE=INTERNET:grace@exam\r\n ple.com\r\n"
+        b"URL:https://www.linkedin.com/in/grace\r\n"
+        b"END:VCARD\r\n"
+    )
+    first, second = (record_to_profile(r) for r in iter_vcards(io.BytesIO(data)))
+    assert first["fullName"] == "Jürgen Müller"
+    assert first["phones"] == [{"type": "work", "number": "+1 555 0100"}]
+    assert "photoUrl" not in first
+    assert second["phones"] == [{"type": "home", "number": "+1-555-0199"}]
+    assert second["emails"] == [{"type": "work", "address": "grace@example.com"}]
+    assert second["social"] == {"linkedin": "https://www.linkedin.com/in/grace"} and "url" not in second
+
+
+def test_endlessly_folded_line_is_rejected_while_unfolding():
+    chunk = b" " + b"A" * 998 + b"\r\n"
+    folds = 20 * MAX_CARD_BYTES // len(chunk)
+
+    def lines():
+        yield b"BEGIN:VCARD\r\n"
+        yield b"PHOTO;ENCODING=BASE64:\r\n"
+        for _ in range(folds):
+            yield chunk
+        yield b"END:VCARD\r\n"
+        yield from (b"BEGIN:VCARD\r\n", b"FN:Next Card\r\n", b"END:VCARD\r\n")
+
+    tracemalloc.start()
+    try:
+        big, nxt = iter_vcards(lines())
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert big.error and big.props == []
+    # the unfolded line stopped growing at the limit instead of holding all 20x of it
+    assert peak < 4 * MAX_CARD_BYTES
+    assert record_to_profile(nxt)["fullName"] == "Next Card"
+
+
+def test_huge_physical_line_is_never_read_whole(tmp_path):
+    path = tmp_path / "huge.vcf"
+    path.write_bytes(
+        b"BEGIN:VCARD\r\nNOTE:" + b"A" * (20 * MAX_CARD_BYTES) + b"\r\nEND:VCARD\r\n"
+        b"BEGIN:VCARD\r\nFN:Next Card\r\nEND:VCARD\r\n"
+    )
+
+    tracemalloc.start()
+    try:
+        with open(path, "rb") as f:
+            big, nxt = iter_vcards(f)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert big.error and big.props == []
+    # reading the 20x line whole (bytes + decoded text) would peak far above this
+    assert peak < 8 * MAX_CARD_BYTES
+    assert record_to_profile(nxt)["fullName"] == "Next Card"
+
+
+def test_import_endpoint_reports_per_record_errors():
+    c = TestClient(app)
+    c.post("/dev/login")
+    good = build_vcard({"fullName": "Import One", "emails": [{"type": "work", "address": "one@import.test"}]})
+    bad_url = "BEGIN:VCARD\r\nVERSION:3.0\r\nFN:Bad Url\r\nURL:not a url\r\nEND:VCARD\r\n"
+    nameless = "BEGIN:VCARD\r\nVERSION:3.0\r\nTEL:+1\r\nEND:VCARD\r\n"
+    r = c.post("/api/profiles/import", content=(good + bad_url + nameless).encode(), headers={"Content-Type": "text/vcard"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["imported"] == 1 and body["failed"] == 2
+    assert [e["record"] for e in body["errors"]] == [2, 3]
+    assert body["errors"][0]["fullName"] == "Bad Url" and body["errors"][0]["line"] == 7
+    found = c.get("/api/profiles/search", params={"email": "one@import.test"}).json()["results"]
+    assert [p["fullName"] for p in found] == ["Import One"]
+
+
+def test_import_in_batches():
+    cards = "".join(build_vcard({"fullName": f"Batch {i}"}) for i in range(7))
+    with SessionLocal() as db:
+        result = import_vcards(db, "batch-owner", io.BytesIO(cards.encode()), batch_size=3)
+        assert (result.imported, result.failed) == (7, 0)
+        slugs = {m.slug for m in db.query(Profile).filter_by(user_id="batch-owner")}
+    assert len(slugs) == 7
@@ -0,0 +1,74 @@
+import threading
+import time
+
+from app import jobs
+
+
+def _wait_idle(executor, timeout=5):
+    deadline = time.time() + timeout
+    while not executor.idle() and time.time() < deadline:
+        time.sleep(0.01)
+    assert executor.idle()
+
+
+def test_retries_dedupe_and_concurrency():
+    attempts = []
+
+    @jobs.job("test_flaky", retries=2, backoff=0.01)
+    def flaky(n):
+        attempts.append(n)
+        if len(attempts) < 3:
+            raise RuntimeError("transient")
+
+    running = []
+    peak = []
+    gate = threading.Event()
+
+    @jobs.job("test_limited", max_concurrency=2)
+    def limited(i):
+        running.append(i)
+        peak.append(len(running))
+        gate.wait(2)
+        running.remove(i)
+
+    ex = jobs.LocalExecutor(threads=8)
+    try:
+        assert ex.submit(jobs._Job("test_flaky", (1,), {}))
+        _wait_idle(ex)
+        assert attempts == [1, 1, 1]
+        assert ex.stats["retried"] == 2 and ex.stats["succeeded"] == 1
+
+        for i in range(5):
+            ex.submit(jobs._Job("test_limited", (i,), {}))
+        time.sleep(0.1)
+        assert max(peak) == 2
+
+        # queued jobs with the same key collapse into one
+        assert ex.submit(jobs._Job("test_limited", (10,), {}, dedupe_key="k"))
+        assert not ex.submit(jobs._Job("test_limited", (11,), {}, dedupe_key="k"))
+        assert ex.stats["deduped"] == 1
+        gate.set()
+        _wait_idle(ex)
+        assert max(peak) == 2
+    finally:
+        ex.shutdown()
+
+
+def test_events_survive_an_unreachable_queue(monkeypatch):
+    from app.services import events, publisher
+
+    attempted = []
+
+    def enqueue(self, j):
+        attempted.append(j.name)
+        raise ConnectionError("redis is down")
+
+    monkeypatch.setattr(jobs, "JOBS_BACKEND", "redis")
+    monkeypatch.setattr(jobs, "redis_queue", lambda: jobs.RedisQueue.__new__(jobs.RedisQueue))
+    monkeypatch.setattr(jobs.RedisQueue, "enqueue", enqueue)
+    monkeypatch.setattr(publisher, "enabled", lambda: True)
+    # the write already committed: a failed enqueue is logged, not raised
+    events.profile_changed("abc12345")
+    events.entitlement_changed("user-1")
+    # a worker process warming its own cache wouldn't help the web processes
+    assert attempted == ["publish_slug", "publish_user"]
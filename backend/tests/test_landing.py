@@ -0,0 +1,49 @@
+import gzip
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def test_landing_page_renders_escaped_card():
+    r = TestClient(app).get("/u/demo123", headers={"Accept-Encoding": "identity"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/html")
+    assert '<meta property="og:title" content="Ada Lovelace">' in r.text
+    assert 'href="/u/demo123.vcf"' in r.text
+    assert 'href="tel:+15551234567"' in r.text
+
+
+def test_landing_page_cached_compressed_and_invalidated():
+    c = TestClient(app)
+    c.post("/dev/login")
+    r = c.post("/api/profile", json={"fullName": "Page <Owner>", "title": "CTO"})
+    slug = r.json()["slug"]
+    # the creator's own reads bypass caches briefly; use a fresh client like a scanner would
+    scanner = TestClient(app)
+    r = scanner.get(f"/u/{slug}", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200 and r.headers["content-encoding"] == "gzip"
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert "Page &lt;Owner&gt;" in r.text
+    etag = r.headers["etag"]
+    assert etag.endswith('-gzip"')
+
+    r = scanner.get(f"/u/{slug}", headers={"If-None-Match": etag, "Accept-Encoding": "gzip"})
+    assert r.status_code == 304
+
+    # deleted/unknown slugs are 404s, never cached pages
+    assert scanner.get("/u/nope-not-a-slug").status_code == 404
+
+
+def test_edit_invalidates_page():
+    from app.services import events
+    from app.services.landing import cached_page
+
+    c = TestClient(app)
+    c.post("/dev/login")
+    slug = c.post("/api/profile", json={"fullName": "Before Edit"}).json()["slug"]
+    first = cached_page(slug)
+    assert cached_page(slug) is first
+    events.profile_changed(slug)
+    assert cached_page(slug) is not first
+    assert gzip.decompress(first.gzip) == first.body
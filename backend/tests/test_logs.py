@@ -0,0 +1,70 @@
+import json
+import logging
+import time
+
+from fastapi.testclient import TestClient
+
+from app import jobs, logs, tracing
+from app.main import app
+from app.services.cache import vcards
+
+
+class _Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_json_formatter_carries_request_id_fields_and_traceback():
+    record = logging.LogRecord("app.test", logging.ERROR, __file__, 1, "failed %s", ("x",), None)
+    record.request_id, record.trace_id, record.slug = "req-1", None, "abc"
+    try:
+        raise ValueError("boom")
+    except ValueError as e:
+        record.exc_info = (type(e), e, e.__traceback__)
+    out = json.loads(logs.JsonFormatter().format(record))
+    assert out["msg"] == "failed x" and out["requestId"] == "req-1" and out["slug"] == "abc"
+    assert "traceId" not in out and "ValueError: boom" in out["exc"]
+
+
+def test_request_id_is_echoed_or_generated():
+    c = TestClient(app)
+    assert c.get("/healthz", headers={"X-Request-ID": "edge-42"}).headers["x-request-id"] == "edge-42"
+    generated = c.get("/healthz", headers={"X-Request-ID": "bad id\n"}).headers["x-request-id"]
+    assert generated != "bad id\n" and len(generated) == 32
+
+
+def test_sampled_requests_export_nested_spans(monkeypatch):
+    collect = _Collect()
+    trace_log = logging.getLogger(tracing.TRACE_LOGGER)
+    trace_log.addHandler(collect)
+    monkeypatch.setattr(tracing, "TRACE_EXPORTER", "console")
+    try:
+        client = TestClient(app)
+        client.post("/dev/login")
+        client.post("/dev/seed-profile")
+
+        monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+        collect.records.clear()
+        client.get("/healthz")
+        assert collect.records == []
+
+        monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+        # the post-write warm-up job would refill the cache after the clear
+        deadline = time.time() + 5
+        while not jobs.executor().idle() and time.time() < deadline:
+            time.sleep(0.01)
+        vcards.clear()
+        TestClient(app).get("/u/devcard.vcf")
+    finally:
+        trace_log.removeHandler(collect)
+
+    spans = [r.span for r in collect.records]
+    root = next(s for s in spans if s["name"] == "http.request" and s["attrs"]["path"] == "/u/devcard.vcf")
+    assert root["parentId"] is None and root["attrs"]["status"] == 200
+    queries = [s for s in spans if s["name"] == "db.query" and s["traceId"] == root["traceId"]]
+    assert queries and all(q["parentId"] == root["spanId"] for q in queries)
+    assert queries[0]["attrs"]["statement"].startswith("SELECT profiles.slug")
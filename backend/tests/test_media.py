@@ -0,0 +1,63 @@
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from app.media import IMMUTABLE_CACHE_CONTROL, MediaFiles, MediaIndex
+
+
+KEY = "profiles/u1/0123456789abcdef0123456789abcdef.jpg"
+
+
+def _client(tmp_path):
+    path = tmp_path / KEY
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"0123456789")
+    app = Starlette(routes=[Mount("/media", app=MediaFiles(str(tmp_path), media_index=MediaIndex()))])
+    return TestClient(app), path
+
+
+def test_immutable_caching_and_etag(tmp_path):
+    client, _ = _client(tmp_path)
+    r = client.get(f"/media/{KEY}")
+    assert r.status_code == 200
+    assert r.content == b"0123456789"
+    assert r.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert r.headers["content-type"] == "image/jpeg"
+
+    r2 = client.get(f"/media/{KEY}", headers={"If-None-Match": r.headers["etag"]})
+    assert r2.status_code == 304
+    assert r2.content == b""
+
+
+def test_range_requests(tmp_path):
+    client, _ = _client(tmp_path)
+    r = client.get(f"/media/{KEY}", headers={"Range": "bytes=2-5"})
+    assert r.status_code == 206
+    assert r.content == b"2345"
+    assert r.headers["content-range"] == "bytes 2-5/10"
+
+    r = client.get(f"/media/{KEY}", headers={"Range": "bytes=-3"})
+    assert r.status_code == 206
+    assert r.content == b"789"
+
+    r = client.get(f"/media/{KEY}", headers={"Range": "bytes=50-"})
+    assert r.status_code == 416
+    assert r.headers["content-range"] == "bytes */10"
+
+
+def test_variant_negotiation_and_traversal(tmp_path):
+    client, path = _client(tmp_path)
+    path.with_name(path.name + ".avif").write_bytes(b"avif")
+
+    r = client.get(f"/media/{KEY}", headers={"Accept": "image/avif,image/webp,*/*"})
+    assert r.status_code == 200
+    assert r.content == b"avif"
+    assert r.headers["content-type"] == "image/avif"
+    assert r.headers["vary"] == "Accept"
+
+    r = client.get(f"/media/{KEY}", headers={"Accept": "image/avif;q=0, */*"})
+    assert r.content == b"0123456789"
+    assert r.headers["vary"] == "Accept"
+
+    assert client.get("/media/../secret").status_code == 404
+    assert client.post(f"/media/{KEY}").status_code == 405
@@ -0,0 +1,99 @@
+import hashlib
+import os
+import time
+
+import boto3
+from fastapi.testclient import TestClient
+from moto import mock_aws
+
+from app.main import app
+from app.db import SessionLocal
+from app.models import PhotoRef
+from app.services import photos
+from app.storage import local_path
+
+
+def _upload(c, data: bytes):
+    # no client-side hash: the direct endpoint derives the content key from the bytes
+    init = c.post("/api/upload-photo", json={"filename": "a.png", "contentType": "image/png"}).json()
+    r = c.post(init["uploadUrl"], content=data, headers={"Content-Type": "image/png"})
+    assert r.status_code == 200
+    return r.json(), init
+
+
+def test_identical_uploads_share_one_object():
+    c = TestClient(app)
+    c.post("/dev/login")
+    data = b"same-image-bytes-" + os.urandom(8)
+    first, init = _upload(c, data)
+    assert first["key"] == photos.content_key(hashlib.sha256(data).hexdigest(), "image/png")
+    second, _ = _upload(c, data)
+    assert second["key"] == first["key"]
+    assert local_path(first["key"]).read_bytes() == data
+    # the key handed out before the upload still serves the photo, from the same file
+    assert os.path.samefile(local_path(init["key"]), local_path(first["key"]))
+
+    # bytes that don't match the hash never land on a shared key
+    r = c.post(f"/api/upload-photo-direct?key={first['key']}", content=b"other", headers={"Content-Type": "image/png"})
+    assert r.status_code == 400
+
+    r = c.post("/api/profile", json={"fullName": "Photo Owner", "photoUrl": first["publicUrl"]})
+    with SessionLocal() as db:
+        assert db.get(PhotoRef, r.json()["id"]).key == first["key"]
+
+
+def test_gc_deletes_only_old_unreferenced_local_files():
+    c = TestClient(app)
+    c.post("/dev/login")
+    kept, _ = _upload(c, b"kept-" + os.urandom(8))
+    c.post("/api/profile", json={"fullName": "Kept", "photoUrl": kept["publicUrl"]})
+    orphan, _ = _upload(c, b"orphan-" + os.urandom(8))
+    fresh, _ = _upload(c, b"fresh-" + os.urandom(8))
+    old = time.time() - 3 * 86400
+    for key in (kept["key"], orphan["key"]):
+        os.utime(local_path(key), (old, old))
+    variant = local_path(orphan["key"] + ".webp")
+    variant.write_bytes(b"variant")
+    os.utime(variant, (old, old))
+
+    with SessionLocal() as db:
+        counts = photos.gc(db, grace_hours=24, page_size=2)
+    assert local_path(kept["key"]).exists()
+    assert local_path(fresh["key"]).exists()
+    assert not local_path(orphan["key"]).exists() and not variant.exists()
+    assert counts["deleted"] >= 2
+
+
+def test_dedup_hit_restarts_the_gc_grace_period():
+    c = TestClient(app)
+    c.post("/dev/login")
+    data = b"reused-" + os.urandom(8)
+    first, _ = _upload(c, data)
+    old = time.time() - 3 * 86400
+    os.utime(local_path(first["key"]), (old, old))
+
+    # the same photo uploaded again; its profile is saved later and gc runs in between
+    second, _ = _upload(c, data)
+    assert second["key"] == first["key"]
+    with SessionLocal() as db:
+        photos.gc(db, grace_hours=24)
+    assert local_path(first["key"]).exists()
+
+
+@mock_aws
+def test_gc_against_s3_pages_and_bulk_deletes():
+    client = boto3.client("s3", region_name="us-east-1")
+    client.create_bucket(Bucket="photos")
+    for i in range(5):
+        client.put_object(Bucket="photos", Key=f"photos/aa/orphan{i}.jpg", Body=b"x")
+    client.put_object(Bucket="photos", Key="photos/bb/kept.jpg", Body=b"x")
+    with SessionLocal() as db:
+        db.merge(PhotoRef(profile_id="s3-gc-profile", key="photos/bb/kept.jpg"))
+        db.commit()
+        store = photos.S3Store("photos", client=client)
+        # everything was just written: inside the grace period nothing goes
+        assert photos.gc(db, store=store, page_size=2)["deleted"] == 0
+        counts = photos.gc(db, store=store, grace_hours=-1, page_size=2, prefixes=("photos/",))
+    keys = [o["Key"] for o in client.list_objects_v2(Bucket="photos").get("Contents", [])]
+    assert keys == ["photos/bb/kept.jpg"]
+    assert counts == {"scanned": 6, "referenced": 1, "recent": 0, "deleted": 5}
@@ -0,0 +1,87 @@
+import hashlib
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+
+from app.main import app
+from app import migrations
+from app.db import Base, SessionLocal
+from app.models import Profile as ProfileModel
+from app.routes.vcf import PROFILES as VCF_PROFILES
+from app.services import prerender
+from app.services.cache import vcards
+
+
+def _create(client, **fields):
+    r = client.post("/api/profile", json=fields)
+    assert r.status_code == 200
+    slug = r.json()["slug"]
+    # scan the DB path, not the in-memory stub store
+    VCF_PROFILES.pop(slug, None)
+    return slug
+
+
+def test_write_path_stores_rendered_vcard_and_scan_serves_it():
+    client = TestClient(app)
+    client.post("/dev/login")
+    slug = _create(client, fullName="Stored Card", title="CTO")
+    with SessionLocal() as db:
+        m = db.query(ProfileModel).filter_by(slug=slug).one()
+        assert b"FN:Stored Card" in m.vcard and m.vcard_length == len(m.vcard)
+        assert m.vcard_hash == hashlib.sha256(m.vcard).hexdigest()
+        assert m.vcard_version == prerender.VCARD_RENDER_VERSION
+        stored = m.vcard
+
+    vcards.clear()
+    scanner = TestClient(app)
+    r = scanner.get(f"/u/{slug}.vcf")
+    assert r.status_code == 200 and r.content == stored
+    etag = r.headers["etag"]
+    assert scanner.get(f"/u/{slug}.vcf", headers={"If-None-Match": etag}).status_code == 304
+
+    # any ORM write that touches a card field re-renders in the same flush
+    with SessionLocal() as db:
+        m = db.query(ProfileModel).filter_by(slug=slug).one()
+        m.full_name = "Renamed Card"
+        db.commit()
+        assert b"FN:Renamed Card" in m.vcard and m.vcard_hash != hashlib.sha256(stored).hexdigest()
+
+def test_backfill_renders_missing_and_outdated_rows():
+    client = TestClient(app)
+    client.post("/dev/login")
+    slugs = [_create(client, fullName=f"Backfill {i}") for i in range(3)]
+    with SessionLocal() as db:
+        # simulate rows written before the columns existed (Core update skips the ORM hook)
+        db.query(ProfileModel).filter(ProfileModel.slug.in_(slugs[:2])).update(
+            {"vcard": None, "vcard_hash": None, "vcard_length": None, "vcard_version": None},
+            synchronize_session=False,
+        )
+        db.query(ProfileModel).filter_by(slug=slugs[2]).update({"vcard_version": 0}, synchronize_session=False)
+        db.commit()
+
+    vcards.clear()
+    # not yet rendered: the scan still answers by rendering on read
+    r = TestClient(app).get(f"/u/{slugs[0]}.vcf")
+    assert r.status_code == 200 and "FN:Backfill 0" in r.text
+
+    with SessionLocal() as db:
+        assert prerender.backfill(db, batch_size=2) >= 3
+        for slug in slugs:
+            m = db.query(ProfileModel).filter_by(slug=slug).one()
+            assert prerender.is_current(m) and f"FN:{m.full_name}".encode() in m.vcard
+        assert prerender.backfill(db) == 0
+
+
+def test_ensure_schema_upgrades_a_database_that_already_has_tables(tmp_path):
+    # a prod database created before the stored-vCard columns: tables exist, migrations pending
+    old = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=old)
+    with old.begin() as conn:
+        for column in ("vcard", "vcard_hash", "vcard_length", "vcard_version"):
+            conn.execute(text(f"ALTER TABLE profiles DROP COLUMN {column}"))
+
+    ran = migrations.ensure_schema(old)
+    assert "0003_profiles_prerendered_vcard" in ran
+    assert {"vcard", "vcard_hash"} <= {c["name"] for c in inspect(old).get_columns("profiles")}
+    assert migrations.ensure_schema(old) == []
+    old.dispose()
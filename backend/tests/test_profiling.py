@@ -0,0 +1,56 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.main import app
+from app import profiling
+from app.db import SessionLocal
+from app.profiling import ProfilingMiddleware, RepeatedQueryWarning
+from app.services.cache import pages
+
+
+def test_server_timing_reports_db_and_render():
+    c = TestClient(app)
+    c.post("/dev/login")
+    c.post("/dev/seed-profile")
+    r = c.get("/u/devcard.vcf")
+    assert r.status_code == 200
+    timing = r.headers["server-timing"]
+    assert "total;dur=" in timing
+    # a landing-page cache miss loads the card (db) and renders the HTML (render)
+    pages.clear()
+    r = TestClient(app).get("/u/devcard")
+    assert r.status_code == 200
+    timing = r.headers["server-timing"]
+    assert "db;dur=" in timing and "render;dur=" in timing
+
+
+def test_profile_header_writes_stack_dump(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    c = TestClient(app)
+    r = c.get("/u/devcard.vcf", headers={"X-Profile": "1"})
+    profile_id = r.headers["x-profile-id"]
+    data = json.loads((tmp_path / f"{profile_id}.json").read_text())
+    assert data["path"] == "/u/devcard.vcf"
+    assert "queries" in data and "stacks" in data
+
+
+def test_repeated_queries_warn():
+    # a throwaway app: the probe route must not leak into the real one
+    probe = FastAPI()
+    probe.add_middleware(ProfilingMiddleware)
+
+    @probe.get("/n-plus-one")
+    def n_plus_one():
+        with SessionLocal() as db:
+            for i in range(profiling.REPEATED_QUERY_THRESHOLD):
+                db.execute(text(f"SELECT {i}"))
+        return {}
+
+    c = TestClient(probe)
+    with pytest.warns(RepeatedQueryWarning, match="possible N\\+1"):
+        r = c.get("/n-plus-one")
+    assert r.status_code == 200
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+
+import boto3
+from moto import mock_aws
+
+from app.db import SessionLocal
+from app.models import Profile
+from app.models_user import User
+from app.services import publisher
+
+
+def _seed(db):
+    now = datetime.now(timezone.utc)
+    paid = User(email="pub-paid@example.com", trial_ends_at=now + timedelta(days=1))
+    lapsed = User(email="pub-lapsed@example.com", trial_ends_at=now - timedelta(days=1))
+    db.add_all([paid, lapsed])
+    db.flush()
+    db.add_all([
+        Profile(slug="pubpaid", user_id=paid.id, full_name="Paid Person", phones=[], emails=[], address={}, social={}),
+        Profile(slug="publapsed", user_id=lapsed.id, full_name="Lapsed Person", phones=[], emails=[], address={}, social={}),
+    ])
+    db.commit()
+    return paid, lapsed
+
+
+@mock_aws
+def test_rebuild_against_s3_stand_in():
+    client = boto3.client("s3", region_name="us-east-1")
+    client.create_bucket(Bucket="cards")
+    client.put_object(Bucket="cards", Key="u/publapsed.vcf", Body=b"stale")
+    client.put_object(Bucket="cards", Key="u/deleted.vcf", Body=b"orphan")
+    target = publisher.S3Target("cards", client=client)
+
+    with SessionLocal() as db:
+        paid, lapsed = _seed(db)
+        counts = publisher.rebuild_all(db, target=target, workers=2)
+
+        keys = set(target.keys("u/"))
+        assert "u/pubpaid.vcf" in keys
+        assert "u/publapsed.vcf" not in keys and "u/deleted.vcf" not in keys
+        assert counts["orphans"] >= 1
+
+        obj = client.get_object(Bucket="cards", Key="u/pubpaid.vcf")
+        assert obj["ContentType"] == "text/vcard; charset=utf-8"
+        assert b"FN:Paid Person" in obj["Body"].read()
+
+        # entitlement lapses -> incremental sync removes the file
+        paid.trial_ends_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        db.commit()
+        m = db.query(Profile).filter_by(slug="pubpaid").one()
+        assert publisher.sync_profile(db, m, target=target) is False
+        assert "u/pubpaid.vcf" not in set(target.keys("u/"))
+
+
+def test_unpublish_lapsed_removes_cards_of_expired_trials(tmp_path):
+    target = publisher.LocalTarget(str(tmp_path))
+    now = datetime.now(timezone.utc)
+    with SessionLocal() as db:
+        expired = User(email="pub-expired@example.com", trial_ends_at=now - timedelta(minutes=5))
+        subscribed = User(email="pub-subscribed@example.com", trial_ends_at=now - timedelta(minutes=5), sub_active=True)
+        db.add_all([expired, subscribed])
+        db.flush()
+        db.add_all([
+            Profile(slug="pubexpired", user_id=expired.id, full_name="Expired", phones=[], emails=[], address={}, social={}),
+            Profile(slug="pubsubscribed", user_id=subscribed.id, full_name="Subscribed", phones=[], emails=[], address={}, social={}),
+        ])
+        db.commit()
+        for slug in ("pubexpired", "pubsubscribed"):
+            target.put(publisher.key_for(slug), b"BEGIN:VCARD")
+
+        # the window that saw the trial end removes the card; a later window leaves the rest alone
+        assert publisher.unpublish_lapsed(db, now - timedelta(hours=1), now, target=target)["removed"] >= 1
+        assert set(target.keys("u/")) == {"u/pubsubscribed.vcf"}
+        assert publisher.unpublish_lapsed(db, now, now + timedelta(hours=1), target=target) == {"users": 0, "removed": 0}
+
+
+def test_only_one_sweep_lease_is_held_at_a_time():
+    # two web workers racing for the expiry sweep (flock here; an advisory lock on Postgres)
+    first, second = publisher.SweepLease(lock_id=0x7e57), publisher.SweepLease(lock_id=0x7e57)
+    try:
+        assert first.held() and first.held()
+        assert not second.held()
+        first.release()
+        assert second.held()
+    finally:
+        first.release()
+        second.release()
@@ -0,0 +1,39 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.db import SessionLocal
+from app.services.search import search_profiles, _search_like
+
+
+def test_search_endpoint_and_fallback():
+    client = TestClient(app)
+    assert client.get("/api/profiles/search?q=x").status_code == 401
+
+    client.post("/dev/login")
+    uid = client.get("/auth/me").json()["user"]["id"]
+    for full_name, org, email in (
+        ("Grace Hopper", "Navy", "grace@navy.example"),
+        ("Alan Turing", "Bletchley", "alan@bletchley.example"),
+    ):
+        r = client.post("/api/profile", json={
+            "fullName": full_name,
+            "org": org,
+            "emails": [{"type": "work", "address": email}],
+        })
+        assert r.status_code == 200
+
+    r = client.get("/api/profiles/search", params={"q": "grac"})
+    assert r.status_code == 200
+    assert [p["fullName"] for p in r.json()["results"]] == ["Grace Hopper"]
+
+    r = client.get("/api/profiles/search", params={"email": "alan@bletchley.example"})
+    assert [p["org"] for p in r.json()["results"]] == ["Bletchley"]
+
+    # "work" only appears as an email type, so it must not match via q
+    r = client.get("/api/profiles/search", params={"q": "work"})
+    assert r.json()["results"] == []
+
+    # LIKE path (used by Postgres and un-migrated SQLite) returns the same rows
+    with SessionLocal() as db:
+        fts = search_profiles(db, uid, org="bletch")
+        like = _search_like(db, uid, None, {"org": "bletch"}, 20, 0)
+        assert [m.id for m in fts] == [m.id for m in like] and len(fts) == 1
@@ -0,0 +1,20 @@
+from fastapi.testclient import TestClient
+
+from app import main
+from app.serve import worker_count
+
+MB = 1024 * 1024
+
+
+def test_worker_count_sized_by_cpu_and_memory():
+    assert worker_count(4, 8192 * MB) == 4
+    # 512MB container only fits two 256MB workers
+    assert worker_count(8, 512 * MB, per_worker_mb=256) == 2
+    assert worker_count(0.5, None) == 1
+    assert worker_count(2, 64 * MB) == 1
+
+
+def test_init_db_disabled_with_multiple_workers(monkeypatch):
+    monkeypatch.setattr(main, "MULTI_WORKER", True)
+    r = TestClient(main.app).get("/admin/init-db")
+    assert r.status_code == 404
@@ -0,0 +1,84 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app import jobs
+from app.db import SessionLocal
+from app.models import Profile as ProfileModel, SlugAlias
+from app.routes.vcf import PROFILES as VCF_PROFILES
+from app.services import events, publisher, slugs
+from app.services.cache import pages, vcards
+
+
+def test_compact_link_fits_alphanumeric_mode_and_a_smaller_version(monkeypatch):
+    monkeypatch.setenv("PUBLIC_HOST", "https://qr.example.com")
+    compact = slugs.compact_url("7K3M9QXZ")
+    assert compact == "HTTPS://QR.EXAMPLE.COM/C/7K3M9QXZ"
+    assert all(c in slugs.QR_ALPHANUMERIC for c in compact)
+    assert slugs.qr_version(compact) == 2
+    assert slugs.qr_version(slugs.legacy_url("aB3dE5fG")) == 3
+    # published capacities: version 1-M holds 20 alphanumeric or 14 byte characters
+    assert slugs.qr_version("A" * 20) == 1 and slugs.qr_version("A" * 21) == 2
+    assert slugs.qr_version("a" * 14) == 1 and slugs.qr_version("a" * 15) == 2
+    assert slugs.is_compact("7K3M9QXZ") and not slugs.is_compact("aB3dE5fG")
+
+
+def test_compact_slugs_serve_at_short_path(monkeypatch):
+    monkeypatch.setattr(slugs, "COMPACT_SLUGS", True)
+    client = TestClient(app)
+    client.post("/dev/login")
+    body = client.post("/api/profile", json={"fullName": "Compact Card"}).json()
+    slug = body["slug"]
+    assert slugs.is_compact(slug) and len(slug) == slugs.COMPACT_SLUG_LENGTH
+    assert body["scanUrl"] == f"HTTP://LOCALHOST:3001/C/{slug}"
+    VCF_PROFILES.pop(slug, None)
+
+    scanner = TestClient(app)
+    for path in (f"/C/{slug}", f"/C/{slug.lower()}", f"/u/{slug}.vcf"):
+        r = scanner.get(path)
+        assert r.status_code == 200 and "FN:Compact Card" in r.text
+        assert r.headers["content-type"].startswith("text/vcard")
+    assert scanner.get("/C/NOPE0000").status_code == 404
+
+
+def test_compact_all_keeps_old_slugs_working():
+    client = TestClient(app)
+    client.post("/dev/login")
+    old = client.post("/api/profile", json={"fullName": "Printed Card"}).json()["slug"]
+    VCF_PROFILES.pop(old, None)
+    if slugs.is_compact(old):  # a random legacy slug can already be compact-shaped
+        return
+
+    with SessionLocal() as db:
+        moved = {c["old"]: c["new"] for c in slugs.compact_all(db, batch_size=2)}
+        new = moved[old]
+        events.slug_moved(old, new)  # what the compact-slugs CLI does per profile
+        assert db.get(SlugAlias, old).profile_id == db.query(ProfileModel.id).filter_by(slug=new).scalar()
+        row = next(r for r in slugs.report(db) if r["slug"] == new)
+        assert row["legacyVersion"] >= row["compactVersion"] and row["saved"] == row["legacyVersion"] - row["compactVersion"]
+
+    scanner = TestClient(app)
+    for path in (f"/u/{old}.vcf", f"/u/{old}", f"/C/{new}"):
+        r = scanner.get(path)
+        assert r.status_code == 200 and "Printed Card" in r.text
+    # old links share the entry of the current slug, so invalidating it covers every worker's aliases
+    assert vcards._peek(old) is None and vcards._peek(new) is not None
+    assert pages._peek(old) is None and pages._peek(new) is not None
+    # an alias is never handed out again
+    with SessionLocal() as db:
+        assert slugs._taken(db, {old, new}) == {old, new}
+
+
+def test_slug_moved_unpublishes_the_old_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(publisher, "_target", publisher.LocalTarget(str(tmp_path)))
+    monkeypatch.setattr(jobs, "JOBS_BACKEND", "inline")
+    with SessionLocal() as db:
+        m = ProfileModel(slug="moved-me", full_name="Moved", phones=[], emails=[], address={}, social={})
+        db.add(m)
+        db.commit()
+        publisher.publish_slug("moved-me")
+        assert (tmp_path / "u" / "moved-me.vcf").exists()
+        old = slugs.compact(db, m)
+        db.commit()
+        events.slug_moved(old, m.slug)
+        assert not (tmp_path / "u" / "moved-me.vcf").exists()
+        assert (tmp_path / "u" / f"{m.slug}.vcf").read_bytes().startswith(b"BEGIN:VCARD")
@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.db import SessionLocal
+from app.models_user import User, as_utc
+from app.services import users
+
+
+def test_provision_backfill_keeps_existing_trial():
+    with SessionLocal() as db:
+        first = users.provision(db, "upsert@example.com", name="First", trial_days=7)
+        assert first.created and first.trial_ends_at is not None
+        again = users.provision(db, "upsert@example.com", name=None, picture="p.png", trial_days=30)
+        assert not again.created and again.id == first.id
+        assert again.trial_ends_at == first.trial_ends_at and not again.trial_changed
+        u = db.get(User, first.id)
+        db.refresh(u)
+        assert (u.name, u.picture) == ("First", "p.png")
+
+
+def test_provision_normalizes_email():
+    with SessionLocal() as db:
+        first = users.provision(db, "Mixed.Case@Example.com ")
+        again = users.provision(db, "mixed.case@example.COM")
+        assert again.id == first.id and again.email == "mixed.case@example.com"
+        with pytest.raises(ValueError):
+            users.provision(db, "not-an-email")
+
+
+def test_provision_renew_only_replaces_lapsed_trial():
+    with SessionLocal() as db:
+        u = users.provision(db, "renew@example.com")
+        db.get(User, u.id).trial_ends_at = datetime.now(timezone.utc) - timedelta(days=1)
+        db.commit()
+        renewed = users.provision(db, "renew@example.com", trial_days=30, policy="renew")
+        assert renewed.trial_changed and renewed.trial_ends_at > datetime.now(timezone.utc) + timedelta(days=29)
+        kept = users.provision(db, "renew@example.com", trial_days=1, policy="renew")
+        assert not kept.trial_changed and kept.trial_ends_at == renewed.trial_ends_at
+
+
+def test_concurrent_first_logins_converge():
+    def login(_):
+        with SessionLocal() as db:
+            return users.provision(db, "race@example.com").id
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        ids = set(pool.map(login, range(16)))
+    assert len(ids) == 1
+    with SessionLocal() as db:
+        assert db.query(User).filter_by(email="race@example.com").count() == 1
+
+
+def test_bulk_provision_endpoint_in_batches():
+    with SessionLocal() as db:
+        users.provision(db, "team-0@example.com", trial_days=1)
+    members = [{"email": f" Team-{i}@Example.com ", "name": f"Member {i}"} for i in range(25)]
+    members += [{"email": "not-an-email"}, {"email": "team-3@example.com", "trialDays": 60}]
+    r = TestClient(app).post("/admin/users/provision", json={"members": members, "trialDays": 14})
+    assert r.status_code == 200
+    assert r.json() == {"created": 24, "updated": 1, "invalid": ["not-an-email"]}
+
+    with SessionLocal() as db:
+        counts = users.provision_many(db, ({"email": f"team-{i}@example.com"} for i in range(25)), trial_days=90, batch_size=10)
+        assert counts == {"created": 0, "updated": 25, "invalid": []}
+        u = db.query(User).filter_by(email="team-0@example.com").one()
+        # "extend" keeps the later end: 90 days beats the original 1-day trial
+        assert as_utc(u.trial_ends_at) > datetime.now(timezone.utc) + timedelta(days=89)
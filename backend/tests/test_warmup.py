@@ -0,0 +1,53 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import sqlite
+
+from app.main import app
+from app.db import SessionLocal, engine
+from app.models import Profile as ProfileModel
+from app.services import warmup
+from app.services.cache import pages, vcards
+
+
+def test_readyz_waits_for_warmup(monkeypatch):
+    c = TestClient(app)
+    c.post("/dev/login")
+    slug = c.post("/dev/seed-profile").json()["slug"]
+    vcards.clear()
+    pages.clear()
+
+    state = warmup.WarmupState()
+    monkeypatch.setattr(warmup, "status", state)
+    state.deadline = float("inf")
+    r = c.get("/readyz")
+    assert r.status_code == 503 and r.json()["state"] == "pending"
+
+    warmup.run(state, timeout=10, top_n=50)
+    r = c.get("/readyz")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["state"] == "done" and body["connections"] >= 1 and body["warmed"] >= 1
+    assert vcards.snapshot()["size"] >= 1 and pages.snapshot()["size"] >= 1
+    assert slug in warmup.top_slugs(50)
+
+
+def test_ready_after_timeout_even_if_warmup_fails(monkeypatch):
+    state = warmup.WarmupState()
+    monkeypatch.setattr(warmup, "open_pool", lambda: (_ for _ in ()).throw(RuntimeError("db down")))
+    warmup.run(state, timeout=0)
+    snap = state.snapshot()
+    assert snap["ready"] and snap["state"] == "timeout" and "db down" in snap["error"]
+
+
+def test_top_slugs_reads_the_updated_at_index():
+    with SessionLocal() as db:
+        query = (
+            db.query(ProfileModel.slug)
+            .filter(ProfileModel.active.is_(True))
+            .order_by(ProfileModel.updated_at.desc())
+            .limit(warmup.WARMUP_TOP_N)
+        )
+        sql = str(query.statement.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        plan = " ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"))
+    # walked in index order: no full scan plus sort on every worker start
+    assert "ix_profiles_updated_at" in plan and "TEMP B-TREE" not in plan